@@ -1,5 +1,7 @@
 from .lib.paper.catalog import paper_catalog
 from .lib.paper.bibliography import parse_bibliography
+from .lib.paper.citation_graph import CitationGraph, build_citation_graph
 
-from .lib.statement import parse_paper
+from .lib.statement import iter_statements, parse_paper
+from .lib.statement.parse_papers import parse_papers
 from .types import ParseFocus, ParseResult
\ No newline at end of file
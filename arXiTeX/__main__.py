@@ -0,0 +1,408 @@
+"""
+Command line interface for corpus-scale runs: cataloging arXiv, fetching sources and parsing
+papers into sharded JSONL output. Every command can be interrupted and rerun with the same output
+directory to resume where it left off.
+
+    arXiTeX catalog data/ -o out/catalog --categories math.AG math.NT
+    arXiTeX fetch --ids-file ids.txt --source-cache data/sources -w 16
+    arXiTeX parse 2109.06451 paper_dir/ -o out/parsed -m regex
+    arXiTeX run data/ -o out/parsed --categories math.AG -w 8 --timeout 120
+"""
+
+import os
+import sys
+import threading
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from tqdm import tqdm
+from arXiTeX.types import ArXivPaper, ParseFocus, ParseResult, ParsingMethod
+from arXiTeX.lib.paper.catalog import paper_catalog
+from arXiTeX.lib.paper.catalog.default_categories import DEFAULT_CATEGORIES
+from arXiTeX.lib.paper.catalog.rows import CITATION_FIELDS
+from arXiTeX.lib.statement.parse_papers import parse_papers
+from arXiTeX.lib.statement.result_cache import ResultCache
+from arXiTeX.lib.utils.bulk_source import BulkSourceReader
+from arXiTeX.lib.utils.sharded_output import ShardedOutput
+from arXiTeX.lib.utils.source_cache import SourceCache
+
+
+def _shard(value: str) -> Tuple[int, int]:
+    """
+    Parses a shard given as 'INDEX/COUNT', e.g. '0/4'.
+    """
+
+    index, _, count = value.partition("/")
+    try:
+        return int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Shard must look like INDEX/COUNT, got {value!r}")
+
+
+def _add_catalog_args(parser: ArgumentParser, data_dir_optional: bool = False):
+    if data_dir_optional:
+        parser.add_argument(
+            "--data-dir",
+            type=Path,
+            default=None,
+            help="Also take the papers of the catalog in this directory"
+        )
+    else:
+        parser.add_argument(
+            "data_dir",
+            type=Path,
+            help="Directory of 'arxiv.zip', the arXiv Kaggle dataset. Downloaded if missing"
+        )
+    parser.add_argument(
+        "--categories",
+        nargs="+",
+        default=DEFAULT_CATEGORIES,
+        help="Categories to keep, e.g. math.AG or math (default, our recommended categories)"
+    )
+    parser.add_argument(
+        "--updated-from",
+        type=date.fromisoformat,
+        default=None,
+        help="Only papers updated on or after this date (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--updated-to",
+        type=date.fromisoformat,
+        default=None,
+        help="Only papers updated on or before this date (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Query an indexed SQLite store of the dataset, built on first use"
+    )
+    parser.add_argument(
+        "--shard",
+        type=_shard,
+        default=(0, 1),
+        help="Only this shard of the catalog, as INDEX/COUNT, e.g. one per machine (default 0/1)"
+    )
+
+
+def _add_source_args(parser: ArgumentParser):
+    parser.add_argument(
+        "--source-cache",
+        type=Path,
+        default=None,
+        help="Directory of a persistent cache of downloaded sources "
+             "(default, $ARXITEX_SOURCE_CACHE if set)"
+    )
+    parser.add_argument(
+        "--bulk-index",
+        type=Path,
+        default=None,
+        help="Index of local arXiv bulk source archives to read sources from instead of arXiv"
+    )
+
+
+def _add_parse_args(parser: ArgumentParser):
+    parser.add_argument(
+        "-m",
+        "--parsing-method",
+        type=ParsingMethod,
+        default=ParsingMethod.PLASTEX,
+        help="Method to parse with. Supported: plasTeX (default), regex, auto"
+    )
+    parser.add_argument(
+        "-f",
+        "--focus",
+        type=ParseFocus,
+        default=ParseFocus.ALL,
+        help="Parts of papers to parse. Supported: all (default), statements, preamble, "
+             "bibliography"
+    )
+    parser.add_argument(
+        "-t",
+        "--timeout",
+        type=int,
+        default=None,
+        help="Maximum seconds to parse each paper (default, no limit)"
+    )
+    parser.add_argument(
+        "--context",
+        type=int,
+        default=0,
+        help="Characters of context around each statement, regex method only (default 0)"
+    )
+    parser.add_argument(
+        "--max-tasks-per-child",
+        type=int,
+        default=None,
+        help="Papers each worker parses before it is replaced (default, never replaced)"
+    )
+    parser.add_argument(
+        "--result-cache",
+        type=Path,
+        default=None,
+        help="Directory of a persistent cache of parse results, reused across runs and outputs"
+    )
+    parser.add_argument(
+        "--partial",
+        action="store_true",
+        help="On --timeout, keep what was parsed so far instead of failing the paper"
+    )
+    parser.add_argument(
+        "--supervised",
+        action="store_true",
+        help="Parse in supervised workers, killed when a paper runs past --timeout"
+    )
+    parser.add_argument(
+        "--max-rss-mb",
+        type=int,
+        default=None,
+        help="Resident memory at which a worker is killed, implies --supervised (default, none)"
+    )
+    _add_source_args(parser)
+
+
+def _add_output_args(parser: ArgumentParser):
+    parser.add_argument(
+        "-o",
+        "--out-dir",
+        type=Path,
+        required=True,
+        help="Output directory. Rerunning with the same directory resumes an interrupted run"
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=1000,
+        help="Records per output file (default 1,000)"
+    )
+
+
+def _add_workers_arg(parser: ArgumentParser, default: int, help: str):
+    parser.add_argument("-w", "--workers", type=int, default=default, help=help)
+
+
+def _read_ids(args: Namespace) -> List[str]:
+    """
+    Collects the papers named on the command line and in --ids-file, one per line.
+    """
+
+    papers = list(args.papers)
+    if args.ids_file is not None:
+        with open(args.ids_file, encoding="utf-8") as f:
+            papers.extend(line.strip() for line in f if line.strip())
+    return papers
+
+
+def _catalog(args: Namespace, **kwargs) -> Iterator[List[ArXivPaper]]:
+    shard_index, num_shards = args.shard
+    return paper_catalog(
+        args.data_dir,
+        categories=args.categories,
+        updated_from=args.updated_from,
+        updated_to=args.updated_to,
+        use_store=args.store,
+        shard_index=shard_index,
+        num_shards=num_shards,
+        **kwargs
+    )
+
+
+def _result_record(result: ParseResult | Exception) -> Dict[str, Any]:
+    if isinstance(result, Exception):
+        return {"error": str(result)}
+
+    return {
+        "statements": (
+            None if result.statements is None
+            else [statement.model_dump() for statement in result.statements]
+        ),
+        "preamble": result.preamble,
+        "bibliography": result.bibliography,
+        "bibliography_bibtex": result.bibliography_bibtex,
+        "parsing_method": result.parsing_method,
+        "complete": result.complete,
+    }
+
+
+def _parse_into(
+    papers: Iterable[str | Path],
+    out: ShardedOutput,
+    args: Namespace,
+    total: Optional[int] = None
+):
+    """
+    Parses papers not yet in `out` and writes their results to it, with a progress bar.
+    """
+
+    source_kwargs = {}
+    if args.bulk_index is not None:
+        source_kwargs["downloader"] = BulkSourceReader(args.bulk_index, in_memory=True)
+    elif args.source_cache is not None:
+        source_kwargs["source_cache"] = SourceCache(args.source_cache)
+    if args.result_cache is not None:
+        source_kwargs["result_cache"] = ResultCache(args.result_cache)
+
+    todo = [paper for paper in papers if str(paper) not in out.done] if total else (
+        paper for paper in papers if str(paper) not in out.done
+    )
+    ok = failed = 0
+
+    with tqdm(
+        total=total,
+        initial=total - len(todo) if total else 0,
+        desc="Parsing",
+        unit="paper",
+        dynamic_ncols=True
+    ) as pbar:
+        for key, result in parse_papers(
+            todo,
+            workers=args.workers,
+            timeout=args.timeout,
+            max_tasks_per_child=args.max_tasks_per_child,
+            supervised=args.supervised,
+            max_rss_bytes=args.max_rss_mb * 2 ** 20 if args.max_rss_mb is not None else None,
+            parsing_method=args.parsing_method,
+            focus=args.focus,
+            context=args.context,
+            partial_results=args.partial,
+            **source_kwargs
+        ):
+            out.write(key, _result_record(result))
+
+            if isinstance(result, Exception):
+                failed += 1
+            else:
+                ok += 1
+            pbar.set_postfix(ok=ok, failed=failed, refresh=False)
+            pbar.update()
+
+
+def catalog_command(args: Namespace):
+    fields = None if args.citations else [
+        field for field in ArXivPaper.model_fields if field not in CITATION_FIELDS
+    ]
+
+    with ShardedOutput(args.out_dir, prefix="catalog", shard_size=args.shard_size) as out:
+        with tqdm(desc="Cataloging", unit="paper", dynamic_ncols=True) as pbar:
+            for batch in _catalog(args, workers=args.workers, fields=fields):
+                for paper in batch:
+                    if paper.arxiv_id not in out.done:
+                        out.write(paper.arxiv_id, paper.model_dump(mode="json"))
+                pbar.update(len(batch))
+
+
+def fetch_command(args: Namespace):
+    if args.source_cache is None and not os.getenv("ARXITEX_SOURCE_CACHE"):
+        raise ValueError("fetch needs --source-cache or ARXITEX_SOURCE_CACHE to store sources in")
+
+    cache_dir = args.source_cache or Path(os.environ["ARXITEX_SOURCE_CACHE"])
+    arxiv_ids = _read_ids(args)
+    if args.data_dir is not None:
+        arxiv_ids.extend(
+            paper.arxiv_id
+            for batch in _catalog(args, fields=["arxiv_id"])
+            for paper in batch
+        )
+
+    # SQLite connections are per thread; the cache itself is safe to share between them
+    local = threading.local()
+
+    def _fetch(arxiv_id: str) -> Optional[str]:
+        if not hasattr(local, "cache"):
+            local.cache = SourceCache(cache_dir)
+        try:
+            local.cache.fetch(arxiv_id)
+            return None
+        except Exception as e:
+            return f"{arxiv_id}: {e}"
+
+    # Already cached sources are hits without a download, so a rerun resumes for free
+    failed = 0
+    with (
+        ThreadPoolExecutor(max_workers=args.workers) as pool,
+        tqdm(total=len(arxiv_ids), desc="Fetching", unit="paper", dynamic_ncols=True) as pbar,
+    ):
+        for error in pool.map(_fetch, arxiv_ids):
+            if error is not None:
+                failed += 1
+                tqdm.write(error)
+            pbar.set_postfix(failed=failed, refresh=False)
+            pbar.update()
+
+
+def parse_command(args: Namespace):
+    papers = [Path(paper) if os.path.exists(paper) else paper for paper in _read_ids(args)]
+
+    with ShardedOutput(args.out_dir, shard_size=args.shard_size) as out:
+        _parse_into(papers, out, args, total=len(papers))
+
+
+def run_command(args: Namespace):
+    arxiv_ids = (
+        paper.arxiv_id
+        for batch in _catalog(args, fields=["arxiv_id"])
+        for paper in batch
+    )
+
+    with ShardedOutput(args.out_dir, shard_size=args.shard_size) as out:
+        _parse_into(arxiv_ids, out, args)
+
+
+def main(argv: Optional[List[str]] = None):
+    arg_parser = ArgumentParser(prog="arXiTeX", description=__doc__.split("\n\n")[0].strip())
+    subparsers = arg_parser.add_subparsers(dest="command", required=True)
+
+    catalog_parser = subparsers.add_parser("catalog", help="Write paper metadata to JSONL")
+    _add_catalog_args(catalog_parser)
+    _add_output_args(catalog_parser)
+    _add_workers_arg(catalog_parser, 1, "Processes decoding the dataset (default 1)")
+    catalog_parser.add_argument(
+        "--citations",
+        action="store_true",
+        help="Also fetch citation counts and references from SemanticScholar"
+    )
+    catalog_parser.set_defaults(handler=catalog_command)
+
+    fetch_parser = subparsers.add_parser("fetch", help="Download sources into a source cache")
+    fetch_parser.add_argument("papers", nargs="*", help="arXiv IDs")
+    fetch_parser.add_argument("--ids-file", type=Path, default=None, help="File of arXiv IDs")
+    _add_catalog_args(fetch_parser, data_dir_optional=True)
+    fetch_parser.add_argument(
+        "--source-cache",
+        type=Path,
+        default=None,
+        help="Directory of the source cache (default, $ARXITEX_SOURCE_CACHE)"
+    )
+    _add_workers_arg(fetch_parser, 4, "Concurrent downloads (default 4)")
+    fetch_parser.set_defaults(handler=fetch_command)
+
+    parse_parser = subparsers.add_parser("parse", help="Parse papers into JSONL")
+    parse_parser.add_argument("papers", nargs="*", help="arXiv IDs or paths to papers' sources")
+    parse_parser.add_argument(
+        "--ids-file", type=Path, default=None, help="File of arXiv IDs or paths, one per line"
+    )
+    _add_parse_args(parse_parser)
+    _add_output_args(parse_parser)
+    _add_workers_arg(parse_parser, os.cpu_count() or 1, "Parsing processes (default, all CPUs)")
+    parse_parser.set_defaults(handler=parse_command)
+
+    run_parser = subparsers.add_parser("run", help="Catalog, fetch and parse papers into JSONL")
+    _add_catalog_args(run_parser)
+    _add_parse_args(run_parser)
+    _add_output_args(run_parser)
+    _add_workers_arg(run_parser, os.cpu_count() or 1, "Parsing processes (default, all CPUs)")
+    run_parser.set_defaults(handler=run_command)
+
+    args = arg_parser.parse_args(argv)
+
+    try:
+        args.handler(args)
+    except KeyboardInterrupt:
+        print("Interrupted. Rerun the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+
+
+
+if __name__ == "__main__":
+    main()
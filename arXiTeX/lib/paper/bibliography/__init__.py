@@ -1,9 +1,11 @@
 import re
 import bibtexparser
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional
 from tempfile import TemporaryDirectory
-from arXiTeX.lib.utils.download_arxiv_paper import download_arxiv_paper
+from arXiTeX.lib.utils.download_arxiv_paper import read_arxiv_source
+from arXiTeX.lib.utils.source_cache import SourceCache
+from arXiTeX.lib.utils.source_tree import SourceTree, as_source_tree
 
 # Extracts the entire thebibliography environment
 _THEBIB_RE = re.compile(
@@ -103,16 +105,16 @@ def _parse_biblatex_bbl(content: str, labels: Optional[List[str]]) -> dict:
     return bibliography
 
 
-def _parse_bibitem_from_dir(paper_dir: Path, labels: Optional[List[str]]) -> dict:
+def _parse_bibitem_from_dir(tree: SourceTree, labels: Optional[List[str]]) -> dict:
     """Parse \bibitem entries from .tex and .bbl files."""
     bibliography = {}
 
-    for tex_file in paper_dir.iterdir():
+    for tex_file in tree.listdir():
         if tex_file.suffix not in ('.tex', '.bbl'):
             continue
 
         try:
-            content = tex_file.read_text(encoding='utf-8', errors='replace')
+            content = tree.read_text(tex_file, encoding='utf-8', errors='replace')
             for env_match in _THEBIB_RE.finditer(content):
                 env = env_match.group(0)
                 for item_match in _BIBITEM_RE.finditer(env):
@@ -212,12 +214,18 @@ def _build_parser(content: str) -> bibtexparser.bparser.BibTexParser:
 def parse_bibliography(
     arxiv_id: Optional[str] = None,
     paper_path: Optional[Path | str] = None,
-    labels: Optional[List[str]] = None
+    labels: Optional[List[str]] = None,
+    source_cache: Optional[SourceCache] = None,
+    downloader: Optional[Callable[[Path, str], Path | SourceTree]] = None
 ):
     if arxiv_id is not None:
+        if downloader is None:
+            tree = read_arxiv_source(arxiv_id, source_cache=source_cache)
+            return parse_bibliography_from_dir(tree, labels=labels)
+
         with TemporaryDirectory() as temp_dir:
-            paper_dir = download_arxiv_paper(Path(temp_dir), arxiv_id)
-            return parse_bibliography_from_dir(paper_dir, labels=labels)
+            source = downloader(Path(temp_dir), arxiv_id)
+            return parse_bibliography_from_dir(source, labels=labels)
     elif paper_path is not None:
         if isinstance(paper_path, str):
             paper_path = Path(paper_path)
@@ -227,15 +235,19 @@ def parse_bibliography(
             return {}
 
 
-def parse_bibliography_from_dir(paper_dir: Path, labels: Optional[List[str]] = None):
+def parse_bibliography_from_dir(
+    paper_dir: Path | SourceTree,
+    labels: Optional[List[str]] = None
+):
+    tree = as_source_tree(paper_dir)
     bibliography = {}
 
-    for bib_file in paper_dir.iterdir():
+    for bib_file in tree.listdir():
         if bib_file.suffix != ".bib":
             continue
 
         try:
-            content = bib_file.read_text(encoding="utf-8")
+            content = tree.read_text(bib_file, encoding="utf-8")
             parser = _build_parser(content)
             bib_database = bibtexparser.loads(content, parser=parser)
 
@@ -264,11 +276,11 @@ def parse_bibliography_from_dir(paper_dir: Path, labels: Optional[List[str]] = N
         return bibliography, True
 
     # Try biblatex .bbl format (\entry...\endentry blocks)
-    for bbl_file in paper_dir.iterdir():
+    for bbl_file in tree.listdir():
         if bbl_file.suffix != ".bbl":
             continue
         try:
-            content = bbl_file.read_text(encoding="utf-8", errors="replace")
+            content = tree.read_text(bbl_file, encoding="utf-8", errors="replace")
             if r"\entry{" in content:
                 bbl_bib = _parse_biblatex_bbl(content, labels)
                 if bbl_bib:
@@ -277,11 +289,11 @@ def parse_bibliography_from_dir(paper_dir: Path, labels: Optional[List[str]] = N
             print(f"Error parsing {bbl_file}: {e}")
 
     # Try amsrefs format (\bib{key}{type}{...} blocks) in .bbl files
-    for amsrefs_file in paper_dir.iterdir():
+    for amsrefs_file in tree.listdir():
         if amsrefs_file.suffix != '.bbl':
             continue
         try:
-            content = amsrefs_file.read_text(encoding="utf-8", errors="replace")
+            content = tree.read_text(amsrefs_file, encoding="utf-8", errors="replace")
             if r'\bib{' in content:
                 amsrefs_bib = _parse_amsrefs_content(content, labels)
                 if amsrefs_bib:
@@ -292,4 +304,4 @@ def parse_bibliography_from_dir(paper_dir: Path, labels: Optional[List[str]] = N
     if bibliography:
         return bibliography, False
 
-    return _parse_bibitem_from_dir(paper_dir, labels), False
+    return _parse_bibitem_from_dir(tree, labels), False
@@ -3,21 +3,97 @@ Main file of paper module. Provides a helper to iterate over arXiv metadata.
 """
 
 import zipfile
-import io
 import json
-from typing import Iterator, List
+from typing import Callable, Collection, Iterator, List, Optional
 from pathlib import Path
-from datetime import datetime, timezone
+from datetime import date
 from arXiTeX.types import ArXivPaper
+from arXiTeX.lib.utils.read_ahead import read_ahead
+from arXiTeX.lib.utils.token_bucket import TokenBucket
 from .download_arxiv_metadata import download_arxiv_metadata
-from .citations import fetch_paper_s2
+from .s2_enrichment import enrich_papers_s2
+from .citation_cache import CitationCache
+from .s2_bulk import enrich_papers_s2_bulk
 from .default_categories import DEFAULT_CATEGORIES
+from .rows import RowProjection, decode_light_line, row_to_paper, row_to_record, format_date
+from .columnar import CatalogRecord, ColumnarBatch
+from .row_filter import RowFilter
+from .parallel_decode import iter_papers_parallel
+from .snapshot_delta import SnapshotDelta
+from .sharding import ShardCursor, shard_of
+from .catalog_store import (
+    STORE_FILENAME, build_catalog_store, is_catalog_store_current, query_catalog_store,
+    zip_fingerprint
+)
+
+def _iter_zip_papers(
+    metadata_zip: Path,
+    row_filter: RowFilter,
+    delta: Optional[SnapshotDelta] = None,
+    build: Callable[[dict], ArXivPaper | CatalogRecord] = row_to_paper,
+    decode: Callable[[bytes], dict] = json.loads,
+    cursor: Optional[ShardCursor] = None
+) -> Iterator[ArXivPaper | CatalogRecord]:
+    with zipfile.ZipFile(metadata_zip, "r") as z:
+        with z.open(z.namelist()[0], "r") as f:
+            for line in f:
+                if cursor is not None and cursor.skips_line(line):
+                    continue
+                # Reject rows on their raw bytes first; only a few percent survive to be decoded
+                if not row_filter.accepts_line(line):
+                    continue
+                fingerprint = None
+                if delta is not None:
+                    fingerprint = delta.line_fingerprint(line)
+                    if not delta.is_new_or_updated(fingerprint):
+                        continue
+
+                row = decode(line)
+
+                if row_filter.accepts(row):
+                    # Only rows that pass every filter count as seen by the next delta run
+                    if delta is not None:
+                        delta.stage(fingerprint)
+                    yield build(row)
+
+def _iter_batches(
+    papers: Iterator[ArXivPaper | CatalogRecord],
+    batch_size: int,
+    columnar: bool = False,
+    fields: Optional[Collection[str]] = None
+) -> Iterator[List[ArXivPaper] | ColumnarBatch]:
+    batch: List[ArXivPaper | CatalogRecord] = []
+
+    for paper in papers:
+        batch.append(paper)
+
+        if len(batch) >= batch_size:
+            yield ColumnarBatch.from_records(batch, fields) if columnar else batch
+            batch = []
+
+    if len(batch) > 0:
+        yield ColumnarBatch.from_records(batch, fields) if columnar else batch
 
 def paper_catalog(
     download_dir: Path | str,
     categories: List[str] = DEFAULT_CATEGORIES,
-    batch_size: int = 100
-) -> Iterator[List[ArXivPaper]]:
+    batch_size: int = 100,
+    arxiv_ids: Optional[List[str]] = None,
+    updated_from: Optional[date] = None,
+    updated_to: Optional[date] = None,
+    use_store: bool = False,
+    workers: int = 1,
+    read_ahead_batches: int = 0,
+    delta_fingerprint: Optional[Path | str] = None,
+    s2_requests_per_second: Optional[float] = None,
+    citation_cache: Optional[CitationCache] = None,
+    s2_bulk_index: Optional[Path | str] = None,
+    columnar: bool = False,
+    fields: Optional[Collection[str]] = None,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    shard_cursor: Optional[Path | str] = None
+) -> Iterator[List[ArXivPaper] | ColumnarBatch]:
     """
     Generator that yields arXiv paper metadata. Filters by categories and returns results in the
     specified batch size. Citations and references work best with a SemanticScholar API key stored
@@ -33,11 +109,65 @@ def paper_catalog(
         math.AG) or just the main category (i.e. math). Default, our recommended arXiv categories.
     batch_size : int, optional
         Size of batch of paper metadatas to yield. Default, 100
-    
+    arxiv_ids : List[str], optional
+        Only yield papers with these arXiv IDs (versions are ignored). With the store, papers are
+        yielded in this order. Default, no filter.
+    updated_from : date, optional
+        Only yield papers updated on or after this date. Default, no bound.
+    updated_to : date, optional
+        Only yield papers updated on or before this date. Default, no bound.
+    use_store : bool, optional
+        Whether to query an indexed store ('arxiv.sqlite') instead of scanning 'arxiv.zip'. The
+        store is built on first use, and rebuilt whenever 'arxiv.zip' changes. Default, False.
+    workers : int, optional
+        Number of processes decoding 'arxiv.zip'. With more than one, a reader thread streams the
+        zip while a process pool decodes rows; papers keep the dataset's order. Not used with the
+        store. Default, 1.
+    read_ahead_batches : int, optional
+        Number of batches to build and enrich in a background thread while the consumer works on
+        the current one. Default, 0 (batches are built on request).
+    delta_fingerprint : Path | str, optional
+        Path to a fingerprint of the previously cataloged snapshot. If given, only yields papers in
+        `categories` that are new, or whose update date or versions changed, since then. Once the
+        catalog is fully consumed, the fingerprint is updated to the current snapshot, including
+        papers yielded before a run resumed with `shard_cursor`. Created if it doesn't exist.
+        Default, no delta (yield every paper).
+    s2_requests_per_second : float, optional
+        Rate limit for SemanticScholar requests. Enrichment runs in the background, and each
+        request holds as many papers as were decoded while waiting for the rate limit (up to the
+        API maximum), regardless of `batch_size`. Default, matched to whether
+        SEMANTIC_SCHOLAR_API_KEY is set.
+    citation_cache : CitationCache, optional
+        On-disk cache of citation data. Only papers without a fresh entry are requested from
+        SemanticScholar. Default, no cache.
+    s2_bulk_index : Path | str, optional
+        Index of local SemanticScholar bulk dataset files, built by `build_s2_bulk_index`. If
+        given, citation data is read from it instead of the SemanticScholar API. Default, use the
+        API.
+    columnar : bool, optional
+        Whether to yield ColumnarBatches, which hold each field as a list, instead of lists of
+        ArXivPapers. Rows are not validated by pydantic, which makes batches lighter to build and
+        hold, and each batch is a new object. Default, False.
+    fields : Collection[str], optional
+        ArXivPaper fields to fill ('arxiv_id' is always filled). Other fields are neither decoded
+        nor formatted, and are None (or missing columns of a ColumnarBatch); papers are then not
+        validated by pydantic. Citation data is only fetched if 'citation_count' or
+        'reference_ids' is requested. Default, all fields.
+    shard_index : int, optional
+        Only yield papers of this shard, e.g. the index of this machine. Papers are assigned to
+        shards by a stable hash of their arXiv ID (see `shard_of`), which is read before decoding,
+        so each machine only decodes its own papers. Default, 0.
+    num_shards : int, optional
+        Number of shards, e.g. the number of machines. Default, 1 (no sharding).
+    shard_cursor : Path | str, optional
+        Path to a cursor file. After each batch the consumer is done with, the position of the
+        shard is saved there, and a later call with the same cursor resumes after it, e.g. after a
+        crash. Deleted once the shard is fully consumed. Default, no cursor.
+
     Returns
     -------
-    paper_catalog : Iterator[List[Paper]]
-        Iterator of paper metadatas. Yields batches of papers.
+    paper_catalog : Iterator[List[Paper] | ColumnarBatch]
+        Iterator of paper metadatas. Yields batches of papers, or ColumnarBatches if `columnar`.
     """
 
     if isinstance(download_dir, str):
@@ -46,58 +176,97 @@ def paper_catalog(
     metadata_zip = download_dir / "arxiv.zip"
     if not metadata_zip.exists():
         download_arxiv_metadata(download_dir)
-        
-    batch: List[ArXivPaper] = []
 
-    def category_match(row_categories: List[str]) -> bool:
-        for rc in row_categories:
-            for c in categories:
-                if (c == rc) or ("." not in c and rc.startswith(c + ".")):
-                    return True
-        
-        return False
+    row_filter = RowFilter(
+        categories,
+        arxiv_ids=arxiv_ids,
+        updated_from=format_date(updated_from),
+        updated_to=format_date(updated_to),
+        shard_index=shard_index,
+        num_shards=num_shards
+    )
 
-    with zipfile.ZipFile(metadata_zip, "r") as z:
-        with z.open(z.namelist()[0], "r") as raw, io.TextIOWrapper(raw, encoding="utf-8") as f:
-            for line in f:
-                row = json.loads(line)
-                paper_id = row.get("id")
-                row_categories = row.get("categories").split()
-                
-                if not category_match(row_categories):
-                    continue
+    build = row_to_record if columnar else row_to_paper
+    decode = json.loads
+    enrich = True
+
+    if fields is not None:
+        build = RowProjection(fields, columnar=columnar)
+        enrich = build.needs_citations
+        if build.is_light:
+            decode = decode_light_line
+
+    cursor = None
+    if shard_cursor is not None:
+        cursor = ShardCursor(
+            Path(shard_cursor), zip_fingerprint(metadata_zip), shard_index, num_shards
+        )
+
+    delta = None
+    if delta_fingerprint is not None:
+        # A resumed shard skips the papers it yielded before, so their staged fingerprints stay
+        delta = SnapshotDelta(
+            Path(delta_fingerprint), resume=cursor is not None and cursor.after is not None
+        )
+
+    if use_store:
+        store_path = download_dir / STORE_FILENAME
+        if not is_catalog_store_current(store_path, metadata_zip):
+            build_catalog_store(metadata_zip, store_path)
+
+        rows = query_catalog_store(
+            store_path,
+            categories=categories,
+            arxiv_ids=arxiv_ids,
+            updated_from=row_filter.updated_from,
+            updated_to=row_filter.updated_to,
+            # The delta fingerprints version lists, which only full rows have
+            decode=decode if delta is None else json.loads,
+            shard_index=shard_index,
+            num_shards=num_shards,
+            after_arxiv_id=cursor.after if cursor is not None else None
+        )
+        if delta is not None:
+            rows = delta.new_or_updated_rows(rows)
+
+        papers = map(build, rows)
+    elif workers > 1:
+        papers = iter_papers_parallel(
+            metadata_zip, row_filter, workers, delta=delta, build=build, decode=decode,
+            cursor=cursor
+        )
+    else:
+        papers = _iter_zip_papers(
+            metadata_zip, row_filter, delta=delta, build=build, decode=decode, cursor=cursor
+        )
+
+    if enrich and s2_bulk_index is not None:
+        papers = enrich_papers_s2_bulk(papers, s2_bulk_index)
+    elif enrich:
+        rate_limiter = TokenBucket(s2_requests_per_second) if s2_requests_per_second else None
+        papers = enrich_papers_s2(papers, rate_limiter=rate_limiter, cache=citation_cache)
+
+    batches = _iter_batches(papers, batch_size, columnar=columnar, fields=fields)
+
+    if read_ahead_batches > 0:
+        batches = read_ahead(batches, size=read_ahead_batches)
+
+    try:
+        for batch in batches:
+            yield batch
+
+            if cursor is not None:
+                # Staged fingerprints first, so none of the papers before the cursor are lost
+                if delta is not None:
+                    delta.save()
+                cursor.save(batch.arxiv_id[-1] if columnar else batch[-1].arxiv_id)
+
+        if delta is not None:
+            delta.commit()
+        if cursor is not None:
+            cursor.clear()
+    finally:
+        batches.close()
 
-                paper = ArXivPaper(
-                    arxiv_id=paper_id,
-                    title=row.get("title"),
-                    authors=[" ".join(filter(None, [f, *m, l])) for (l, f, *m) in row.get("authors_parsed")],
-                    url="https://arxiv.org/pdf/" + row.get("id"),
-                    categories=row_categories,
-                    updated_at=datetime.strptime(row.get("update_date"), "%Y-%m-%d").replace(tzinfo=timezone.utc),
-                    journal_ref=row.get("journal-ref"),
-                    doi=row.get("doi"),
-                    license=row.get("license"),
-                    abstract=row.get("abstract"),
-                    citation_count=None,
-                    reference_ids=[]
-                )
-
-                batch.append(paper)
-
-                if len(batch) >= batch_size:
-                    ks, rs = fetch_paper_s2([paper.arxiv_id for paper in batch])
-                    for k, r, paper in zip(ks, rs, batch):
-                        paper.citation_count = k
-                        paper.reference_ids = r
-
-                    yield batch
-                    batch.clear()
-
-            if len(batch) > 0:
-                ks, rs = fetch_paper_s2([paper.arxiv_id for paper in batch])
-                for k, r, paper in zip(ks, rs, batch):
-                    paper.citation_count = k
-                    paper.reference_ids = r
-
-                yield batch
-                batch.clear()
\ No newline at end of file
+        if delta is not None:
+            delta.close()
@@ -0,0 +1,262 @@
+"""
+Indexed on-disk store of the arXiv Kaggle dataset. Built once from 'arxiv.zip' so that catalog
+queries by category, update date or arXiv ID only read the matching rows.
+"""
+
+import os
+import json
+import sqlite3
+import zipfile
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+from tqdm import tqdm
+from .rows import base_arxiv_id
+from .sharding import shard_of
+
+STORE_FILENAME = "arxiv.sqlite"
+
+_INSERT_CHUNK = 10_000
+_LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE papers (
+    arxiv_id    TEXT NOT NULL UNIQUE,
+    update_date TEXT NOT NULL,
+    row         TEXT NOT NULL
+);
+CREATE TABLE paper_categories (
+    paper_rowid INTEGER NOT NULL,
+    category    TEXT NOT NULL,
+    archive     TEXT NOT NULL
+);
+CREATE TABLE meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Indexes are created after the bulk insert, which is much faster than maintaining them row by row
+_INDEXES = """
+CREATE INDEX idx_papers_update_date ON papers (update_date);
+CREATE INDEX idx_paper_categories_category ON paper_categories (category, paper_rowid);
+CREATE INDEX idx_paper_categories_archive ON paper_categories (archive, paper_rowid);
+"""
+
+
+def zip_fingerprint(metadata_zip: Path) -> str:
+    """
+    Cheap fingerprint of 'arxiv.zip' (size and modification time), telling snapshots apart.
+    """
+
+    stat = metadata_zip.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def is_catalog_store_current(store_path: Path, metadata_zip: Path) -> bool:
+    """
+    Checks whether the store at `store_path` exists and was built from the current `metadata_zip`.
+    """
+
+    if not store_path.exists():
+        return False
+
+    try:
+        with sqlite3.connect(store_path) as conn:
+            found = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+    except sqlite3.Error:
+        return False
+
+    return found is not None and found[0] == zip_fingerprint(metadata_zip)
+
+
+def build_catalog_store(metadata_zip: Path, store_path: Optional[Path] = None) -> Path:
+    """
+    Builds an indexed SQLite store from the arXiv Kaggle dataset zip. The store is written to a
+    temporary file and renamed into place, so an interrupted build never leaves a partial store.
+
+    Parameters
+    ----------
+    metadata_zip : Path
+        Path to 'arxiv.zip'.
+    store_path : Path, optional
+        Where to write the store. Default, 'arxiv.sqlite' next to `metadata_zip`.
+
+    Returns
+    -------
+    store_path : Path
+        Path to the built store.
+    """
+
+    if store_path is None:
+        store_path = metadata_zip.parent / STORE_FILENAME
+
+    tmp_path = store_path.with_name(store_path.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(_SCHEMA)
+
+        papers: List[tuple] = []
+
+        def flush():
+            for paper in papers:
+                cursor = conn.execute(
+                    "INSERT OR REPLACE INTO papers (arxiv_id, update_date, row) VALUES (?, ?, ?)",
+                    paper[:3]
+                )
+                conn.executemany(
+                    "INSERT INTO paper_categories (paper_rowid, category, archive) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, c, c.split(".")[0]) for c in paper[3]]
+                )
+            papers.clear()
+
+        with zipfile.ZipFile(metadata_zip, "r") as z:
+            with z.open(z.namelist()[0], "r") as f, tqdm(
+                unit=" rows",
+                desc="Building arxiv.sqlite",
+                dynamic_ncols=True
+            ) as pbar:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    papers.append((
+                        row["id"],
+                        row["update_date"],
+                        line.decode("utf-8").rstrip("\n"),
+                        row["categories"].split()
+                    ))
+
+                    if len(papers) >= _INSERT_CHUNK:
+                        flush()
+                        pbar.update(_INSERT_CHUNK)
+
+                pbar.update(len(papers))
+                flush()
+
+        conn.executescript(_INDEXES)
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('source', ?)",
+            (zip_fingerprint(metadata_zip),)
+        )
+        conn.commit()
+    except BaseException:
+        conn.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    conn.close()
+    os.replace(tmp_path, store_path)
+
+    return store_path
+
+
+def query_catalog_store(
+    store_path: Path,
+    categories: Optional[List[str]] = None,
+    arxiv_ids: Optional[List[str]] = None,
+    updated_from: Optional[str] = None,
+    updated_to: Optional[str] = None,
+    decode: Callable[[bytes], dict] = json.loads,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    after_arxiv_id: Optional[str] = None
+) -> Iterator[dict]:
+    """
+    Yields decoded Kaggle rows from the store that match every given filter. Rows are yielded in
+    the order of `arxiv_ids` when given, otherwise in the order of the original dataset.
+
+    Parameters
+    ----------
+    store_path : Path
+        Path to a store built by `build_catalog_store`.
+    categories : List[str], optional
+        Whole category names (i.e. math.AG) or main categories (i.e. math). Default, no filter.
+    arxiv_ids : List[str], optional
+        arXiv IDs to look up. Versions are ignored. Default, no filter.
+    updated_from : str, optional
+        Inclusive lower bound on 'update_date', formatted YYYY-MM-DD. Default, no bound.
+    updated_to : str, optional
+        Inclusive upper bound on 'update_date', formatted YYYY-MM-DD. Default, no bound.
+    decode : Callable[[bytes], dict], optional
+        Decodes stored rows, e.g. `decode_light_line` to only read some fields. Default,
+        `json.loads`.
+    shard_index : int, optional
+        Only yield rows of this shard (see `shard_of`). Default, 0.
+    num_shards : int, optional
+        Number of shards. Default, 1 (no sharding).
+    after_arxiv_id : str, optional
+        Resume after the row with this arXiv ID, in the order rows are yielded. Default, start
+        from the first row.
+
+    Returns
+    -------
+    rows : Iterator[dict]
+        Iterator of decoded rows.
+    """
+
+    clauses: List[str] = []
+    params: List[str] = []
+
+    if categories is not None:
+        exact = [c for c in categories if "." in c]
+        archives = [c for c in categories if "." not in c]
+        category_clauses = []
+        if exact:
+            category_clauses.append(f"category IN ({', '.join('?' * len(exact))})")
+            params.extend(exact)
+        if archives:
+            category_clauses.append(f"archive IN ({', '.join('?' * len(archives))})")
+            params.extend(archives)
+        if not category_clauses:
+            return
+        clauses.append(
+            "rowid IN (SELECT paper_rowid FROM paper_categories WHERE "
+            + " OR ".join(category_clauses) + ")"
+        )
+
+    if updated_from is not None:
+        clauses.append("update_date >= ?")
+        params.append(updated_from)
+
+    if updated_to is not None:
+        clauses.append("update_date <= ?")
+        params.append(updated_to)
+
+    if num_shards > 1:
+        clauses.append("arxiv_shard(arxiv_id, ?) = ?")
+        params.extend([num_shards, shard_index])
+
+    conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    conn.create_function("arxiv_shard", 2, shard_of, deterministic=True)
+    try:
+        if arxiv_ids is None:
+            if after_arxiv_id is not None:
+                clauses.append("rowid > (SELECT rowid FROM papers WHERE arxiv_id = ?)")
+                params.append(after_arxiv_id)
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            for (row,) in conn.execute(
+                f"SELECT CAST(row AS BLOB) FROM papers {where} ORDER BY rowid",
+                params
+            ):
+                yield decode(row)
+            return
+
+        ids = list(dict.fromkeys(base_arxiv_id(arxiv_id) for arxiv_id in arxiv_ids))
+        if after_arxiv_id is not None and after_arxiv_id in ids:
+            ids = ids[ids.index(after_arxiv_id) + 1:]
+        for start in range(0, len(ids), _LOOKUP_CHUNK):
+            chunk = ids[start : start + _LOOKUP_CHUNK]
+            where = " AND ".join([f"arxiv_id IN ({', '.join('?' * len(chunk))})", *clauses])
+            found = dict(conn.execute(
+                f"SELECT arxiv_id, CAST(row AS BLOB) FROM papers WHERE {where}",
+                [*chunk, *params]
+            ))
+            for arxiv_id in chunk:
+                if arxiv_id in found:
+                    yield decode(found[arxiv_id])
+    finally:
+        conn.close()
@@ -0,0 +1,53 @@
+"""
+Precompiled category filter for rows of the arXiv Kaggle dataset.
+"""
+
+from typing import Iterable, List
+from .rows import CATEGORIES_FIELD_RE
+
+
+class CategoryMatcher:
+    """
+    Matches arXiv categories against a list of whole category names (i.e. math.AG) and main
+    categories (i.e. math). Precomputes both as sets, so a check costs one or two set lookups per
+    row category instead of a loop over the filter list.
+
+    Parameters
+    ----------
+    categories : List[str]
+        Categories to match.
+    """
+
+    def __init__(self, categories: List[str]):
+        self.categories = list(categories)
+        self._exact = frozenset(c for c in categories if "." in c)
+        self._archives = frozenset(c for c in categories if "." not in c)
+        self._exact_bytes = frozenset(c.encode() for c in self._exact)
+        self._archives_bytes = frozenset(c.encode() for c in self._archives)
+
+    def matches(self, row_categories: Iterable[str]) -> bool:
+        """
+        Checks whether any of `row_categories` matches.
+        """
+
+        for rc in row_categories:
+            if rc in self._exact or rc.split(".", 1)[0] in self._archives:
+                return True
+
+        return False
+
+    def matches_line(self, line: bytes) -> bool:
+        """
+        Checks whether an undecoded JSON line of the Kaggle dataset can match, reading only its
+        "categories" field. Lines without a readable field are kept so that decoding decides.
+        """
+
+        m = CATEGORIES_FIELD_RE.search(line)
+        if m is None:
+            return True
+
+        for rc in m.group(1).split():
+            if rc in self._exact_bytes or rc.split(b".", 1)[0] in self._archives_bytes:
+                return True
+
+        return False
@@ -0,0 +1,127 @@
+"""
+Persistent on-disk cache of SemanticScholar citation data, keyed by base arXiv ID.
+"""
+
+import json
+import time
+import sqlite3
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from .rows import base_arxiv_id
+
+_DAY_S = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS citations (
+    arxiv_id       TEXT PRIMARY KEY,
+    citation_count INTEGER,
+    reference_ids  TEXT NOT NULL,
+    fetched_at     REAL NOT NULL
+);
+"""
+
+
+class CitationCache:
+    """
+    SQLite cache of citation counts and reference IDs. Entries expire after a TTL that depends on
+    the paper's age: recently updated papers gain citations quickly, so their entries expire
+    sooner.
+
+    Parameters
+    ----------
+    path : Path | str
+        Path to the SQLite cache file. Created if it doesn't exist.
+    ttl_days : float, optional
+        Days before entries of older papers expire. Default, 30.
+    recent_ttl_days : float, optional
+        Days before entries of recent papers expire. Default, 7.
+    recent_days : float, optional
+        A paper is recent if it was updated within this many days. Default, 365.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        ttl_days: float = 30,
+        recent_ttl_days: float = 7,
+        recent_days: float = 365
+    ):
+        self.path = Path(path)
+        self.ttl_days = ttl_days
+        self.recent_ttl_days = recent_ttl_days
+        self.recent_days = recent_days
+        # Used by the enrichment thread, which isn't the thread that creates the cache
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def _ttl_s(self, updated_at: Optional[datetime], now: float) -> float:
+        if updated_at is not None:
+            if updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)
+            if now - updated_at.timestamp() < self.recent_days * _DAY_S:
+                return self.recent_ttl_days * _DAY_S
+
+        return self.ttl_days * _DAY_S
+
+    def get_many(
+        self,
+        papers: List[Tuple[str, Optional[datetime]]]
+    ) -> Dict[str, Tuple[Optional[int], List[str]]]:
+        """
+        Looks up fresh entries.
+
+        Parameters
+        ----------
+        papers : List[Tuple[str, datetime | None]]
+            (arXiv ID, last update) of each paper. The update date picks the TTL.
+
+        Returns
+        -------
+        found : Dict[str, Tuple[int | None, List[str]]]
+            (citation count, reference IDs) of each paper with a fresh entry, keyed by the arXiv
+            ID as given.
+        """
+
+        now = time.time()
+        found: Dict[str, Tuple[Optional[int], List[str]]] = {}
+
+        for arxiv_id, updated_at in papers:
+            entry = self._conn.execute(
+                "SELECT citation_count, reference_ids, fetched_at FROM citations WHERE arxiv_id = ?",
+                (base_arxiv_id(arxiv_id),)
+            ).fetchone()
+
+            if entry is None:
+                continue
+
+            citation_count, reference_ids, fetched_at = entry
+            if now - fetched_at < self._ttl_s(updated_at, now):
+                found[arxiv_id] = (citation_count, json.loads(reference_ids))
+
+        return found
+
+    def put_many(
+        self,
+        arxiv_ids: List[str],
+        citation_counts: List[Optional[int]],
+        all_reference_ids: List[List[str]]
+    ):
+        """
+        Stores freshly fetched entries.
+        """
+
+        now = time.time()
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO citations "
+                "(arxiv_id, citation_count, reference_ids, fetched_at) VALUES (?, ?, ?, ?)",
+                [
+                    (base_arxiv_id(arxiv_id), k, json.dumps(r), now)
+                    for arxiv_id, k, r in zip(arxiv_ids, citation_counts, all_reference_ids)
+                ]
+            )
+
+    def close(self):
+        self._conn.close()
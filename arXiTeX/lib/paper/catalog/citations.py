@@ -1,12 +1,128 @@
 import os
 import time
+import random
 import requests
-from typing import List
+from typing import List, Optional
+from arXiTeX.lib.utils.token_bucket import TokenBucket
+
+"""
+Maximum number of IDs the SemanticScholar batch endpoint accepts per request
+"""
+S2_MAX_BATCH_IDS = 500
+
+"""
+Requests per second allowed by SemanticScholar with and without an API key
+"""
+S2_RATE_WITH_KEY = 1.0
+S2_RATE_WITHOUT_KEY = 0.5
+
+_MAX_BACKOFF_S = 60.0
+
+_default_rate_limiter: Optional[TokenBucket] = None
+
+
+def default_rate_limiter() -> TokenBucket:
+    """
+    Returns the process-wide rate limiter for SemanticScholar, matched to whether
+    SEMANTIC_SCHOLAR_API_KEY is set.
+    """
+    global _default_rate_limiter
+
+    if _default_rate_limiter is None:
+        rate = S2_RATE_WITH_KEY if os.getenv("SEMANTIC_SCHOLAR_API_KEY") else S2_RATE_WITHOUT_KEY
+        _default_rate_limiter = TokenBucket(rate)
+
+    return _default_rate_limiter
+
+
+def backoff_seconds(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter, so that concurrent clients don't retry in lockstep.
+    """
+    return random.uniform(0, min(_MAX_BACKOFF_S, 2 ** (attempt + 1)))
+
+
+def format_reference_id(external_ids: dict, s2_id: Optional[str]) -> Optional[str]:
+    """
+    Formats a reference as an ARXIV (preferred), DOI-prefixed, or S2-prefixed ID. Returns None if
+    the reference has none of them.
+    """
+    if external_ids.get("ArXiv"):
+        return "ARXIV:" + external_ids["ArXiv"]
+    elif external_ids.get("DOI"):
+        return "DOI:" + external_ids["DOI"]
+    elif s2_id:
+        return "S2:" + s2_id
+    return None
+
+
+def _request_paper_s2(arxiv_ids: List[str]) -> tuple[List[int | None], List[List[str]]]:
+    arxiv_ids_formatted = ["ARXIV:" + arxiv_id.split("v")[0] for arxiv_id in arxiv_ids]
+
+    scholar_res = requests.post(
+        "https://api.semanticscholar.org/graph/v1/paper/batch",
+        params={"fields": "citationCount,references.paperId,references.externalIds"},
+        json={"ids": arxiv_ids_formatted},
+        headers={"x-api-key": os.getenv("SEMANTIC_SCHOLAR_API_KEY")},
+    )
+
+    if scholar_res.status_code == 429:
+        raise ValueError("SemanticScholar rate limit hit (429)")
+
+    if not scholar_res.ok:
+        raise ValueError(f"SemanticScholar response not OK: {scholar_res.status_code}")
+
+    scholar_data = scholar_res.json()
+
+    citation_counts = []
+    all_reference_ids = []
+
+    for paper_json in scholar_data:
+        citation_counts.append(
+            paper_json.get("citationCount", None) if paper_json else None
+        )
+
+        reference_ids = []
+        for ref in (paper_json.get("references", []) if paper_json else []):
+            reference_id = format_reference_id(ref.get("externalIds") or {}, ref.get("paperId"))
+            if reference_id is not None:
+                reference_ids.append(reference_id)
+
+        all_reference_ids.append(reference_ids)
+
+    return citation_counts, all_reference_ids
+
+
+def try_fetch_paper_s2(
+    arxiv_ids: List[str],
+    retries: int = 3,
+    rate_limiter: Optional[TokenBucket] = None,
+) -> Optional[tuple[List[int | None], List[List[str]]]]:
+    """
+    Same as `fetch_paper_s2`, but returns None when every attempt failed, so that failures can be
+    told apart from papers SemanticScholar doesn't know.
+    """
+    if rate_limiter is None:
+        rate_limiter = default_rate_limiter()
+
+    for attempt in range(retries + 1):
+        rate_limiter.acquire()
+
+        try:
+            return _request_paper_s2(arxiv_ids)
+        except Exception as e:
+            if attempt < retries:
+                sleep_s = backoff_seconds(attempt)
+                print(f"Sleeping {sleep_s:.1f}s for SemanticScholar ({e})")
+                time.sleep(sleep_s)
+
+    return None
+
 
 def fetch_paper_s2(
     arxiv_ids: List[str],
     retries: int = 3,
-    _attempt: int = 0,
+    rate_limiter: Optional[TokenBucket] = None,
 ) -> tuple[List[int | None], List[List[str]]]:
     """
     Fetches the citation count and references of papers by their arXiv IDs using
@@ -15,9 +131,13 @@ def fetch_paper_s2(
     Parameters
     ----------
     arxiv_ids : List[str]
-        List of papers' arXiv IDs.
+        List of papers' arXiv IDs. At most `S2_MAX_BATCH_IDS`.
     retries : int, optional
-        Number of retries allowed on failure. Default 3.
+        Number of retries allowed on failure. Retries back off exponentially with jitter.
+        Default 3.
+    rate_limiter : TokenBucket, optional
+        Rate limiter every request waits on. Default, one shared by the process and matched to
+        whether SEMANTIC_SCHOLAR_API_KEY is set.
 
     Returns
     -------
@@ -27,56 +147,8 @@ def fetch_paper_s2(
         The list of ARXIV (preferred), DOI-prefixed, or S2-prefixed reference IDs
         for each paper in the same order.
     """
-    empty_result = [None] * len(arxiv_ids), [[] for _ in arxiv_ids]
-
-    arxiv_ids_formatted = ["ARXIV:" + arxiv_id.split("v")[0] for arxiv_id in arxiv_ids]
-
-    try:
-        time.sleep(2)  # guarantee we don't make more than 1 request per second
-
-        scholar_res = requests.post(
-            "https://api.semanticscholar.org/graph/v1/paper/batch",
-            params={"fields": "citationCount,references.paperId,references.externalIds"},
-            json={"ids": arxiv_ids_formatted},
-            headers={"x-api-key": os.getenv("SEMANTIC_SCHOLAR_API_KEY")},
-        )
-
-        if scholar_res.status_code == 429:
-            raise ValueError("SemanticScholar rate limit hit (429)")
-
-        if not scholar_res.ok:
-            raise ValueError(f"SemanticScholar response not OK: {scholar_res.status_code}")
-
-        scholar_data = scholar_res.json()
-
-        citation_counts = []
-        all_reference_ids = []
-
-        for paper_json in scholar_data:
-            citation_counts.append(
-                paper_json.get("citationCount", None) if paper_json else None
-            )
-
-            reference_ids = []
-            for ref in (paper_json.get("references", []) if paper_json else []):
-                external_ids = ref.get("externalIds") or {}
-
-                if "ArXiv" in external_ids:
-                    reference_ids.append("ARXIV:" + external_ids["ArXiv"])
-                elif "DOI" in external_ids:
-                    reference_ids.append("DOI:" + external_ids["DOI"])
-                elif s2_id := ref.get("paperId"):
-                    reference_ids.append("S2:" + s2_id)
-
-            all_reference_ids.append(reference_ids)
-
-        return citation_counts, all_reference_ids
-
-    except Exception as e:
-        if retries > 0:
-            sleep_s = 2 ** _attempt
-            print(f"Sleeping {sleep_s}s for SemanticScholar ({e})")
-            time.sleep(sleep_s)
-            return fetch_paper_s2(arxiv_ids, retries - 1, _attempt + 1)
+    result = try_fetch_paper_s2(arxiv_ids, retries=retries, rate_limiter=rate_limiter)
+    if result is None:
+        return [None] * len(arxiv_ids), [[] for _ in arxiv_ids]
 
-    return empty_result
\ No newline at end of file
+    return result
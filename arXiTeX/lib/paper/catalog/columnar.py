@@ -0,0 +1,108 @@
+"""
+Lightweight, columnar alternative to batches of ArXivPapers.
+"""
+
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Any, Collection, Dict, List, Optional
+from arXiTeX.types import ArXivPaper
+
+
+@dataclass(slots=True)
+class CatalogRecord:
+    """
+    Unvalidated catalog row with the same fields as ArXivPaper. Used on the way to a ColumnarBatch,
+    where pydantic validation of every row isn't needed. Fields left out by a projection are None.
+    """
+
+    arxiv_id: str
+    title: Optional[str] = None
+    authors: Optional[List[str]] = None
+    url: Optional[str] = None
+    categories: Optional[List[str]] = None
+    updated_at: Optional[datetime] = None
+    journal_ref: Optional[str] = None
+    doi: Optional[str] = None
+    license: Optional[str] = None
+    abstract: Optional[str] = None
+    citation_count: Optional[int] = None
+    reference_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ColumnarBatch:
+    """
+    Batch of catalog rows stored as parallel lists, one per ArXivPaper field. Row i of the batch is
+    made of element i of every column. Columns left out by a projection are None.
+    """
+
+    arxiv_id: List[str] = field(default_factory=list)
+    title: Optional[List[str]] = None
+    authors: Optional[List[List[str]]] = None
+    url: Optional[List[str]] = None
+    categories: Optional[List[List[str]]] = None
+    updated_at: Optional[List[datetime]] = None
+    journal_ref: Optional[List[Optional[str]]] = None
+    doi: Optional[List[Optional[str]]] = None
+    license: Optional[List[Optional[str]]] = None
+    abstract: Optional[List[str]] = None
+    citation_count: Optional[List[Optional[int]]] = None
+    reference_ids: Optional[List[List[str]]] = None
+
+    @classmethod
+    def from_records(
+        cls,
+        records: List[CatalogRecord],
+        columns: Optional[Collection[str]] = None
+    ) -> "ColumnarBatch":
+        """
+        Builds a batch from catalog records, with only `columns` when given ('arxiv_id' is always
+        included).
+        """
+
+        return cls(**{
+            f.name: [getattr(record, f.name) for record in records]
+            for f in fields(cls)
+            if columns is None or f.name in columns or f.name == "arxiv_id"
+        })
+
+    def __len__(self) -> int:
+        return len(self.arxiv_id)
+
+    def to_pydict(self) -> Dict[str, List[Any]]:
+        """
+        Returns the columns that are present as a dict of lists, e.g. for `pandas.DataFrame` or
+        `pyarrow.RecordBatch.from_pydict`.
+        """
+
+        return {
+            f.name: getattr(self, f.name)
+            for f in fields(self)
+            if getattr(self, f.name) is not None
+        }
+
+    def to_arrow(self):
+        """
+        Converts the batch to a `pyarrow.RecordBatch`. Requires pyarrow.
+        """
+
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("ColumnarBatch.to_arrow requires pyarrow: pip install arXiTeX[arrow]")
+
+        return pa.RecordBatch.from_pydict(self.to_pydict())
+
+    def to_papers(self) -> List[ArXivPaper]:
+        """
+        Converts the batch to ArXivPapers. They are validated only when no column is missing.
+        """
+
+        columns = self.to_pydict()
+
+        build = ArXivPaper if len(columns) == len(fields(self)) else ArXivPaper.model_construct
+
+        return [
+            build(**{name: column[i] for name, column in columns.items()})
+            for i in range(len(self))
+        ]
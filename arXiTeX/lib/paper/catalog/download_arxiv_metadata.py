@@ -1,32 +1,295 @@
 """
-Helper to download all arXiv metadata from the Kaggle arXiv dataset.
+Helper to download all arXiv metadata from the Kaggle arXiv dataset. Downloads into a temporary
+file with parallel, resumable HTTP range requests, verifies it, and only then renames it to
+'arxiv.zip'.
 """
 
+import os
+import re
+import json
+import base64
+import hashlib
+import threading
 import requests
 from pathlib import Path
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
-def download_arxiv_metadata(download_dir: Path):
-    download_dir.mkdir(exist_ok=True)
+KAGGLE_ARXIV_URL = "https://www.kaggle.com/api/v1/datasets/download/Cornell-University/arxiv"
 
-    url = "https://www.kaggle.com/api/v1/datasets/download/Cornell-University/arxiv"
-    out_path = download_dir / "arxiv.zip"
+_CHUNK_SIZE = 1024 * 1024
+_SAVE_EVERY_CHUNKS = 64
+
+"""
+Seconds to wait for a connection or data before a request fails
+"""
+_REQUEST_TIMEOUT_S = 60
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+_GOOG_MD5_RE = re.compile(r"md5=([A-Za-z0-9+/=]+)")
+
+
+class _DownloadState:
+    """
+    Progress of a download, saved next to the temporary file so that it can be resumed. Each range
+    is [start, end, done]: `end` is inclusive and `done` counts bytes written from `start`.
+    """
+
+    def __init__(self, path: Path, total: int, etag: Optional[str], ranges: List[List[int]]):
+        self.path = path
+        self.total = total
+        self.etag = etag
+        self.ranges = ranges
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["_DownloadState"]:
+        try:
+            data = json.loads(path.read_text())
+            return cls(path, data["total"], data["etag"], data["ranges"])
+        except Exception:
+            return None
+
+    def advance(self, i: int, n: int):
+        with self._lock:
+            self.ranges[i][2] += n
+
+    def save(self):
+        # Range threads share the temporary file, so it's written and renamed under the lock
+        with self._lock:
+            data = {"total": self.total, "etag": self.etag, "ranges": self.ranges}
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(json.dumps(data))
+            os.replace(tmp_path, self.path)
+
+    @property
+    def done(self) -> int:
+        with self._lock:
+            return sum(done for _, _, done in self.ranges)
+
+
+def _probe(url: str) -> tuple[str, Optional[int], bool, Optional[str], Optional[str]]:
+    """
+    Returns (final URL after redirects, total size, whether ranges are supported, ETag, MD5 as
+    base64). Asks for a single byte so that no body is downloaded.
+    """
 
-    with requests.get(url, stream=True) as r:
+    with requests.get(
+        url,
+        headers={"Range": "bytes=0-0"},
+        stream=True,
+        allow_redirects=True,
+        timeout=_REQUEST_TIMEOUT_S
+    ) as r:
         r.raise_for_status()
 
-        total = int(r.headers.get("Content-Length", 0))
-
-        with open(out_path, "wb") as f, tqdm(
-            total=total,
-            unit="B",
-            unit_scale=True,
-            unit_divisor=1024,
-            desc="Downloading arxiv.zip",
-            dynamic_ncols=True
-        ) as pbar:
-            for chunk in r.iter_content(chunk_size=1024 * 1024):
+        etag = r.headers.get("ETag")
+        md5_match = _GOOG_MD5_RE.search(r.headers.get("x-goog-hash", ""))
+        md5 = md5_match.group(1) if md5_match else None
+
+        if r.status_code == 206:
+            m = _CONTENT_RANGE_RE.match(r.headers.get("Content-Range", ""))
+            return r.url, int(m.group(1)) if m else None, m is not None, etag, md5
+
+        length = r.headers.get("Content-Length")
+        return r.url, int(length) if length else None, False, etag, md5
+
+
+def _fetch_range(
+    url: str,
+    part_path: Path,
+    state: _DownloadState,
+    i: int,
+    pbar: tqdm,
+    retries: int
+):
+    attempt = 0
+
+    while True:
+        start, end, done = state.ranges[i]
+        if start + done > end:
+            return
+
+        try:
+            with requests.get(
+                url,
+                headers={"Range": f"bytes={start + done}-{end}"},
+                stream=True,
+                timeout=_REQUEST_TIMEOUT_S
+            ) as r:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise ValueError(f"Server ignored range request ({r.status_code})")
+
+                with open(part_path, "r+b") as f:
+                    f.seek(start + done)
+                    for n_chunks, chunk in enumerate(r.iter_content(chunk_size=_CHUNK_SIZE), 1):
+                        chunk = chunk[:end + 1 - f.tell()]
+                        if not chunk:
+                            continue
+                        f.write(chunk)
+                        state.advance(i, len(chunk))
+                        pbar.update(len(chunk))
+
+                        # Progress is only recorded for bytes already flushed to the file
+                        if n_chunks % _SAVE_EVERY_CHUNKS == 0:
+                            f.flush()
+                            state.save()
+
+            if state.ranges[i][2] == done:
+                raise ValueError("Connection closed without data")
+        except Exception as e:
+            # Dropped connections that made progress don't use up retries
+            if state.ranges[i][2] > done:
+                attempt = 0
+            if attempt >= retries:
+                raise
+            attempt += 1
+            print(f"Retrying range {i} of arxiv.zip ({e})")
+        finally:
+            state.save()
+
+
+def _fetch_whole(url: str, part_path: Path, pbar: tqdm) -> int:
+    written = 0
+
+    with requests.get(url, stream=True, timeout=_REQUEST_TIMEOUT_S) as r:
+        r.raise_for_status()
+
+        with open(part_path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=_CHUNK_SIZE):
                 if not chunk:
                     continue
                 f.write(chunk)
-                pbar.update(len(chunk))
\ No newline at end of file
+                written += len(chunk)
+                pbar.update(len(chunk))
+
+    return written
+
+
+def _verify(
+    part_path: Path,
+    total: Optional[int],
+    md5: Optional[str],
+    expected_sha256: Optional[str]
+):
+    size = part_path.stat().st_size
+    if total is not None and size != total:
+        raise ValueError(f"Downloaded arxiv.zip has {size} bytes, expected {total}")
+
+    if md5 is None and expected_sha256 is None:
+        return
+
+    md5_hash = hashlib.md5()
+    sha256_hash = hashlib.sha256()
+
+    with open(part_path, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            if md5 is not None:
+                md5_hash.update(chunk)
+            if expected_sha256 is not None:
+                sha256_hash.update(chunk)
+
+    if md5 is not None and base64.b64encode(md5_hash.digest()).decode() != md5:
+        raise ValueError("Downloaded arxiv.zip failed its MD5 check")
+
+    if expected_sha256 is not None and sha256_hash.hexdigest() != expected_sha256.lower():
+        raise ValueError("Downloaded arxiv.zip failed its SHA-256 check")
+
+
+def download_arxiv_metadata(
+    download_dir: Path,
+    url: str = KAGGLE_ARXIV_URL,
+    parts: int = 4,
+    expected_sha256: Optional[str] = None,
+    retries: int = 5
+) -> Path:
+    """
+    Downloads the arXiv Kaggle dataset to 'arxiv.zip' in `download_dir`. The download goes to
+    'arxiv.zip.part' and resumes from there if interrupted. It is split into `parts` ranges fetched
+    in parallel when the server supports range requests. Before being renamed to 'arxiv.zip', the
+    file's size is checked, along with its MD5 when the server reports one (as Google Cloud Storage
+    does) and `expected_sha256` when given.
+
+    Parameters
+    ----------
+    download_dir : Path
+        Directory to download 'arxiv.zip' into.
+    url : str, optional
+        URL of the dataset zip. Default, the Kaggle download URL.
+    parts : int, optional
+        Number of ranges to fetch in parallel. Default, 4.
+    expected_sha256 : str, optional
+        Hex SHA-256 the downloaded file must have. Default, no check.
+    retries : int, optional
+        Number of retries per range after a dropped connection. Default, 5.
+
+    Returns
+    -------
+    metadata_zip : Path
+        Path to the verified 'arxiv.zip'.
+    """
+
+    download_dir.mkdir(exist_ok=True)
+
+    out_path = download_dir / "arxiv.zip"
+    part_path = download_dir / "arxiv.zip.part"
+    state_path = download_dir / "arxiv.zip.part.json"
+
+    final_url, total, accepts_ranges, etag, md5 = _probe(url)
+
+    with tqdm(
+        total=total,
+        unit="B",
+        unit_scale=True,
+        unit_divisor=1024,
+        desc="Downloading arxiv.zip",
+        dynamic_ncols=True
+    ) as pbar:
+        if accepts_ranges and total:
+            state = _DownloadState.load(state_path)
+
+            if (
+                state is None
+                or state.total != total
+                or state.etag != etag
+                or not part_path.exists()
+            ):
+                part_size = -(-total // max(1, parts))
+                state = _DownloadState(state_path, total, etag, [
+                    [start, min(start + part_size, total) - 1, 0]
+                    for start in range(0, total, part_size)
+                ])
+                with open(part_path, "wb") as f:
+                    f.truncate(total)
+                state.save()
+
+            pbar.update(state.done)
+
+            with ThreadPoolExecutor(max_workers=len(state.ranges)) as pool:
+                futures = [
+                    pool.submit(_fetch_range, final_url, part_path, state, i, pbar, retries)
+                    for i in range(len(state.ranges))
+                ]
+                for future in futures:
+                    future.result()
+
+            if state.done != total:
+                raise ValueError(f"Downloaded {state.done} of {total} bytes of arxiv.zip")
+        else:
+            written = _fetch_whole(final_url, part_path, pbar)
+            if total is None:
+                total = written
+
+    try:
+        _verify(part_path, total, md5, expected_sha256)
+    except ValueError:
+        # A corrupt file can't be resumed; start over next time
+        part_path.unlink(missing_ok=True)
+        state_path.unlink(missing_ok=True)
+        raise
+
+    os.replace(part_path, out_path)
+    state_path.unlink(missing_ok=True)
+
+    return out_path
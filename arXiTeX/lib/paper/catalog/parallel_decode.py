@@ -0,0 +1,151 @@
+"""
+Multi-core decoding of the arXiv Kaggle dataset. A reader thread streams decompressed lines out of
+'arxiv.zip' and a process pool decodes and validates them, preserving the order of the dataset.
+"""
+
+import json
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Iterator, List, Optional, Tuple
+from arXiTeX.types import ArXivPaper
+from arXiTeX.lib.utils.read_ahead import read_ahead
+from .row_filter import RowFilter
+from .rows import row_to_paper
+from .snapshot_delta import Fingerprint, SnapshotDelta
+from .sharding import ShardCursor
+from .columnar import CatalogRecord
+
+_CHUNK_LINES = 2_000
+
+
+def _iter_line_chunks(
+    metadata_zip: Path,
+    row_filter: RowFilter,
+    delta: Optional[SnapshotDelta],
+    cursor: Optional[ShardCursor]
+) -> Iterator[Tuple[List[bytes], List[Optional[Fingerprint]]]]:
+    """
+    Yields chunks of undecoded lines that pass the byte-level filter and, optionally, come after
+    the cursor and pass the snapshot delta, with their fingerprints if there is a delta. All of
+    these run here, in the reader, so that rejected rows are never shipped to the worker
+    processes.
+    """
+
+    chunk: List[bytes] = []
+    fingerprints: List[Optional[Fingerprint]] = []
+
+    with zipfile.ZipFile(metadata_zip, "r") as z:
+        with z.open(z.namelist()[0], "r") as f:
+            for line in f:
+                if cursor is not None and cursor.skips_line(line):
+                    continue
+                if not row_filter.accepts_line(line):
+                    continue
+
+                fingerprint = None
+                if delta is not None:
+                    fingerprint = delta.line_fingerprint(line)
+                    if not delta.is_new_or_updated(fingerprint):
+                        continue
+
+                chunk.append(line)
+                fingerprints.append(fingerprint)
+
+                if len(chunk) >= _CHUNK_LINES:
+                    yield chunk, fingerprints
+                    chunk = []
+                    fingerprints = []
+
+    if len(chunk) > 0:
+        yield chunk, fingerprints
+
+
+def _decode_chunk(
+    lines: List[bytes],
+    row_filter: RowFilter,
+    build: Callable[[dict], ArXivPaper | CatalogRecord],
+    decode: Callable[[bytes], dict]
+) -> List[Optional[ArXivPaper | CatalogRecord]]:
+    """
+    Decodes a chunk of lines. Returns a paper per line, or None for lines rejected by
+    `row_filter`.
+    """
+
+    papers: List[Optional[ArXivPaper | CatalogRecord]] = []
+
+    for line in lines:
+        row = decode(line)
+        papers.append(build(row) if row_filter.accepts(row) else None)
+
+    return papers
+
+
+def iter_papers_parallel(
+    metadata_zip: Path,
+    row_filter: RowFilter,
+    workers: int,
+    delta: Optional[SnapshotDelta] = None,
+    build: Callable[[dict], ArXivPaper | CatalogRecord] = row_to_paper,
+    decode: Callable[[bytes], dict] = json.loads,
+    cursor: Optional[ShardCursor] = None
+) -> Iterator[ArXivPaper | CatalogRecord]:
+    """
+    Yields the papers of 'arxiv.zip' that pass `row_filter`, decoded by `workers` processes. Papers
+    are yielded in the order of the dataset.
+
+    Parameters
+    ----------
+    metadata_zip : Path
+        Path to 'arxiv.zip'.
+    row_filter : RowFilter
+        Filter for rows.
+    workers : int
+        Number of decoding processes.
+    delta : SnapshotDelta, optional
+        If given, only papers that are new or updated since the previous snapshot are decoded.
+    build : Callable[[dict], ArXivPaper | CatalogRecord], optional
+        Picklable callable turning decoded rows into papers. Default, `row_to_paper`.
+    decode : Callable[[bytes], dict], optional
+        Picklable callable decoding lines into rows. Default, `json.loads`.
+    cursor : ShardCursor, optional
+        If given, lines up to the saved position are skipped without being decoded.
+
+    Returns
+    -------
+    papers : Iterator[ArXivPaper | CatalogRecord]
+        Iterator of papers without citation data.
+    """
+
+    max_pending = 2 * workers
+
+    def _accepted(future: Future, fingerprints: List[Optional[Fingerprint]]):
+        for paper, fingerprint in zip(future.result(), fingerprints):
+            if paper is None:
+                continue
+            # Only rows that pass every filter count as seen by the next delta run
+            if delta is not None:
+                delta.stage(fingerprint)
+            yield paper
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Deque[Tuple[Future, List[Optional[Fingerprint]]]] = deque()
+
+        try:
+            for chunk, fingerprints in read_ahead(
+                _iter_line_chunks(metadata_zip, row_filter, delta, cursor),
+                size=max_pending
+            ):
+                future = pool.submit(_decode_chunk, chunk, row_filter, build, decode)
+                pending.append((future, fingerprints))
+
+                # Futures are consumed in submission order, which keeps the output deterministic
+                if len(pending) >= max_pending:
+                    yield from _accepted(*pending.popleft())
+
+            while pending:
+                yield from _accepted(*pending.popleft())
+        finally:
+            for future, _ in pending:
+                future.cancel()
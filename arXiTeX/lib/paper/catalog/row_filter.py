@@ -0,0 +1,83 @@
+"""
+Filter for rows of the arXiv Kaggle dataset, applied before and after JSON decoding.
+"""
+
+from typing import List, Optional
+from .category_matcher import CategoryMatcher
+from .rows import base_arxiv_id
+from .sharding import shard_of, shard_of_line
+
+
+class RowFilter:
+    """
+    Filters Kaggle rows by shard, category, arXiv ID and update date. Picklable, so it can be
+    shipped to decoding worker processes.
+
+    Parameters
+    ----------
+    categories : List[str]
+        Whole category names (i.e. math.AG) or main categories (i.e. math).
+    arxiv_ids : List[str], optional
+        arXiv IDs to keep. Versions are ignored. Default, no filter.
+    updated_from : str, optional
+        Inclusive lower bound on 'update_date', formatted YYYY-MM-DD. Default, no bound.
+    updated_to : str, optional
+        Inclusive upper bound on 'update_date', formatted YYYY-MM-DD. Default, no bound.
+    shard_index : int, optional
+        Only keep rows of this shard (see `shard_of`). Default, 0.
+    num_shards : int, optional
+        Number of shards. Default, 1 (no sharding).
+    """
+
+    def __init__(
+        self,
+        categories: List[str],
+        arxiv_ids: Optional[List[str]] = None,
+        updated_from: Optional[str] = None,
+        updated_to: Optional[str] = None,
+        shard_index: int = 0,
+        num_shards: int = 1
+    ):
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(f"Shard index {shard_index} is out of range for {num_shards} shards")
+
+        self.matcher = CategoryMatcher(categories)
+        self.wanted_ids = (
+            frozenset(base_arxiv_id(arxiv_id) for arxiv_id in arxiv_ids)
+            if arxiv_ids is not None else None
+        )
+        self.updated_from = updated_from
+        self.updated_to = updated_to
+        self.shard_index = shard_index
+        self.num_shards = num_shards
+
+    def accepts_line(self, line: bytes) -> bool:
+        """
+        Checks whether an undecoded line can pass the filter. Cheap; only reads the ID (when
+        sharded) and the categories.
+        """
+
+        if self.num_shards > 1:
+            shard = shard_of_line(line, self.num_shards)
+            if shard is not None and shard != self.shard_index:
+                return False
+
+        return self.matcher.matches_line(line)
+
+    def accepts(self, row: dict) -> bool:
+        """
+        Checks whether a decoded row passes the filter.
+        """
+
+        if self.num_shards > 1 and shard_of(row.get("id"), self.num_shards) != self.shard_index:
+            return False
+        if not self.matcher.matches(row.get("categories").split()):
+            return False
+        if self.wanted_ids is not None and row.get("id") not in self.wanted_ids:
+            return False
+        if self.updated_from is not None and row.get("update_date") < self.updated_from:
+            return False
+        if self.updated_to is not None and row.get("update_date") > self.updated_to:
+            return False
+
+        return True
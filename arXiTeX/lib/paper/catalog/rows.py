@@ -0,0 +1,211 @@
+"""
+Helpers for turning rows of the arXiv Kaggle dataset into ArXivPapers.
+"""
+
+import re
+import json
+from datetime import date, datetime, timezone
+from typing import Callable, Collection, Dict, List, Optional
+from arXiTeX.types import ArXivPaper
+from .columnar import CatalogRecord
+
+_VERSION_SUFFIX_RE = re.compile(r"v\d+$")
+
+# Raw fields of an undecoded JSON line. IDs, categories and dates never contain quotes or escapes,
+# so they can be read without decoding the rest of the line.
+ID_FIELD_RE = re.compile(rb'"id"\s*:\s*"([^"]*)"')
+CATEGORIES_FIELD_RE = re.compile(rb'"categories"\s*:\s*"([^"]*)"')
+UPDATE_DATE_FIELD_RE = re.compile(rb'"update_date"\s*:\s*"([^"]*)"')
+
+"""
+ArXivPaper fields filled by citation enrichment
+"""
+CITATION_FIELDS = frozenset({"citation_count", "reference_ids"})
+
+"""
+ArXivPaper fields that can be read from a line without decoding it
+"""
+LIGHT_FIELDS = frozenset({"arxiv_id", "url", "categories", "updated_at"})
+
+
+def base_arxiv_id(arxiv_id: str) -> str:
+    """
+    Strips the version suffix (e.g. 'v2') from an arXiv ID.
+
+    Parameters
+    ----------
+    arxiv_id : str
+        arXiv ID, with or without version.
+
+    Returns
+    -------
+    base_id : str
+        The arXiv ID without version.
+    """
+
+    return _VERSION_SUFFIX_RE.sub("", arxiv_id.strip())
+
+
+def format_date(d: Optional[date]) -> Optional[str]:
+    """
+    Formats a date like the 'update_date' field of the Kaggle dataset (YYYY-MM-DD), so that dates
+    can be compared as strings.
+    """
+
+    return d.strftime("%Y-%m-%d") if d is not None else None
+
+
+def _authors(row: dict) -> List[str]:
+    return [" ".join(filter(None, [f, *m, l])) for (l, f, *m) in row.get("authors_parsed")]
+
+
+def _updated_at(row: dict) -> datetime:
+    return datetime.fromisoformat(row.get("update_date")).replace(tzinfo=timezone.utc)
+
+
+def row_to_paper(row: dict) -> ArXivPaper:
+    """
+    Converts a decoded row of the arXiv Kaggle dataset into an ArXivPaper. Citation fields are left
+    empty.
+
+    Parameters
+    ----------
+    row : dict
+        A decoded JSON line of the Kaggle dataset.
+
+    Returns
+    -------
+    paper : ArXivPaper
+        The paper's metadata.
+    """
+
+    return ArXivPaper(
+        arxiv_id=row.get("id"),
+        title=row.get("title"),
+        authors=_authors(row),
+        url="https://arxiv.org/pdf/" + row.get("id"),
+        categories=row.get("categories").split(),
+        updated_at=_updated_at(row),
+        journal_ref=row.get("journal-ref"),
+        doi=row.get("doi"),
+        license=row.get("license"),
+        abstract=row.get("abstract"),
+        citation_count=None,
+        reference_ids=[]
+    )
+
+
+def row_to_record(row: dict) -> CatalogRecord:
+    """
+    Converts a decoded row of the arXiv Kaggle dataset into an unvalidated CatalogRecord, for
+    columnar batches. Citation fields are left empty.
+
+    Parameters
+    ----------
+    row : dict
+        A decoded JSON line of the Kaggle dataset.
+
+    Returns
+    -------
+    record : CatalogRecord
+        The paper's metadata.
+    """
+
+    return CatalogRecord(
+        arxiv_id=row.get("id"),
+        title=row.get("title"),
+        authors=_authors(row),
+        url="https://arxiv.org/pdf/" + row.get("id"),
+        categories=row.get("categories").split(),
+        updated_at=_updated_at(row),
+        journal_ref=row.get("journal-ref"),
+        doi=row.get("doi"),
+        license=row.get("license"),
+        abstract=row.get("abstract")
+    )
+
+
+_FIELD_BUILDERS: Dict[str, Callable[[dict], object]] = {
+    "arxiv_id": lambda row: row.get("id"),
+    "title": lambda row: row.get("title"),
+    "authors": _authors,
+    "url": lambda row: "https://arxiv.org/pdf/" + row.get("id"),
+    "categories": lambda row: row.get("categories").split(),
+    "updated_at": _updated_at,
+    "journal_ref": lambda row: row.get("journal-ref"),
+    "doi": lambda row: row.get("doi"),
+    "license": lambda row: row.get("license"),
+    "abstract": lambda row: row.get("abstract"),
+}
+
+
+def decode_light_line(line: bytes) -> dict:
+    """
+    Decodes only the 'id', 'categories' and 'update_date' fields of a JSON line of the Kaggle
+    dataset, which is all that LIGHT_FIELDS and catalog filters need. Falls back to decoding the
+    whole line if any of them can't be read.
+    """
+
+    id_match = ID_FIELD_RE.search(line)
+    categories_match = CATEGORIES_FIELD_RE.search(line)
+    date_match = UPDATE_DATE_FIELD_RE.search(line)
+
+    if id_match is None or categories_match is None or date_match is None:
+        return json.loads(line)
+
+    return {
+        "id": id_match.group(1).decode(),
+        "categories": categories_match.group(1).decode(),
+        "update_date": date_match.group(1).decode()
+    }
+
+
+class RowProjection:
+    """
+    Converts decoded rows into papers holding only the requested fields. Other fields are neither
+    read nor formatted, and are left as None (and out of `model_dump(exclude_unset=True)`).
+    Picklable, so it can be shipped to decoding worker processes.
+
+    Parameters
+    ----------
+    fields : Collection[str]
+        ArXivPaper fields to keep. 'arxiv_id' is always kept.
+    columnar : bool, optional
+        Whether to build CatalogRecords instead of (unvalidated) ArXivPapers. Default, False.
+    """
+
+    def __init__(self, fields: Collection[str], columnar: bool = False):
+        unknown = set(fields) - set(_FIELD_BUILDERS) - CITATION_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown ArXivPaper fields: {', '.join(sorted(unknown))}")
+
+        self.fields = frozenset(fields) | {"arxiv_id"}
+        self.columnar = columnar
+        self._row_fields = [name for name in _FIELD_BUILDERS if name in self.fields]
+        self._unset = {
+            name: None for name in ArXivPaper.model_fields if name not in self.fields
+        }
+
+    @property
+    def is_light(self) -> bool:
+        """Whether rows only need `decode_light_line` to be decoded."""
+        return self.fields <= LIGHT_FIELDS
+
+    @property
+    def needs_citations(self) -> bool:
+        """Whether any citation field is requested."""
+        return bool(self.fields & CITATION_FIELDS)
+
+    def __call__(self, row: dict) -> ArXivPaper | CatalogRecord:
+        values = {name: _FIELD_BUILDERS[name](row) for name in self._row_fields}
+
+        if "citation_count" in self.fields:
+            values["citation_count"] = None
+        if "reference_ids" in self.fields:
+            values["reference_ids"] = []
+
+        if self.columnar:
+            return CatalogRecord(**values)
+
+        # Unrequested fields are None, which pydantic only allows without validation
+        return ArXivPaper.model_construct(_fields_set=set(values), **values, **self._unset)
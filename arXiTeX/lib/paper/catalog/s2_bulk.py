@@ -0,0 +1,189 @@
+"""
+Offline citation enrichment from local SemanticScholar bulk dataset files. An index keyed by arXiv
+ID is built once from the 'papers' and 'citations' JSONL shards, then joined against catalog
+papers while they stream.
+"""
+
+import os
+import gzip
+import json
+import sqlite3
+from pathlib import Path
+from typing import IO, Iterator, List, Optional
+from tqdm import tqdm
+from arXiTeX.types import ArXivPaper
+from .citations import format_reference_id
+from .rows import base_arxiv_id
+
+_INSERT_CHUNK = 10_000
+
+_SCHEMA = """
+CREATE TABLE papers (
+    corpus_id      INTEGER PRIMARY KEY,
+    arxiv_id       TEXT,
+    doi            TEXT,
+    s2_id          TEXT,
+    citation_count INTEGER
+);
+CREATE TABLE refs (
+    citing INTEGER NOT NULL,
+    cited  INTEGER NOT NULL
+);
+"""
+
+_INDEXES = """
+CREATE INDEX idx_papers_arxiv_id ON papers (arxiv_id);
+CREATE INDEX idx_refs_citing ON refs (citing);
+"""
+
+
+def _open_shard(path: Path) -> IO[bytes]:
+    return gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+
+
+def _s2_id_from_url(url: Optional[str]) -> Optional[str]:
+    # Bulk records carry the SemanticScholar paper ID only as the last segment of their URL
+    return url.rstrip("/").rsplit("/", 1)[-1] if url else None
+
+
+def build_s2_bulk_index(
+    papers_files: List[Path | str],
+    citations_files: List[Path | str],
+    index_path: Path | str
+) -> Path:
+    """
+    Builds an SQLite index from SemanticScholar bulk dataset shards. Only citations made by arXiv
+    papers are kept. The index is written to a temporary file and renamed into place.
+
+    Parameters
+    ----------
+    papers_files : List[Path | str]
+        JSONL shards (optionally gzipped) of the 'papers' dataset.
+    citations_files : List[Path | str]
+        JSONL shards (optionally gzipped) of the 'citations' dataset.
+    index_path : Path | str
+        Where to write the index.
+
+    Returns
+    -------
+    index_path : Path
+        Path to the built index.
+    """
+
+    index_path = Path(index_path)
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(_SCHEMA)
+
+        rows: List[tuple] = []
+        arxiv_corpus_ids = set()
+
+        for papers_file in tqdm(papers_files, desc="Indexing S2 papers", dynamic_ncols=True):
+            with _open_shard(Path(papers_file)) as f:
+                for line in f:
+                    record = json.loads(line)
+                    external_ids = record.get("externalids") or {}
+                    arxiv_id = external_ids.get("ArXiv")
+
+                    if arxiv_id:
+                        arxiv_corpus_ids.add(record["corpusid"])
+
+                    rows.append((
+                        record["corpusid"],
+                        base_arxiv_id(arxiv_id) if arxiv_id else None,
+                        external_ids.get("DOI"),
+                        _s2_id_from_url(record.get("url")),
+                        record.get("citationcount")
+                    ))
+
+                    if len(rows) >= _INSERT_CHUNK:
+                        conn.executemany("INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?, ?)", rows)
+                        rows.clear()
+
+        conn.executemany("INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?, ?)", rows)
+        rows.clear()
+
+        for citations_file in tqdm(citations_files, desc="Indexing S2 citations", dynamic_ncols=True):
+            with _open_shard(Path(citations_file)) as f:
+                for line in f:
+                    record = json.loads(line)
+                    citing = record.get("citingcorpusid")
+                    cited = record.get("citedcorpusid")
+
+                    if citing not in arxiv_corpus_ids or cited is None:
+                        continue
+
+                    rows.append((citing, cited))
+
+                    if len(rows) >= _INSERT_CHUNK:
+                        conn.executemany("INSERT INTO refs VALUES (?, ?)", rows)
+                        rows.clear()
+
+        conn.executemany("INSERT INTO refs VALUES (?, ?)", rows)
+        conn.executescript(_INDEXES)
+        conn.commit()
+    except BaseException:
+        conn.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    conn.close()
+    os.replace(tmp_path, index_path)
+
+    return index_path
+
+
+def enrich_papers_s2_bulk(
+    papers: Iterator[ArXivPaper],
+    index_path: Path | str
+) -> Iterator[ArXivPaper]:
+    """
+    Fills the citation count and reference IDs of papers from an index built by
+    `build_s2_bulk_index`. Reference IDs have the same ARXIV/DOI/S2 format as `fetch_paper_s2`.
+    Papers missing from the index are left without citation data.
+
+    Parameters
+    ----------
+    papers : Iterator[ArXivPaper]
+        Papers to enrich.
+    index_path : Path | str
+        Path to the index.
+
+    Returns
+    -------
+    papers : Iterator[ArXivPaper]
+        The enriched papers, in order.
+    """
+
+    conn = sqlite3.connect(f"file:{Path(index_path)}?mode=ro", uri=True)
+
+    try:
+        for paper in papers:
+            found = conn.execute(
+                "SELECT corpus_id, citation_count FROM papers WHERE arxiv_id = ?",
+                (base_arxiv_id(paper.arxiv_id),)
+            ).fetchone()
+
+            if found is not None:
+                corpus_id, paper.citation_count = found
+
+                reference_ids = []
+                for arxiv_id, doi, s2_id in conn.execute(
+                    "SELECT p.arxiv_id, p.doi, p.s2_id FROM refs r "
+                    "JOIN papers p ON p.corpus_id = r.cited WHERE r.citing = ?",
+                    (corpus_id,)
+                ):
+                    reference_id = format_reference_id({"ArXiv": arxiv_id, "DOI": doi}, s2_id)
+                    if reference_id is not None:
+                        reference_ids.append(reference_id)
+
+                paper.reference_ids = reference_ids
+
+            yield paper
+    finally:
+        conn.close()
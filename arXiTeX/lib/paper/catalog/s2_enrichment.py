@@ -0,0 +1,114 @@
+"""
+Pipelined SemanticScholar enrichment of catalog papers. Runs alongside decoding, sending requests
+as large as the API allows, as often as the rate limit allows.
+"""
+
+from typing import Iterator, List, Optional
+from arXiTeX.types import ArXivPaper
+from arXiTeX.lib.utils.read_ahead import ReadAhead, read_ahead
+from arXiTeX.lib.utils.token_bucket import TokenBucket
+from .citations import S2_MAX_BATCH_IDS, default_rate_limiter, try_fetch_paper_s2
+from .citation_cache import CitationCache
+
+
+def _fill_from_cache(papers: List[ArXivPaper], cache: Optional[CitationCache]) -> List[ArXivPaper]:
+    """Fills papers that have fresh cache entries and returns the rest."""
+    if cache is None:
+        return list(papers)
+
+    found = cache.get_many([(paper.arxiv_id, paper.updated_at) for paper in papers])
+    misses = []
+
+    for paper in papers:
+        if paper.arxiv_id in found:
+            paper.citation_count, paper.reference_ids = found[paper.arxiv_id]
+        else:
+            misses.append(paper)
+
+    return misses
+
+
+def _enrich_stream(
+    papers: Iterator[ArXivPaper],
+    rate_limiter: TokenBucket,
+    max_batch_ids: int,
+    retries: int,
+    cache: Optional[CitationCache]
+) -> Iterator[ArXivPaper]:
+    decoded = ReadAhead(papers, size=2 * max_batch_ids)
+
+    try:
+        for first in decoded:
+            chunk = [first, *decoded.drain(max_batch_ids - 1)]
+            misses = _fill_from_cache(chunk, cache)
+
+            if misses:
+                # Papers keep decoding while we wait for the rate limit, so each request takes
+                # everything decoded in the meantime, up to the API maximum
+                rate_limiter.wait()
+
+                while len(misses) < max_batch_ids and len(chunk) < 2 * max_batch_ids:
+                    extra = decoded.drain(max_batch_ids - len(misses))
+                    if not extra:
+                        break
+                    chunk.extend(extra)
+                    misses.extend(_fill_from_cache(extra, cache))
+
+                miss_ids = [paper.arxiv_id for paper in misses]
+                result = try_fetch_paper_s2(miss_ids, retries=retries, rate_limiter=rate_limiter)
+
+                if result is not None:
+                    ks, rs = result
+                    for k, r, paper in zip(ks, rs, misses):
+                        paper.citation_count = k
+                        paper.reference_ids = r
+
+                    if cache is not None:
+                        cache.put_many(miss_ids, ks, rs)
+
+            yield from chunk
+    finally:
+        decoded.close()
+
+
+def enrich_papers_s2(
+    papers: Iterator[ArXivPaper],
+    rate_limiter: Optional[TokenBucket] = None,
+    max_batch_ids: int = S2_MAX_BATCH_IDS,
+    retries: int = 3,
+    cache: Optional[CitationCache] = None
+) -> Iterator[ArXivPaper]:
+    """
+    Fills the citation count and reference IDs of papers using SemanticScholar. `papers` is
+    consumed in one background thread and requests are made in another, so neither decoding nor
+    the consumer waits on the network. Requests are sized by how many papers are ready when the
+    rate limit allows the next one, up to `max_batch_ids`, and are independent of the catalog's
+    batch size. Papers keep their order.
+
+    Parameters
+    ----------
+    papers : Iterator[ArXivPaper]
+        Papers to enrich.
+    rate_limiter : TokenBucket, optional
+        Rate limiter for requests. Default, one matched to whether SEMANTIC_SCHOLAR_API_KEY is set.
+    max_batch_ids : int, optional
+        Maximum number of papers per request. Default, the API maximum.
+    retries : int, optional
+        Number of retries per request, with jittered exponential backoff. Default, 3.
+    cache : CitationCache, optional
+        Cache consulted before the network. Only papers without a fresh entry are requested, and
+        successful responses are stored. Default, no cache.
+
+    Returns
+    -------
+    papers : Iterator[ArXivPaper]
+        The enriched papers, in order.
+    """
+
+    if rate_limiter is None:
+        rate_limiter = default_rate_limiter()
+
+    return read_ahead(
+        _enrich_stream(papers, rate_limiter, max_batch_ids, retries, cache),
+        size=max_batch_ids
+    )
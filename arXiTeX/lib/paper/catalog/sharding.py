@@ -0,0 +1,114 @@
+"""
+Deterministic partitioning of the arXiv Kaggle dataset across machines, and cursors to resume a
+shard after a crash.
+"""
+
+import os
+import json
+import zlib
+from pathlib import Path
+from typing import Optional
+from .rows import ID_FIELD_RE
+
+
+def shard_of(arxiv_id: str | bytes, num_shards: int) -> int:
+    """
+    Returns the shard of an arXiv ID, out of `num_shards`. Based on CRC-32 rather than `hash`, so
+    it is the same on every machine and Python process.
+    """
+
+    if isinstance(arxiv_id, str):
+        arxiv_id = arxiv_id.encode()
+
+    return zlib.crc32(arxiv_id) % num_shards
+
+
+def shard_of_line(line: bytes, num_shards: int) -> Optional[int]:
+    """
+    Returns the shard of an undecoded JSON line of the Kaggle dataset, reading only its "id"
+    field. None if the field can't be read.
+    """
+
+    m = ID_FIELD_RE.search(line)
+    return shard_of(m.group(1), num_shards) if m is not None else None
+
+
+class ShardCursor:
+    """
+    Position of a shard in the catalog, saved after each batch the consumer is done with. A new run
+    with the same cursor skips every row up to and including the saved one, without decoding them.
+    The cursor is deleted once the shard is fully consumed.
+
+    Parameters
+    ----------
+    cursor_path : Path
+        Path to the JSON cursor file.
+    source : str
+        Fingerprint of 'arxiv.zip' (see `zip_fingerprint`). A cursor saved for another snapshot is
+        rejected.
+    shard_index : int
+        Index of the shard.
+    num_shards : int
+        Number of shards.
+    """
+
+    def __init__(self, cursor_path: Path, source: str, shard_index: int, num_shards: int):
+        self.cursor_path = cursor_path
+        self.shard_index = shard_index
+        self.num_shards = num_shards
+        self.source = source
+        self.after: Optional[str] = None
+
+        if cursor_path.exists():
+            data = json.loads(cursor_path.read_text())
+            if (data["shard_index"], data["num_shards"]) != (shard_index, num_shards):
+                raise ValueError(
+                    f"Cursor {cursor_path} belongs to shard {data['shard_index']} of "
+                    f"{data['num_shards']}, not {shard_index} of {num_shards}"
+                )
+            if data["source"] != self.source:
+                raise ValueError(
+                    f"Cursor {cursor_path} was saved for another snapshot of arxiv.zip; delete "
+                    "it to restart the shard"
+                )
+            self.after = data["after"]
+
+        self._skipping = self.after is not None
+
+    def skips_line(self, line: bytes) -> bool:
+        """
+        Checks whether an undecoded line comes before the saved position, reading only its "id"
+        field. Must see every line of the dataset, in order, before any filter.
+        """
+
+        if not self._skipping:
+            return False
+
+        m = ID_FIELD_RE.search(line)
+        if m is not None and m.group(1).decode() == self.after:
+            self._skipping = False
+
+        return True
+
+    def save(self, arxiv_id: str):
+        """
+        Records that every row up to and including `arxiv_id` was consumed.
+        """
+
+        data = {
+            "shard_index": self.shard_index,
+            "num_shards": self.num_shards,
+            "source": self.source,
+            "after": arxiv_id
+        }
+
+        tmp_path = self.cursor_path.with_name(self.cursor_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data))
+        os.replace(tmp_path, self.cursor_path)
+
+    def clear(self):
+        """
+        Deletes the cursor, once the shard is done.
+        """
+
+        self.cursor_path.unlink(missing_ok=True)
@@ -0,0 +1,170 @@
+"""
+Fingerprints of arXiv Kaggle dataset snapshots, used to only catalog papers that are new or
+updated since a previous run.
+"""
+
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+from .rows import ID_FIELD_RE, UPDATE_DATE_FIELD_RE
+
+# Version entries only hold version names and dates, which never contain brackets
+_VERSIONS_FIELD_RE = re.compile(rb'"versions"\s*:\s*(\[[^\]]*\])')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    arxiv_id TEXT PRIMARY KEY,
+    digest   BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pending (
+    arxiv_id TEXT PRIMARY KEY,
+    digest   BLOB NOT NULL
+);
+"""
+
+
+def _digest(update_date: str, versions: List[dict]) -> bytes:
+    key = update_date + "|" + ",".join(v.get("version", "") for v in versions)
+    return hashlib.blake2b(key.encode(), digest_size=8).digest()
+
+
+"""
+A paper's arXiv ID and the digest of its 'update_date' and version list
+"""
+Fingerprint = Tuple[str, bytes]
+
+
+class SnapshotDelta:
+    """
+    Compares rows of a new snapshot with the fingerprint of the previous one. A paper's fingerprint
+    is its arXiv ID together with its 'update_date' and version list. Fingerprints of the rows
+    yielded are staged with `stage`, and only replace the previous fingerprint once `commit` is
+    called, so an interrupted run can simply be repeated.
+
+    Parameters
+    ----------
+    fingerprint_path : Path
+        Path to the SQLite fingerprint file. Created if it doesn't exist.
+    resume : bool, optional
+        Whether to keep the fingerprints staged and saved (see `save`) by an interrupted run,
+        which a shard cursor resumes after the papers it yielded. By default, they're dropped.
+    """
+
+    def __init__(self, fingerprint_path: Path, resume: bool = False):
+        self.fingerprint_path = fingerprint_path
+        # Rows are checked by the reader thread of a parallel catalog and staged by the consumer
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(fingerprint_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        if not resume:
+            with self._conn:
+                self._conn.execute("DELETE FROM pending")
+
+    @staticmethod
+    def line_fingerprint(line: bytes) -> Optional[Fingerprint]:
+        """
+        Fingerprint of an undecoded JSON line of the Kaggle dataset, reading only the fields in
+        it. None if they can't be read.
+        """
+
+        id_match = ID_FIELD_RE.search(line)
+        date_match = UPDATE_DATE_FIELD_RE.search(line)
+        versions_match = _VERSIONS_FIELD_RE.search(line)
+
+        if id_match is None or date_match is None or versions_match is None:
+            return None
+
+        return (
+            id_match.group(1).decode(),
+            _digest(date_match.group(1).decode(), json.loads(versions_match.group(1)))
+        )
+
+    @staticmethod
+    def row_fingerprint(row: dict) -> Fingerprint:
+        """
+        Fingerprint of a decoded row of the Kaggle dataset.
+        """
+
+        return row.get("id"), _digest(row.get("update_date", ""), row.get("versions") or [])
+
+    def is_new_or_updated(self, fingerprint: Optional[Fingerprint]) -> bool:
+        """
+        Checks whether a paper is new or updated since the previous snapshot. Papers without a
+        fingerprint are treated as new.
+        """
+
+        if fingerprint is None:
+            return True
+
+        arxiv_id, digest = fingerprint
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT digest FROM fingerprints WHERE arxiv_id = ?", (arxiv_id,)
+            ).fetchone()
+
+        return found is None or found[0] != digest
+
+    def is_new_or_updated_line(self, line: bytes) -> bool:
+        """
+        Same as `is_new_or_updated`, for an undecoded JSON line of the Kaggle dataset.
+        """
+
+        return self.is_new_or_updated(self.line_fingerprint(line))
+
+    def is_new_or_updated_row(self, row: dict) -> bool:
+        """
+        Same as `is_new_or_updated`, for a decoded row of the Kaggle dataset.
+        """
+
+        return self.is_new_or_updated(self.row_fingerprint(row))
+
+    def stage(self, fingerprint: Optional[Fingerprint]):
+        """
+        Stages the fingerprint of a yielded paper, to be stored by `commit`. Only papers that pass
+        every filter and are yielded may be staged: a staged paper counts as seen by later runs.
+        """
+
+        if fingerprint is None:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending (arxiv_id, digest) VALUES (?, ?)", fingerprint
+            )
+
+    def new_or_updated_rows(self, rows: Iterable[dict]) -> Iterator[dict]:
+        """
+        Yields the decoded rows that are new or updated, staging them. The rows must already have
+        passed every other filter.
+        """
+
+        for row in rows:
+            fingerprint = self.row_fingerprint(row)
+            if self.is_new_or_updated(fingerprint):
+                self.stage(fingerprint)
+                yield row
+
+    def save(self):
+        """
+        Writes the fingerprints staged so far to disk, without committing them, so that a resumed
+        run (see `resume`) still commits them.
+        """
+
+        with self._lock:
+            self._conn.commit()
+
+    def commit(self):
+        """
+        Makes the fingerprints of all rows staged so far the stored fingerprint.
+        """
+
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO fingerprints SELECT * FROM pending")
+            self._conn.execute("DELETE FROM pending")
+
+    def close(self):
+        self._conn.close()
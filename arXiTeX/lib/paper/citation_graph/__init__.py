@@ -0,0 +1,446 @@
+"""
+On-disk citation graph built from the reference IDs of cataloged papers. Nodes are interned to
+integer IDs in SQLite, and edges are stored as memory-mapped CSR arrays in both directions, so a
+graph of millions of papers doesn't need to fit in memory.
+"""
+
+import os
+import mmap
+import shutil
+import sqlite3
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Literal, Optional, Tuple
+from arXiTeX.types import ArXivPaper
+from arXiTeX.lib.paper.catalog.rows import base_arxiv_id
+from arXiTeX.lib.paper.catalog.columnar import CatalogRecord, ColumnarBatch
+from .csr import (
+    NODE_TYPECODE, OFFSET_TYPECODE, iter_log_records, map_array, write_in_csr, write_out_csr
+)
+
+NODES_FILENAME = "nodes.sqlite"
+LOG_FILENAME = "pending.log"
+
+_LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id  INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_KEY_PREFIXES = ("ARXIV:", "DOI:", "S2:")
+
+
+def node_key(paper_id: str) -> str:
+    """
+    Returns the graph node of a paper: reference IDs as formatted by `format_reference_id` (i.e.
+    'ARXIV:2101.00001', 'DOI:...', 'S2:...'), or bare arXiv IDs, which become 'ARXIV:' IDs.
+    Versions of arXiv IDs are ignored.
+    """
+
+    if paper_id.startswith("ARXIV:"):
+        return "ARXIV:" + base_arxiv_id(paper_id[6:])
+    if paper_id.startswith(_KEY_PREFIXES):
+        return paper_id
+
+    return "ARXIV:" + base_arxiv_id(paper_id)
+
+
+class CitationGraph:
+    """
+    Citation graph stored in a directory. An edge goes from a paper to each of its references.
+
+    Papers added with `add_papers` go to an append-only log first and replace the references
+    previously stored for them, which suits delta catalogs. `compact` merges the log into new CSR
+    arrays. Queries see logged papers too, but load the log into memory, so compact after large
+    appends.
+
+    Parameters
+    ----------
+    graph_dir : Path | str
+        Directory of the graph. Created if it doesn't exist.
+    """
+
+    def __init__(self, graph_dir: Path | str):
+        self.graph_dir = Path(graph_dir)
+        self.graph_dir.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.graph_dir / NODES_FILENAME)
+        self._conn.executescript(_SCHEMA)
+        self._num_nodes = self._conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+        found = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        self._generation = found[0] if found is not None else 0
+        self._maps: List = []
+        self._open_csr()
+
+        # Index of the log, built on the first query that needs it
+        self._pending: Optional[Tuple[Dict[int, List[int]], Dict[int, List[int]]]] = None
+
+    def _csr_dir(self, generation: int) -> Path:
+        return self.graph_dir / f"csr-{generation}"
+
+    def _open_csr(self):
+        csr_dir = self._csr_dir(self._generation)
+        views = []
+        for name, typecode in [
+            ("out.offsets", OFFSET_TYPECODE),
+            ("out.targets", NODE_TYPECODE),
+            ("in.offsets", OFFSET_TYPECODE),
+            ("in.sources", NODE_TYPECODE)
+        ]:
+            view, mm = map_array(csr_dir / name, typecode)
+            views.append(view)
+            if mm is not None:
+                self._maps.append(mm)
+
+        self._out_offsets, self._out_targets, self._in_offsets, self._in_sources = views
+        self._csr_nodes = max(0, len(self._out_offsets) - 1)
+
+    def _close_csr(self):
+        for view in [self._out_offsets, self._out_targets, self._in_offsets, self._in_sources]:
+            view.release()
+        for mm in self._maps:
+            mm.close()
+        self._maps = []
+
+    def _intern(self, keys: List[str]) -> Dict[str, int]:
+        unique = list(dict.fromkeys(keys))
+        ids: Dict[str, int] = {}
+
+        for start in range(0, len(unique), _LOOKUP_CHUNK):
+            chunk = unique[start : start + _LOOKUP_CHUNK]
+            ids.update((key, i) for i, key in self._conn.execute(
+                f"SELECT id, key FROM nodes WHERE key IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ))
+
+        new = [key for key in unique if key not in ids]
+        for key in new:
+            ids[key] = self._num_nodes
+            self._num_nodes += 1
+
+        self._conn.executemany(
+            "INSERT INTO nodes (id, key) VALUES (?, ?)",
+            [(ids[key], key) for key in new]
+        )
+
+        return ids
+
+    def _lookup(self, paper_id: str) -> Optional[int]:
+        found = self._conn.execute(
+            "SELECT id FROM nodes WHERE key = ?", (node_key(paper_id),)
+        ).fetchone()
+
+        return found[0] if found is not None else None
+
+    def _keys(self, ids: List[int]) -> Dict[int, str]:
+        keys: Dict[int, str] = {}
+
+        for start in range(0, len(ids), _LOOKUP_CHUNK):
+            chunk = ids[start : start + _LOOKUP_CHUNK]
+            keys.update(self._conn.execute(
+                f"SELECT id, key FROM nodes WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ))
+
+        return keys
+
+    def _map_log(self) -> Tuple[memoryview, "mmap.mmap | None"]:
+        log_path = self.graph_dir / LOG_FILENAME
+
+        # Drops the bytes of an integer cut short by a crash, which a typed view can't hold
+        if log_path.exists():
+            size = log_path.stat().st_size
+            itemsize = array(NODE_TYPECODE).itemsize
+            if size % itemsize:
+                os.truncate(log_path, size - size % itemsize)
+
+        return map_array(log_path, NODE_TYPECODE)
+
+    def _pending_index(self) -> Tuple[Dict[int, List[int]], Dict[int, List[int]]]:
+        if self._pending is None:
+            log, log_map = self._map_log()
+            out_edges: Dict[int, List[int]] = {}
+            try:
+                for source, start, end in iter_log_records(log):
+                    out_edges[source] = list(log[start:end])
+            finally:
+                log.release()
+                if log_map is not None:
+                    log_map.close()
+
+            in_edges: Dict[int, List[int]] = defaultdict(list)
+            for source, targets in out_edges.items():
+                for target in targets:
+                    in_edges[target].append(source)
+
+            self._pending = (out_edges, in_edges)
+
+        return self._pending
+
+    def _out(self, node: int) -> "memoryview | List[int]":
+        pending_out, _ = self._pending_index()
+        if node in pending_out:
+            return pending_out[node]
+        if node < self._csr_nodes:
+            return self._out_targets[self._out_offsets[node] : self._out_offsets[node + 1]]
+        return []
+
+    def _in(self, node: int) -> List[int]:
+        pending_out, pending_in = self._pending_index()
+        sources: List[int] = []
+
+        if node < self._csr_nodes:
+            # Papers in the log replaced their stored references
+            sources = [
+                source
+                for source in self._in_sources[self._in_offsets[node] : self._in_offsets[node + 1]]
+                if source not in pending_out
+            ]
+
+        return sources + pending_in.get(node, [])
+
+    def add_papers(self, papers: Iterable[ArXivPaper | CatalogRecord] | ColumnarBatch):
+        """
+        Adds papers, e.g. a batch of `paper_catalog`, replacing the references stored for papers
+        already in the graph. Papers without reference IDs (e.g. SemanticScholar didn't know them)
+        only add a node, keeping whatever references they had.
+        """
+
+        if isinstance(papers, ColumnarBatch):
+            if papers.reference_ids is None:
+                raise ValueError("ColumnarBatch has no 'reference_ids' column")
+            pairs = list(zip(papers.arxiv_id, papers.reference_ids))
+        else:
+            pairs = [(paper.arxiv_id, paper.reference_ids) for paper in papers]
+
+        pairs = [
+            (node_key(arxiv_id), [node_key(ref) for ref in reference_ids or []])
+            for arxiv_id, reference_ids in pairs
+        ]
+
+        ids = self._intern([key for source, targets in pairs for key in [source, *targets]])
+        # Nodes are committed before the log refers to them
+        self._conn.commit()
+
+        records = array(NODE_TYPECODE)
+        for source, targets in pairs:
+            if not targets:
+                continue
+            target_ids = list(dict.fromkeys(ids[target] for target in targets))
+            records.extend([ids[source], len(target_ids), *target_ids])
+
+        if len(records) > 0:
+            with open(self.graph_dir / LOG_FILENAME, "ab") as f:
+                records.tofile(f)
+            self._pending = None
+
+    def compact(self):
+        """
+        Merges the log into new CSR arrays. Memory use is a few arrays of one integer per node.
+        The switch to the new arrays is atomic; an interrupted compaction leaves the graph as it
+        was.
+        """
+
+        log, log_map = self._map_log()
+        latest = array(OFFSET_TYPECODE, [-1]) * self._num_nodes
+        for source, start, _ in iter_log_records(log):
+            latest[source] = start
+
+        def adjacency(node: int) -> "memoryview | List[int]":
+            start = latest[node]
+            if start >= 0:
+                return log[start : start + log[start - 1]]
+            if node < self._csr_nodes:
+                return self._out_targets[self._out_offsets[node] : self._out_offsets[node + 1]]
+            return []
+
+        generation = self._generation + 1
+        csr_dir = self._csr_dir(generation)
+        shutil.rmtree(csr_dir, ignore_errors=True)
+        csr_dir.mkdir()
+
+        try:
+            write_out_csr(
+                self._num_nodes, adjacency, csr_dir / "out.offsets", csr_dir / "out.targets"
+            )
+        finally:
+            log.release()
+            if log_map is not None:
+                log_map.close()
+
+        out_offsets, out_offsets_map = map_array(csr_dir / "out.offsets", OFFSET_TYPECODE)
+        out_targets, out_targets_map = map_array(csr_dir / "out.targets", NODE_TYPECODE)
+        try:
+            write_in_csr(
+                out_offsets,
+                out_targets,
+                self._num_nodes,
+                csr_dir / "in.offsets",
+                csr_dir / "in.sources"
+            )
+        finally:
+            for view, mm in [(out_offsets, out_offsets_map), (out_targets, out_targets_map)]:
+                view.release()
+                if mm is not None:
+                    mm.close()
+
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)",
+                (generation,)
+            )
+
+        # Replaying the log after a crash here is harmless: it holds the same replacements
+        self._close_csr()
+        shutil.rmtree(self._csr_dir(self._generation), ignore_errors=True)
+        (self.graph_dir / LOG_FILENAME).unlink(missing_ok=True)
+
+        self._generation = generation
+        self._open_csr()
+        self._pending = None
+
+    def __len__(self) -> int:
+        return self._num_nodes
+
+    def __contains__(self, paper_id: str) -> bool:
+        return self._lookup(paper_id) is not None
+
+    def out_degree(self, paper_id: str) -> int:
+        """
+        Returns the number of references of a paper (0 if it isn't in the graph).
+        """
+
+        node = self._lookup(paper_id)
+        return len(self._out(node)) if node is not None else 0
+
+    def in_degree(self, paper_id: str) -> int:
+        """
+        Returns the number of papers in the graph citing a paper (0 if it isn't in the graph).
+        """
+
+        node = self._lookup(paper_id)
+        return len(self._in(node)) if node is not None else 0
+
+    def references(self, paper_id: str) -> List[str]:
+        """
+        Returns the node keys of a paper's references.
+        """
+
+        node = self._lookup(paper_id)
+        if node is None:
+            return []
+
+        targets = list(self._out(node))
+        keys = self._keys(targets)
+        return [keys[target] for target in targets]
+
+    def citations(self, paper_id: str) -> List[str]:
+        """
+        Returns the node keys of the papers in the graph citing a paper.
+        """
+
+        node = self._lookup(paper_id)
+        if node is None:
+            return []
+
+        sources = self._in(node)
+        keys = self._keys(sources)
+        return [keys[source] for source in sources]
+
+    def neighborhood(
+        self,
+        paper_id: str,
+        hops: int = 1,
+        direction: Literal["out", "in", "both"] = "out"
+    ) -> Dict[str, int]:
+        """
+        Returns the nodes within `hops` edges of a paper, following references ("out"), citations
+        ("in") or both.
+
+        Parameters
+        ----------
+        paper_id : str
+            arXiv ID or node key of the paper.
+        hops : int, optional
+            Maximum number of edges to follow. Default, 1.
+        direction : "out" | "in" | "both", optional
+            Which edges to follow. Default, "out".
+
+        Returns
+        -------
+        neighborhood : Dict[str, int]
+            Node key of every node reached, other than the paper, mapped to its distance in edges.
+        """
+
+        start = self._lookup(paper_id)
+        if start is None:
+            return {}
+
+        distances = {start: 0}
+        frontier = [start]
+
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for node in frontier:
+                neighbors = []
+                if direction in ("out", "both"):
+                    neighbors.extend(self._out(node))
+                if direction in ("in", "both"):
+                    neighbors.extend(self._in(node))
+
+                for neighbor in neighbors:
+                    if neighbor not in distances:
+                        distances[neighbor] = hop
+                        next_frontier.append(neighbor)
+
+            frontier = next_frontier
+            if not frontier:
+                break
+
+        del distances[start]
+        keys = self._keys(list(distances))
+        return {keys[node]: distance for node, distance in distances.items()}
+
+    def close(self):
+        self._close_csr()
+        self._conn.close()
+
+
+def build_citation_graph(
+    batches: Iterable[List[ArXivPaper] | ColumnarBatch],
+    graph_dir: Path | str
+) -> CitationGraph:
+    """
+    Streams catalog batches into the citation graph at `graph_dir` and compacts it. Can be called
+    again on an existing graph with a delta catalog to update it.
+
+    Parameters
+    ----------
+    batches : Iterable[List[ArXivPaper] | ColumnarBatch]
+        Batches of papers with citation data, e.g. from `paper_catalog`.
+    graph_dir : Path | str
+        Directory of the graph. Created if it doesn't exist.
+
+    Returns
+    -------
+    graph : CitationGraph
+        The compacted graph.
+    """
+
+    graph = CitationGraph(graph_dir)
+
+    for batch in batches:
+        graph.add_papers(batch)
+
+    graph.compact()
+
+    return graph
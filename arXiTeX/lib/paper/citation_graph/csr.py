@@ -0,0 +1,150 @@
+"""
+Compressed sparse row (CSR) adjacency arrays stored as raw files and memory-mapped. Offsets are
+int64 and node IDs uint32, in native byte order.
+"""
+
+import mmap
+from array import array
+from pathlib import Path
+from typing import Callable, Iterator, List, Tuple
+
+OFFSET_TYPECODE = "q"
+NODE_TYPECODE = "I"
+
+_WRITE_CHUNK = 1 << 20
+
+
+def map_array(path: Path, typecode: str) -> Tuple[memoryview, "mmap.mmap | None"]:
+    """
+    Memory-maps a raw array file read-only. Returns the typed view and the mapping to close later
+    (None for empty or missing files, which can't be mapped).
+    """
+
+    if not path.exists() or path.stat().st_size == 0:
+        return memoryview(array(typecode)), None
+
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return memoryview(mm).cast(typecode), mm
+
+
+class _ArrayWriter:
+    """
+    Appends integers to a raw array file through a bounded in-memory buffer.
+    """
+
+    def __init__(self, path: Path, typecode: str):
+        self._f = open(path, "wb")
+        self._buf = array(typecode)
+
+    def append(self, value: int):
+        self._buf.append(value)
+        if len(self._buf) >= _WRITE_CHUNK:
+            self.flush()
+
+    def extend(self, values: "memoryview | List[int]"):
+        if isinstance(values, memoryview):
+            self._buf.frombytes(values.cast("B"))
+        else:
+            self._buf.extend(values)
+        if len(self._buf) >= _WRITE_CHUNK:
+            self.flush()
+
+    def flush(self):
+        self._buf.tofile(self._f)
+        del self._buf[:]
+
+    def close(self):
+        self.flush()
+        self._f.close()
+
+
+def write_out_csr(
+    num_nodes: int,
+    adjacency: Callable[[int], "memoryview | List[int]"],
+    offsets_path: Path,
+    targets_path: Path
+):
+    """
+    Writes the CSR of out-edges, node by node, from `adjacency(node)`. Never holds more than one
+    node's edges and a write buffer in memory.
+    """
+
+    offsets = _ArrayWriter(offsets_path, OFFSET_TYPECODE)
+    targets = _ArrayWriter(targets_path, NODE_TYPECODE)
+    total = 0
+
+    try:
+        offsets.append(0)
+        for node in range(num_nodes):
+            edges = adjacency(node)
+            targets.extend(edges)
+            total += len(edges)
+            offsets.append(total)
+    finally:
+        offsets.close()
+        targets.close()
+
+
+def write_in_csr(
+    out_offsets: memoryview,
+    out_targets: memoryview,
+    num_nodes: int,
+    offsets_path: Path,
+    sources_path: Path
+):
+    """
+    Writes the CSR of in-edges by transposing an out-edge CSR with a counting sort. Holds one
+    array of `num_nodes` offsets in memory; sources are scattered into a memory-mapped file.
+    """
+
+    counts = array(OFFSET_TYPECODE, bytes(8 * (num_nodes + 1)))
+    for target in out_targets:
+        counts[target + 1] += 1
+
+    for node in range(num_nodes):
+        counts[node + 1] += counts[node]
+
+    with open(offsets_path, "wb") as f:
+        counts.tofile(f)
+
+    num_edges = len(out_targets)
+    with open(sources_path, "wb") as f:
+        f.truncate(num_edges * array(NODE_TYPECODE).itemsize)
+
+    if num_edges == 0:
+        return
+
+    # counts now holds the start of each node's slot; advance it as sources are placed
+    with open(sources_path, "r+b") as f:
+        mm = mmap.mmap(f.fileno(), 0)
+        sources = memoryview(mm).cast(NODE_TYPECODE)
+        try:
+            start = out_offsets[0]
+            for node in range(len(out_offsets) - 1):
+                end = out_offsets[node + 1]
+                for target in out_targets[start:end]:
+                    sources[counts[target]] = node
+                    counts[target] += 1
+                start = end
+        finally:
+            sources.release()
+            mm.flush()
+            mm.close()
+
+
+def iter_log_records(log: memoryview) -> Iterator[Tuple[int, int, int]]:
+    """
+    Yields (source, start, end) of every record of an edge log, where log[start:end] are the
+    source's targets. Records are [source, count, target, ...]. A record cut short by a crash
+    ends the log.
+    """
+
+    i = 0
+    while i + 2 <= len(log):
+        source, count = log[i], log[i + 1]
+        if i + 2 + count > len(log):
+            return
+        yield source, i + 2, i + 2 + count
+        i += 2 + count
@@ -3,18 +3,23 @@ Main file of statement module. Provides a helper to parse a paper for statements
 """
 
 import re
-import shutil
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import List, Optional, Set, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 from tempfile import TemporaryDirectory
 from arXiTeX.types import Statement, StatementValidationLevel, ParsingMethod, ParseFocus, ParseResult
-from arXiTeX.lib.utils.download_arxiv_paper import download_arxiv_paper
+from arXiTeX.lib.utils.download_arxiv_paper import read_arxiv_source
+from arXiTeX.lib.utils.source_cache import SourceCache
+from arXiTeX.lib.utils.source_tree import MemorySourceTree, SourceTree
 from arXiTeX.lib.paper.bibliography import parse_bibliography_from_dir
 from .validate_statements import validate_statement, validate_statements
 from .run_with_timeout import run_with_timeout
+from .deadline import PartialTimeoutError, check_deadline
 from .errors import ParseError, format_error
-from .guess_main_file import guess_main_file
-from .connect_proofs import connect_proofs
+from .connect_proofs import connect_proofs, iter_connect_proofs
+from .confidence import statement_confidence
+from .paper_source import PaperSource
+from .result_cache import ResultCache
 
 STATEMENT_KINDS = {
     "theorem", "lemma", "proposition", "corollary",
@@ -33,6 +38,17 @@ _DOC_BEGIN_RE = re.compile(r'\\begin\s*\{document\}', re.IGNORECASE)
 
 _PREAMBLE_MAX_CHARS = 16_384
 
+"""
+Confidence (see `statement_confidence`) below which ParsingMethod.AUTO re-parses a paper with
+plasTeX.
+"""
+_AUTO_MIN_CONFIDENCE = 0.9
+
+"""
+Share of `timeout` kept, with partial results, to finish the statements parsed before the deadline
+"""
+_PARTIAL_FINISH_SHARE = 1 / 3
+
 
 def _extract_preamble(tex: str) -> Optional[str]:
     m = _DOC_BEGIN_RE.search(tex)
@@ -58,7 +74,11 @@ def parse_paper(
     validation_level: StatementValidationLevel = StatementValidationLevel.Paper,
     timeout: Optional[int] = None,
     focus: ParseFocus = ParseFocus.ALL,
-    context: int = 0
+    context: int = 0,
+    source_cache: Optional[SourceCache] = None,
+    downloader: Optional[Callable[[Path, str], Path | SourceTree]] = None,
+    partial_results: bool = False,
+    result_cache: Optional[ResultCache] = None
 ) -> ParseResult:
     """
     Parses a LaTeX paper (from arXiv or a local file). Downloads once and dispatches only the
@@ -74,7 +94,8 @@ def parse_paper(
     statement_kinds : Set[str], optional
         Set of statement kinds to capture. Default, preset list.
     parsing_method : ParsingMethod, optional
-        Method to parse. By default, plasTeX.
+        Method to parse. AUTO parses with the regex method and again with plasTeX only if the
+        result looks wrong. By default, plasTeX.
     validation_level : StatementValidationLevel, optional
         Level at which to validate statements. By default, paper-level.
     timeout : int, optional
@@ -83,7 +104,25 @@ def parse_paper(
         Which parts of the paper to parse. By default, all.
     context : int, optional
         How many characters to grab before and after each statement. Only supported with
-        ``ParsingMethod.REGEX``; ignored when using ``ParsingMethod.PLASTEX``. By default, none.
+        ``ParsingMethod.REGEX``, or AUTO when it keeps the regex parse; ignored when using
+        ``ParsingMethod.PLASTEX``. By default, none.
+    source_cache : SourceCache, optional
+        Cache of arXiv sources, so that re-parsing a paper doesn't download it again. By default,
+        the cache named by the ARXITEX_SOURCE_CACHE environment variable, if set.
+    downloader : Callable[[Path, str], Path | SourceTree], optional
+        Called with a temporary directory and `arxiv_id` to fetch the paper's source files instead
+        of downloading them, e.g. a BulkSourceReader. Returns their directory, or the files as a
+        SourceTree. By default, the source is downloaded into memory with `read_arxiv_source`.
+    partial_results : bool, optional
+        Whether to return what was finished when `timeout` passes instead of raising
+        TimeoutError: the preamble, the bibliography and, with the regex method, the statements
+        found so far, validated one by one. Parsing stops early enough to finish them within
+        `timeout`. `ParseResult.complete` says which fields were finished. Only a timeout before
+        the source is read still raises. By default, False.
+    result_cache : ResultCache, optional
+        Cache of parse results. Fields already parsed from the same source files with the same
+        options and parser version are taken from it, and parsed fields are added to it. By
+        default, no cache.
 
     Returns
     -------
@@ -92,7 +131,10 @@ def parse_paper(
     """
 
     if timeout is not None and timeout > 0:
-        @run_with_timeout(seconds=timeout)
+        # With partial results, part of the budget is kept to finish what was parsed
+        reserve = timeout * _PARTIAL_FINISH_SHARE if partial_results else 0
+
+        @run_with_timeout(seconds=timeout, reserve=reserve)
         def _timed():
             return parse_paper(
                 arxiv_id=arxiv_id,
@@ -103,56 +145,149 @@ def parse_paper(
                 timeout=None,
                 focus=focus,
                 context=context,
+                source_cache=source_cache,
+                downloader=downloader,
+                partial_results=partial_results,
+                result_cache=result_cache,
             )
         return _timed()
 
+    with _open_source(arxiv_id, paper_path, source_cache, downloader) as source:
+        return _parse_paper(
+            source,
+            statement_kinds=statement_kinds,
+            parsing_method=parsing_method,
+            validation_level=validation_level,
+            focus=focus,
+            context=context,
+            partial_results=partial_results,
+            result_cache=result_cache
+        )
+
+
+def iter_statements(
+    arxiv_id: Optional[str] = None,
+    paper_path: Optional[Path | str] = None,
+    statement_kinds: Set[str] = STATEMENT_KINDS,
+    context: int = 0,
+    validate: bool = True,
+    lookahead: int = 8,
+    source_cache: Optional[SourceCache] = None,
+    downloader: Optional[Callable[[Path, str], Path | SourceTree]] = None
+) -> Iterator[Statement]:
+    """
+    Parses a LaTeX paper (from arXiv or a local file) for statements with the regex method,
+    yielding each statement soon after its environment ends rather than once the whole paper is
+    parsed. Proofs are attached through a buffer of the last `lookahead` statements (see
+    `iter_connect_proofs`). Unlike `parse_paper`, statements can only be validated one by one, and
+    a paper without statements yields nothing rather than raising. Stop iterating to stop parsing.
+
+    Parameters
+    ----------
+    arxiv_id : str, optional
+        arXiv id of a paper. Either this or paper_path must be used.
+    paper_path : Path | str, optional
+        Path to a paper's LaTeX file or a folder of LaTeX files. Either this or arxiv_id must be
+        used.
+    statement_kinds : Set[str], optional
+        Set of statement kinds to capture. Default, preset list.
+    context : int, optional
+        How many characters to grab before and after each statement. By default, none.
+    validate : bool, optional
+        Whether to skip statements that fail `validate_statement`. By default, True.
+    lookahead : int, optional
+        Number of statements held back for later proofs to attach to. Default, 8.
+    source_cache : SourceCache, optional
+        Cache of arXiv sources (see `parse_paper`).
+    downloader : Callable[[Path, str], Path | SourceTree], optional
+        Fetches the paper's source files instead of downloading them (see `parse_paper`).
+
+    Yields
+    ------
+    Statement
+        Parsed statements, in the order of the paper.
+    """
+
+    from .methods.regex import iter_parse
+
+    internal_kinds = statement_kinds | {"proof"}
+
+    def _statements(source: PaperSource) -> Iterator[Statement]:
+        for statement in iter_parse(
+            source.tree,
+            source.main_file,
+            context,
+            statement_kinds=statement_kinds,
+            source=source
+        ):
+            kind = _normalized_kind(statement.kind, internal_kinds)
+            if kind is None:
+                continue
+            statement = statement.model_copy(update={"kind": kind})
+
+            if validate:
+                try:
+                    validate_statement(statement)
+                except Exception:
+                    continue
+
+            yield statement
+
+    with _open_source(arxiv_id, paper_path, source_cache, downloader) as paper_dir:
+        source = PaperSource(paper_dir)
+
+        try:
+            source.main_file
+        except Exception as e:
+            raise RuntimeError(format_error(
+                ParseError.PARSING,
+                str(e)
+            ))
+
+        try:
+            yield from iter_connect_proofs(_statements(source), lookahead)
+        except Exception as e:
+            raise RuntimeError(format_error(
+                ParseError.REGEX,
+                str(e)
+            ))
+
+
+@contextmanager
+def _open_source(
+    arxiv_id: Optional[str],
+    paper_path: Optional[Path | str],
+    source_cache: Optional[SourceCache],
+    downloader: Optional[Callable[[Path, str], Path | SourceTree]]
+) -> Iterator[Path | SourceTree]:
+    """
+    Yields the source files of the paper `arxiv_id`, or at `paper_path`, as a folder or a
+    SourceTree, available until the context exits.
+    """
+
     if arxiv_id is not None:
-        with TemporaryDirectory() as temp_dir:
+        # Only a downloader may need somewhere to extract to; the default reads into memory
+        with TemporaryDirectory() if downloader is not None else nullcontext() as temp_dir:
             try:
-                paper_dir = download_arxiv_paper(
-                    cwd=Path(temp_dir),
-                    arxiv_id=arxiv_id,
-                )
+                if downloader is not None:
+                    source = downloader(Path(temp_dir), arxiv_id)
+                else:
+                    source = read_arxiv_source(arxiv_id, source_cache=source_cache)
             except Exception as e:
                 raise RuntimeError(format_error(
                     ParseError.DOWNLOAD,
                     str(e)
                 ))
 
-            return _parse_paper(
-                paper_dir,
-                statement_kinds=statement_kinds,
-                parsing_method=parsing_method,
-                validation_level=validation_level,
-                focus=focus,
-                context=context
-            )
+            yield source
     elif paper_path is not None:
         if isinstance(paper_path, str):
             paper_path = Path(paper_path)
 
         if paper_path.is_dir():
-            return _parse_paper(
-                paper_path,
-                statement_kinds=statement_kinds,
-                parsing_method=parsing_method,
-                validation_level=validation_level,
-                focus=focus,
-                context=context
-            )
+            yield paper_path
         elif paper_path.is_file():
-            with TemporaryDirectory() as temp_dir:
-                paper_dir = Path(temp_dir)
-                shutil.copy2(paper_path, paper_dir / paper_path.name)
-
-                return _parse_paper(
-                    paper_dir,
-                    statement_kinds=statement_kinds,
-                    parsing_method=parsing_method,
-                    validation_level=validation_level,
-                    focus=focus,
-                    context=context
-                )
+            yield MemorySourceTree({paper_path.name: paper_path.read_bytes()})
         else:
             raise FileNotFoundError(format_error(
                 ParseError.DOWNLOAD,
@@ -164,39 +299,116 @@ def parse_paper(
             "arxiv_id and paper_path are both None"
         ))
 
+
 def _parse_paper(
-    paper_dir: Path,
+    paper_dir: Path | SourceTree,
     statement_kinds: Set[str] = STATEMENT_KINDS,
     parsing_method: ParsingMethod = ParsingMethod.PLASTEX,
     validation_level: StatementValidationLevel = StatementValidationLevel.Paper,
     focus: ParseFocus = ParseFocus.ALL,
-    context: int = 0
+    context: int = 0,
+    partial_results: bool = False,
+    result_cache: Optional[ResultCache] = None
 ) -> ParseResult:
 
     do_statements = focus in (ParseFocus.ALL, ParseFocus.STATEMENTS)
     do_preamble = focus in (ParseFocus.ALL, ParseFocus.PREAMBLE)
     do_bibliography = focus in (ParseFocus.ALL, ParseFocus.BIBLIOGRAPHY)
 
+    requested = [
+        field for field, requested in (
+            ("statements", do_statements),
+            ("preamble", do_preamble),
+            ("bibliography", do_bibliography),
+        ) if requested
+    ]
+
     statements = None
     preamble = None
     bibliography = None
+    bibliography_bibtex = None
 
+    parsed_with = None
+
+    # Requested fields that the deadline cut short, with partial_results
+    timed_out: Set[str] = set()
+
+    # Every file is read at most once, and every text derived from them (flattened source,
+    # comment-stripped text, macro and theorem definitions) computed once, whichever steps below
+    # use them
+    source = PaperSource(paper_dir)
+
+    # Fields found in the result cache are taken from it rather than parsed
+    cache_keys: Dict[str, str] = {}
+    if result_cache is not None:
+        cache_keys = {
+            "statements": result_cache.key(
+                "statements",
+                source.digest,
+                parsing_method=ParsingMethod(parsing_method).value,
+                statement_kinds=sorted(statement_kinds),
+                validation_level=StatementValidationLevel(validation_level).value,
+                context=context
+            ),
+            "preamble": result_cache.key("preamble", source.digest),
+            "bibliography": result_cache.key("bibliography", source.digest),
+        }
+
+        for field in requested:
+            cached = result_cache.get(cache_keys[field])
+            if cached is None:
+                continue
+
+            if field == "statements":
+                statements = [Statement(**statement) for statement in cached["statements"]]
+                parsed_with = ParsingMethod(cached["parsing_method"])
+                do_statements = False
+            elif field == "preamble":
+                preamble = cached["preamble"]
+                do_preamble = False
+            else:
+                bibliography = cached["bibliography"]
+                bibliography_bibtex = cached["bibliography_bibtex"]
+                do_bibliography = False
+
+    def _parse_bibliography():
+        nonlocal bibliography, bibliography_bibtex
+        try:
+            bibliography, bibliography_bibtex = parse_bibliography_from_dir(source.tree)
+        except TimeoutError:
+            if not partial_results:
+                raise
+            timed_out.add("bibliography")
+
+    if do_bibliography and partial_results:
+        # Cheap and independent of the main file, so done first to be kept on a timeout
+        _parse_bibliography()
+
+    main_file = None
     if do_preamble or do_statements:
         try:
-            main_file = guess_main_file(paper_dir)
+            main_file = source.main_file
+        except TimeoutError:
+            if not partial_results:
+                raise
+            timed_out.update(
+                field for field, requested in
+                (("preamble", do_preamble), ("statements", do_statements)) if requested
+            )
         except Exception as e:
             raise RuntimeError(format_error(
                 ParseError.PARSING,
                 str(e)
             ))
 
-    # Pre-compute flat_tex once when needed for preamble or context extraction,
-    # so neither path calls flatten_tex a second time inside the timeout window.
     flat_tex = None
-    if do_preamble or (do_statements and context > 0):
+    if main_file is not None and do_preamble:
         try:
-            from .methods.regex.flatten import flatten_tex
-            flat_tex = flatten_tex(paper_dir, main_file, ignore_errors=True)
+            flat_tex = source.flat_tex
+        except TimeoutError:
+            if not partial_results:
+                raise
+            timed_out.add("preamble")
         except Exception:
             pass
 
@@ -204,72 +416,233 @@ def _parse_paper(
         if flat_tex is not None:
             preamble = _extract_preamble(flat_tex)
 
-    if do_statements:
+    if do_statements and main_file is not None:
+        try:
+            check_deadline()
+            if parsing_method == ParsingMethod.AUTO:
+                statements, parsed_with, finished = _parse_auto(
+                    source, context, statement_kinds, validation_level, partial_results
+                )
+                if not finished:
+                    timed_out.add("statements")
+            else:
+                statements = _finish_statements(
+                    _parse_statements(source, parsing_method, context, statement_kinds),
+                    statement_kinds,
+                    validation_level
+                )
+                parsed_with = ParsingMethod(parsing_method)
+        except TimeoutError as e:
+            if not partial_results:
+                raise
+            timed_out.add("statements")
+            # Only the regex method (including AUTO's first pass) has statements to keep
+            parsed_with = ParsingMethod.PLASTEX if parsing_method == ParsingMethod.PLASTEX \
+                else ParsingMethod.REGEX
+            statements = _finish_statements(
+                e.partial if isinstance(e, PartialTimeoutError) else [],
+                statement_kinds,
+                validation_level,
+                timed_out=True
+            )
+
+    if do_bibliography and not partial_results:
+        _parse_bibliography()
+
+    if result_cache is not None:
+        # Only what was parsed here, in full
+        if do_statements and statements is not None and "statements" not in timed_out:
+            result_cache.put(cache_keys["statements"], {
+                "statements": [statement.model_dump() for statement in statements],
+                "parsing_method": parsed_with.value,
+            })
+        if do_preamble and "preamble" not in timed_out:
+            result_cache.put(cache_keys["preamble"], {"preamble": preamble})
+        if do_bibliography and "bibliography" not in timed_out:
+            result_cache.put(cache_keys["bibliography"], {
+                "bibliography": bibliography,
+                "bibliography_bibtex": bibliography_bibtex,
+            })
+
+    complete = None
+    if partial_results:
+        complete = {field: field not in timed_out for field in requested}
+
+    return ParseResult(
+        statements=statements,
+        preamble=preamble,
+        bibliography=bibliography,
+        bibliography_bibtex=bibliography_bibtex,
+        parsing_method=parsed_with,
+        complete=complete
+    )
+
+
+def _parse_statements(
+    source: PaperSource,
+    parsing_method: ParsingMethod,
+    context: int,
+    statement_kinds: Set[str]
+) -> List[Statement]:
+    """
+    Parses the raw statements of a paper with the regex method or plasTeX.
+    """
+
+    if parsing_method == ParsingMethod.PLASTEX:
+        from .methods.plasTeX import parse
+        error_type = ParseError.PLASTEX
+    else:
+        from .methods.regex import parse
+        error_type = ParseError.REGEX
+
+    try:
         if parsing_method == ParsingMethod.PLASTEX:
-            from .methods.plasTeX import parse
-            error_type = ParseError.PLASTEX
+            # plasTeX opens files itself, so only it gets the source on disk
+            with source.tree.materialize() as source_dir:
+                return parse(source_dir, source_dir / source.main_file, context)
         else:
-            from .methods.regex import parse
-            error_type = ParseError.REGEX
-
-        try:
-            raw_statements: List[Statement] = parse(
-                paper_dir, main_file, context, flat_tex,
-                statement_kinds=statement_kinds if parsing_method == ParsingMethod.REGEX else None,
+            return parse(
+                source.tree,
+                source.main_file,
+                context,
+                statement_kinds=statement_kinds,
+                source=source
             )
-        except Exception as e:
-            raise RuntimeError(format_error(
-                error_type,
-                str(e)
-            ))
+    except TimeoutError:
+        raise
+    except Exception as e:
+        raise RuntimeError(format_error(
+            error_type,
+            str(e)
+        ))
 
-        if len(raw_statements) == 0:
-            raise RuntimeError(format_error(
-                ParseError.EMPTY,
-                "No environments found"
-            ))
 
-        # Always include "proof" internally so connect_proofs can attach them,
-        # regardless of what the caller passed in statement_kinds.
-        internal_kinds = statement_kinds | {"proof"}
-        raw_statements = [
-            statement.model_copy(update={"kind": sk})
-            for statement in raw_statements
-            if (sk := next((sk for sk in internal_kinds if sk in statement.kind), None)) is not None
-        ]
+def _parse_auto(
+    source: PaperSource,
+    context: int,
+    statement_kinds: Set[str],
+    validation_level: StatementValidationLevel,
+    partial_results: bool = False
+) -> Tuple[List[Statement], ParsingMethod, bool]:
+    """
+    Parses a paper with the regex method, and again with plasTeX if the result has a confidence
+    (see `statement_confidence`) below `_AUTO_MIN_CONFIDENCE` or fails. plasTeX reuses the source
+    already read. Returns the statements of the more confident parse, the method that made them
+    and whether the parse finished: when plasTeX times out with `partial_results`, the regex
+    statements are kept as unfinished. Otherwise a timeout raises.
+    """
+
+    try:
+        statements = _finish_statements(
+            _parse_statements(source, ParsingMethod.REGEX, context, statement_kinds),
+            statement_kinds,
+            validation_level
+        )
+    except (RuntimeError, ValueError):
+        statements = None
+        confidence = 0.0
+    else:
+        confidence = statement_confidence(statements, source)
+
+    if confidence >= _AUTO_MIN_CONFIDENCE:
+        return statements, ParsingMethod.REGEX, True
+
+    try:
+        plastex_statements = _finish_statements(
+            _parse_statements(source, ParsingMethod.PLASTEX, context, statement_kinds),
+            statement_kinds,
+            validation_level
+        )
+    except TimeoutError:
+        # The time is up for every step, and the doubtful regex parse mustn't pass as finished
+        if statements is None or not partial_results:
+            raise
+        return statements, ParsingMethod.REGEX, False
+    except Exception:
+        # A doubtful regex parse beats none
+        if statements is None:
+            raise
+        return statements, ParsingMethod.REGEX, True
+
+    if statements is not None and statement_confidence(plastex_statements, source) < confidence:
+        return statements, ParsingMethod.REGEX, True
+
+    return plastex_statements, ParsingMethod.PLASTEX, True
+
+
+def _finish_statements(
+    raw_statements: List[Statement],
+    statement_kinds: Set[str],
+    validation_level: StatementValidationLevel,
+    timed_out: bool = False
+) -> List[Statement]:
+    """
+    Normalizes the kinds of parsed statements, validates them and attaches proofs. Statements cut
+    short by a timeout may be empty, and are only validated one by one.
+    """
 
-        if len(raw_statements) == 0:
-            raise RuntimeError(format_error(
-                ParseError.EMPTY,
-                "No statements found"
-            ))
+    if timed_out:
+        # Checking the whole paper means little for part of it, and must not fail the result
+        validation_level = StatementValidationLevel.Statement
 
-        match validation_level:
-            case StatementValidationLevel.Statement:
-                valid_statements: List[Statement] = []
+    if len(raw_statements) == 0:
+        if timed_out:
+            return []
+        raise RuntimeError(format_error(
+            ParseError.EMPTY,
+            "No environments found"
+        ))
 
-                for statement in raw_statements:
-                    try:
-                        validate_statement(statement)
-                        valid_statements.append(statement)
-                    except Exception:
-                        pass
+    # Always include "proof" internally so connect_proofs can attach them,
+    # regardless of what the caller passed in statement_kinds.
+    internal_kinds = statement_kinds | {"proof"}
+    normalized: List[Statement] = []
+    for statement in raw_statements:
+        kind = _normalized_kind(statement.kind, internal_kinds)
+        if kind is not None:
+            # The raw statements are fresh from the parser, so are updated in place rather than
+            # copied, which counts for big papers cut short by a timeout
+            statement.kind = kind
+            normalized.append(statement)
+    raw_statements = normalized
+
+    if len(raw_statements) == 0:
+        if timed_out:
+            return []
+        raise RuntimeError(format_error(
+            ParseError.EMPTY,
+            "No statements found"
+        ))
 
-                if len(valid_statements) == 0:
-                    raise ValueError(format_error(
-                        ParseError.VALIDATION,
-                        "All statements are invalid"
-                    ))
+    match validation_level:
+        case StatementValidationLevel.Statement:
+            valid_statements: List[Statement] = []
+
+            for statement in raw_statements:
+                try:
+                    validate_statement(statement)
+                    valid_statements.append(statement)
+                except Exception:
+                    pass
+
+            if len(valid_statements) == 0 and not timed_out:
+                raise ValueError(format_error(
+                    ParseError.VALIDATION,
+                    "All statements are invalid"
+                ))
 
-                raw_statements = valid_statements
+            raw_statements = valid_statements
 
-            case StatementValidationLevel.Paper:
-                validate_statements(raw_statements)
+        case StatementValidationLevel.Paper:
+            validate_statements(raw_statements)
 
-        statements = connect_proofs(raw_statements)
+    return connect_proofs(raw_statements)
 
-    bibliography_bibtex = None
-    if do_bibliography:
-        bibliography, bibliography_bibtex = parse_bibliography_from_dir(paper_dir)
 
-    return ParseResult(statements=statements, preamble=preamble, bibliography=bibliography, bibliography_bibtex=bibliography_bibtex)
+def _normalized_kind(kind: str, statement_kinds: Set[str]) -> Optional[str]:
+    """
+    The statement kind that environment `kind` is a variant of (e.g. "theorem" for "mytheorem*"),
+    or None.
+    """
+
+    return next((sk for sk in statement_kinds if sk in kind), None)
@@ -0,0 +1,88 @@
+"""
+Heuristic confidence in statements parsed with the regex method, used by `ParsingMethod.AUTO` to
+decide which papers to re-parse with plasTeX.
+"""
+
+import re
+from typing import List
+from arXiTeX.types import Statement
+from .validate_statements import _validate_uniqueness, validate_statement
+from .paper_source import PaperSource
+
+_REF_RE = re.compile(r'\\(?:[a-zA-Z]*[Rr]ef|autoref|cref|Cref|eqref)\s*\{([^}]*)\}')
+
+# Macros defined in the source, including the parameterised \def's the regex method can't expand
+_MACRO_DEF_RE = re.compile(
+    r'\\(?:(?:re|provide)?newcommand|DeclareRobustCommand)\s*\*?\s*\{?\s*(\\[a-zA-Z@]+)'
+    r'|\\(?:e|g|x)?def\s*(\\[a-zA-Z@]+)'
+)
+
+
+def _has_undefined_ref(statement: Statement, labels: set) -> bool:
+    for text in (statement.body, statement.note or ""):
+        for m in _REF_RE.finditer(text):
+            if any(key.strip() not in labels for key in m.group(1).split(",")):
+                return True
+    return False
+
+
+def statement_confidence(statements: List[Statement], source: PaperSource) -> float:
+    """
+    Estimates the fraction of `statements` that were parsed correctly from `source`. A
+    statement is suspect if
+    - it fails `validate_statement` (e.g. a truncated body),
+    - it references a label that isn't in the source, as when an input file wasn't found,
+    - it still uses a macro defined in the source, which wasn't expanded, or
+    - its environment has no \\newtheorem or \\declaretheorem definition in the source, so its
+      number is unknown.
+
+    Parameters
+    ----------
+    statements : List[Statement]
+        Statements parsed from `source`, with kinds normalized and proofs attached.
+    source : PaperSource
+        Source of the paper.
+
+    Returns
+    -------
+    confidence : float
+        Fraction of statements that aren't suspect. 0 if there are none or their names aren't
+        unique.
+    """
+
+    if not statements:
+        return 0.0
+
+    try:
+        _validate_uniqueness(statements)
+    except ValueError:
+        # Duplicate names mean the numbering, and thus the parse, is off
+        return 0.0
+
+    labels = source.labels
+
+    thm_defs = source.theorem_defs
+    defined_names = {env.lower() for env in thm_defs} \
+        | {info["display"].lower() for info in thm_defs.values()}
+
+    macro_names = {m.group(1) or m.group(2) for m in _MACRO_DEF_RE.finditer(source.clean)}
+    leftover_re = re.compile(
+        "(?:" + "|".join(re.escape(name) for name in macro_names) + r")(?![a-zA-Z@])"
+    ) if macro_names else None
+
+    suspect = 0
+    for statement in statements:
+        try:
+            validate_statement(statement)
+        except ValueError:
+            suspect += 1
+            continue
+
+        if _has_undefined_ref(statement, labels):
+            suspect += 1
+        elif leftover_re is not None and leftover_re.search(statement.body):
+            suspect += 1
+        elif not any(statement.kind in name for name in defined_names):
+            suspect += 1
+
+    return 1 - suspect / len(statements)
@@ -1,5 +1,6 @@
 import re
-from typing import List
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional
 from arXiTeX.types import Statement
 
 _REF_RE = re.compile(
@@ -8,6 +9,18 @@ _REF_RE = re.compile(
 )
 
 THEOREM_KINDS = { "theorem", "proposition", "lemma", "corollary" }
+
+
+def _referenced_label(note: Optional[str]) -> Optional[str]:
+    # Only the first reference in a proof's note names the statement it proves
+    if note:
+        m = _REF_RE.search(note)
+        if m:
+            content = m.group(1) or m.group(2)
+            if content:
+                return content.strip()
+    return None
+
     
 def connect_proofs(statements: List[Statement]):
     label_to_idx = {
@@ -22,18 +35,67 @@ def connect_proofs(statements: List[Statement]):
 
         matched = False
 
-        if proof.note:
-            for m in _REF_RE.finditer(proof.note):
-                content = m.group(1) or m.group(2)
-                if content:
-                    statement_idx = label_to_idx.get(content.strip())
-                    if statement_idx is not None and statement_idx != proof_idx:
-                        statements[statement_idx].proof = proof.body
-                        matched = True
-                break
+        label = _referenced_label(proof.note)
+        if label is not None:
+            statement_idx = label_to_idx.get(label)
+            if statement_idx is not None and statement_idx != proof_idx:
+                statements[statement_idx].proof = proof.body
+                matched = True
 
         if not matched:
             if proof_idx > 0 and statements[proof_idx - 1].kind in THEOREM_KINDS:
                 statements[proof_idx - 1].proof = proof.body
 
-    return [statement for statement in statements if statement.kind != "proof"]
\ No newline at end of file
+    return [statement for statement in statements if statement.kind != "proof"]
+
+
+def iter_connect_proofs(statements: Iterable[Statement], lookahead: int = 8) -> Iterator[Statement]:
+    """
+    Like `connect_proofs`, but over a stream of statements: each statement is yielded once
+    `lookahead` more statements (not counting proofs) follow it, or the stream ends, and only a
+    proof arriving before then is attached to it. A proof that references a statement further
+    back, or one that comes later, is thus dropped.
+
+    Parameters
+    ----------
+    statements : Iterable[Statement]
+        Statements and proofs, in the order of the paper.
+    lookahead : int, optional
+        Number of statements held back for proofs to attach to. At least 1, so that a proof can
+        always attach to the statement right before it. Default, 8.
+
+    Yields
+    ------
+    Statement
+        The statements, with their proofs, without the proofs themselves.
+    """
+
+    if lookahead < 1:
+        raise ValueError("lookahead must be at least 1")
+
+    buffer: Deque[Statement] = deque()
+    label_to_statement: Dict[str, Statement] = {}
+    previous: Optional[Statement] = None
+
+    for statement in statements:
+        if statement.kind != "proof":
+            buffer.append(statement)
+            if statement.label is not None:
+                label_to_statement[statement.label] = statement
+
+            if len(buffer) > lookahead:
+                oldest = buffer.popleft()
+                if label_to_statement.get(oldest.label) is oldest:
+                    del label_to_statement[oldest.label]
+                yield oldest
+        else:
+            target = label_to_statement.get(_referenced_label(statement.note))
+            if target is None and previous is not None and previous.kind in THEOREM_KINDS:
+                # Still buffered, as lookahead >= 1
+                target = previous
+            if target is not None:
+                target.proof = statement.body
+
+        previous = statement
+
+    yield from buffer
@@ -0,0 +1,99 @@
+"""
+Cooperative deadlines. Unlike SIGALRM, they work in any thread: long-running loops call
+`check_deadline`, which raises once the deadline of the current context has passed.
+"""
+
+import time
+import contextlib
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+from .errors import ParseError, format_error
+
+_deadline: ContextVar[Optional["Deadline"]] = ContextVar("arxitex_deadline", default=None)
+
+
+class PartialTimeoutError(TimeoutError):
+    """
+    TimeoutError raised by a step that had finished part of its work, which is in `partial`.
+    """
+
+    def __init__(self, message: str, partial: Any):
+        super().__init__(message)
+        self.partial = partial
+
+
+class Deadline:
+    """
+    A point in time after which work should stop.
+
+    Parameters
+    ----------
+    seconds : float
+        Seconds from now until the deadline.
+
+    Attributes
+    ----------
+    reached : bool
+        Whether `check` has raised, i.e. some step saw the deadline pass and stopped.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.reached = False
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        """
+        Raises TimeoutError if the deadline has passed.
+        """
+
+        if time.monotonic() >= self.expires_at:
+            self.reached = True
+            raise TimeoutError(format_error(
+                ParseError.TIMEOUT,
+                f"Took longer than {self.seconds:g} seconds"
+            ))
+
+
+@contextlib.contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """
+    A context in which `check_deadline` raises TimeoutError once `seconds` have passed. Nested
+    deadlines never extend an enclosing one. None sets no deadline.
+    """
+
+    if seconds is None:
+        yield _deadline.get()
+        return
+
+    new = Deadline(seconds)
+    current = _deadline.get()
+    if current is not None and current.expires_at < new.expires_at:
+        new = current
+
+    token = _deadline.set(new)
+    try:
+        yield new
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _deadline.get()
+
+
+def check_deadline():
+    """
+    Raises TimeoutError if the deadline of the current context has passed. Cheap enough to call in
+    inner loops.
+    """
+
+    current = _deadline.get()
+    if current is not None:
+        current.check()
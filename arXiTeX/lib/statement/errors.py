@@ -10,6 +10,7 @@ class ParseError(Enum):
     REGEX = "REGEX"
     VALIDATION = "VALIDATION"
     EMPTY = "EMPTY"
+    MEMORY = "MEMORY"
 
 def format_error(
     error_type: ParseError,
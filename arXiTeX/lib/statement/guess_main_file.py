@@ -2,9 +2,10 @@
 Helpers for guessing which file in a LaTeX source folder is the main file.
 """
 
-from pathlib import Path
-import itertools
+from pathlib import Path, PurePosixPath
+from arXiTeX.lib.utils.source_tree import SourceTree, as_source_tree
 from .remove_comments import remove_line_comments
+from .deadline import check_deadline
 
 """
 Extensions a main file can have
@@ -43,51 +44,50 @@ POINTS_CONFIG = [
 ]
 
 
-def _score_file(file: Path) -> float:
+def _score_file(tree: SourceTree, file: PurePosixPath) -> float:
     score = 0.0
-    
-    with file.open(errors="ignore") as fh:
-        for line in fh:
-            line = remove_line_comments(line)
-            match_found = False
 
-            for pattern_group in POINTS_CONFIG:
+    for line in tree.read_text(file, errors="ignore").splitlines():
+        line = remove_line_comments(line)
+        match_found = False
+
+        for pattern_group in POINTS_CONFIG:
+            if match_found:
+                break
+
+            for pattern in pattern_group["patterns"]:
                 if match_found:
                     break
 
-                for pattern in pattern_group["patterns"]:
-                    if match_found:
-                        break
-
-                    if pattern in line:
-                        score += pattern_group["points"]
-                        match_found = True
+                if pattern in line:
+                    score += pattern_group["points"]
+                    match_found = True
 
     return score
 
 
-def guess_main_file(paper_dir: Path) -> Path:
+def guess_main_file(paper_dir: Path | SourceTree) -> Path | PurePosixPath:
     """
     Guesses the Path of the main file in a paper's source directory.
 
     Parameters
     ----------
-    paper_dir : Path
-        Path to a paper's source files
+    paper_dir : Path | SourceTree
+        Path to a paper's source files, or the source files themselves
 
     Returns
     -------
-    main_file : Path
-        Best guess at the main file in `paper_dir`
+    main_file : Path | PurePosixPath
+        Best guess at the main file in `paper_dir`; relative to the source if `paper_dir` is a
+        SourceTree
     """
 
-    candidate_files = itertools.chain(
-        itertools.chain.from_iterable(
-            paper_dir.rglob(ext) for ext in MAIN_FILE_EXTENSIONS
-        ),
-        (f for f in paper_dir.rglob("*") if f.is_file() and not f.suffix)
-    )
-    candidate_files = list(candidate_files)
+    tree = as_source_tree(paper_dir)
+    files = tree.files()
+    candidate_files = [
+        *(f for ext in MAIN_FILE_EXTENSIONS for f in files if f.match(ext)),
+        *(f for f in files if not f.suffix)
+    ]
 
     if len(candidate_files) == 0:
         raise ValueError("Paper directory has no potential main files")
@@ -96,19 +96,21 @@ def guess_main_file(paper_dir: Path) -> Path:
 
         # if mode == Mode.DEBUGGING:
         #     print(f"[DEBUG] Main file: {main_file.name} (only candidate)")
-        return main_file
-
-    main_file: Path = candidate_files[0]
-    best_score = float("-inf")
+    else:
+        main_file = candidate_files[0]
+        best_score = float("-inf")
 
-    for file in candidate_files:
-        score = _score_file(file)
+        for file in candidate_files:
+            check_deadline()
+            score = _score_file(tree, file)
 
-        if score > best_score:
-            main_file = file
-            best_score = score
+            if score > best_score:
+                main_file = file
+                best_score = score
 
     # if mode == Mode.DEBUGGING:
     #     print(f"[DEBUG] main file: {main_file.name}")
 
-    return main_file
\ No newline at end of file
+    if isinstance(paper_dir, SourceTree):
+        return main_file
+    return Path(paper_dir) / main_file
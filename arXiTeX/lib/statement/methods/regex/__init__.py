@@ -1,17 +1,22 @@
 import re
-from typing import Collection, List, Optional
-from pathlib import Path
-from .log_envs import log_envs
-from .flatten import flatten_tex
+from typing import TYPE_CHECKING, Collection, Iterable, Iterator, List, Optional
+from pathlib import Path, PurePosixPath
+from .log_envs import Environment, iter_envs, log_envs
 from arXiTeX.types import Statement
-from arXiTeX.lib.statement.extract_context import strip_comments
+from arXiTeX.lib.utils.source_tree import SourceTree
+from arXiTeX.lib.statement.deadline import PartialTimeoutError
 
-_PROOF_BEGIN_RE = re.compile(r'\A\s*\\begin\s*\{proof\*?\}', re.IGNORECASE)
+if TYPE_CHECKING:
+    from arXiTeX.lib.statement.paper_source import PaperSource
+
+# Anchored by .match(clean, pos) — used in _post_context to skip an immediately-following proof
+_PROOF_BEGIN_RE = re.compile(r'\s*\\begin\s*\{proof\*?\}', re.IGNORECASE)
 _PROOF_END_RE   = re.compile(r'\\end\s*\{proof\*?\}',        re.IGNORECASE)
 
-# Anchored — used in _post_context to check for an immediately-following section proof
+# Anchored by .match(clean, pos) — used in _post_context to check for an immediately-following
+# section proof
 _SECTION_PROOF_IMMEDIATE_RE = re.compile(
-    r'\A\s*\\(?:sub{0,2})section\*?\s*\{([^{}]*\bProof\s+of\b[^{}]*\\ref\s*\{[^{}]*\}[^{}]*)\}',
+    r'\s*\\(?:sub{0,2})section\*?\s*\{([^{}]*\bProof\s+of\b[^{}]*\\ref\s*\{[^{}]*\}[^{}]*)\}',
     re.IGNORECASE,
 )
 
@@ -54,13 +59,12 @@ def _post_context(
     or \\section{Proof of ...\\ref{...}}), then truncates at the first
     \\begin{statement_kind} found in the window.
     """
-    tail = clean[end_pos:]
-    m_begin = _PROOF_BEGIN_RE.match(tail)
+    m_begin = _PROOF_BEGIN_RE.match(clean, end_pos)
     if m_begin:
-        m_end = _PROOF_END_RE.search(tail, m_begin.end())
-        window_start = end_pos + (m_end.end() if m_end else m_begin.end())
-    elif m_sec := _SECTION_PROOF_IMMEDIATE_RE.match(tail):
-        window_start = end_pos + m_sec.end()
+        m_end = _PROOF_END_RE.search(clean, m_begin.end())
+        window_start = m_end.end() if m_end else m_begin.end()
+    elif m_sec := _SECTION_PROOF_IMMEDIATE_RE.match(clean, end_pos):
+        window_start = m_sec.end()
     else:
         window_start = end_pos
 
@@ -73,25 +77,19 @@ def _post_context(
 
 
 
-def parse(
-    paper_dir: Path,
-    main_file: Path,
-    context: int = 0,
-    flat_tex: Optional[str] = None,
-    statement_kinds: Optional[Collection[str]] = None,
-) -> List[Statement]:
-    if flat_tex is None:
-        flat_tex = flatten_tex(paper_dir, main_file, ignore_errors=True)
-
-    envs = log_envs(flat_tex)
-
+def _iter_statements(
+    envs: Iterable[Environment],
+    source: "PaperSource",
+    context: int,
+    statement_kinds: Optional[Collection[str]],
+) -> Iterator[Statement]:
     if context > 0:
-        clean = strip_comments(flat_tex)
+        clean = source.clean
         stmt_begin_pat, stmt_end_pat = (
             _stmt_boundary_patterns(statement_kinds) if statement_kinds else (None, None)
         )
-        return [
-            Statement(
+        for env in envs:
+            yield Statement(
                 kind=env.env,
                 ref=env.ref,
                 note=env.note,
@@ -101,11 +99,10 @@ def parse(
                 pre_context=_pre_context(clean, env.begin_pos, context, stmt_end_pat),
                 post_context=_post_context(clean, env.end_pos, context, stmt_begin_pat),
             )
-            for env in envs
-        ]
+        return
 
-    return [
-        Statement(
+    for env in envs:
+        yield Statement(
             kind=env.env,
             ref=env.ref,
             note=env.note,
@@ -113,5 +110,52 @@ def parse(
             body=env.body,
             proof=None,
         )
-        for env in envs
-    ]
+
+
+def _source(
+    paper_dir: Path | SourceTree,
+    main_file: Path | PurePosixPath,
+    flat_tex: Optional[str],
+    source: Optional["PaperSource"],
+) -> "PaperSource":
+    if source is not None:
+        return source
+
+    from arXiTeX.lib.statement.paper_source import PaperSource
+    return PaperSource(paper_dir, main_file, flat_tex)
+
+
+def parse(
+    paper_dir: Path | SourceTree,
+    main_file: Path | PurePosixPath,
+    context: int = 0,
+    flat_tex: Optional[str] = None,
+    statement_kinds: Optional[Collection[str]] = None,
+    source: Optional["PaperSource"] = None,
+) -> List[Statement]:
+    source = _source(paper_dir, main_file, flat_tex, source)
+
+    try:
+        envs = log_envs(source)
+    except PartialTimeoutError as e:
+        raise PartialTimeoutError(
+            str(e), list(_iter_statements(e.partial, source, context, statement_kinds))
+        ) from e
+
+    return list(_iter_statements(envs, source, context, statement_kinds))
+
+
+def iter_parse(
+    paper_dir: Path | SourceTree,
+    main_file: Path | PurePosixPath,
+    context: int = 0,
+    flat_tex: Optional[str] = None,
+    statement_kinds: Optional[Collection[str]] = None,
+    source: Optional["PaperSource"] = None,
+) -> Iterator[Statement]:
+    """
+    Like `parse`, but yields each statement as soon as its environment ends.
+    """
+
+    source = _source(paper_dir, main_file, flat_tex, source)
+    yield from _iter_statements(iter_envs(source), source, context, statement_kinds)
@@ -21,8 +21,10 @@ API
 
     Parameters
     ----------
-    folder        : project root; used to resolve relative paths
-    main_file     : the top-level .tex file
+    folder        : project root, or a SourceTree; used to resolve relative
+                    paths
+    main_file     : the top-level .tex file (relative to the tree if `folder`
+                    is a SourceTree)
     encoding      : file encoding (default "utf-8")
     ignore_errors : if True, unresolvable \\input/\\include lines are left
                     as-is instead of raising FileNotFoundError
@@ -43,7 +45,9 @@ Does NOT handle (rare in practice, fine to ignore for a fallback parser):
 """
 
 import re
-from pathlib import Path
+from pathlib import Path, PurePosixPath
+from arXiTeX.lib.utils.source_tree import SourceTree, as_source_tree, normalize_source_path
+from arXiTeX.lib.statement.deadline import check_deadline
 
 
 # ---------------------------------------------------------------------------
@@ -80,28 +84,33 @@ def _strip_comment(line: str) -> str:
     return _COMMENT_RE.sub("", line)
 
 
-def _resolve_path(filename: str, current_dir: Path, folder: Path) -> Path:
+def _resolve_path(
+    filename: str,
+    current_dir: PurePosixPath,
+    tree: SourceTree,
+) -> PurePosixPath:
     """
-    Try to locate *filename* relative to *current_dir* first, then *folder*.
+    Try to locate *filename* relative to *current_dir* first, then the tree's root.
     Appends '.tex' if the file has no suffix and the bare name doesn't exist.
     """
     candidates = [
         current_dir / filename,
-        folder / filename,
+        PurePosixPath(filename),
     ]
-    if not Path(filename).suffix:
+    if not PurePosixPath(filename).suffix:
         candidates += [
             current_dir / (filename + ".tex"),
-            folder / (filename + ".tex"),
+            PurePosixPath(filename + ".tex"),
         ]
 
     for path in candidates:
-        if path.is_file():
-            return path.resolve()
+        path = normalize_source_path(path)
+        if path is not None and tree.is_file(path):
+            return path
 
     raise FileNotFoundError(
         f"Could not resolve \\input/\\include {{{filename!r}}} "
-        f"(looked in {current_dir} and {folder})"
+        f"(looked in {current_dir} and the project root)"
     )
 
 
@@ -110,24 +119,24 @@ def _resolve_path(filename: str, current_dir: Path, folder: Path) -> Path:
 # ---------------------------------------------------------------------------
 
 def _expand(
-    file_path: Path,
-    folder: Path,
+    file_path: PurePosixPath,
+    tree: SourceTree,
     encoding: str,
     ignore_errors: bool,
-    seen: set[Path],
+    seen: set[PurePosixPath],
 ) -> str:
     """Recursively expand *file_path*, tracking visited files in *seen*."""
 
-    resolved = file_path.resolve()
-    if resolved in seen:
+    check_deadline()
+    if file_path in seen:
         # Cycle or duplicate \include — skip silently (matches LaTeX behaviour)
         return f"% [tex_flatten] skipped duplicate include: {file_path.name}\n"
-    seen.add(resolved)
+    seen.add(file_path)
 
     try:
-        text = resolved.read_text(encoding=encoding)
+        text = tree.read_text(file_path, encoding=encoding)
     except UnicodeDecodeError:
-        text = resolved.read_text(encoding="latin-1")
+        text = tree.read_text(file_path, encoding="latin-1")
 
     lines = text.splitlines(keepends=True)
     out   = []
@@ -143,9 +152,10 @@ def _expand(
             if pkg_match:
                 for pkg_name in pkg_match.group(1).split(","):
                     pkg_name = pkg_name.strip()
-                    for candidate in [resolved.parent / f"{pkg_name}.sty", folder / f"{pkg_name}.sty"]:
-                        if candidate.is_file() and candidate.resolve() not in seen:
-                            out.append(_expand(candidate, folder, encoding, ignore_errors, seen))
+                    for candidate in [file_path.parent / f"{pkg_name}.sty", PurePosixPath(f"{pkg_name}.sty")]:
+                        candidate = normalize_source_path(candidate)
+                        if candidate is not None and tree.is_file(candidate) and candidate not in seen:
+                            out.append(_expand(candidate, tree, encoding, ignore_errors, seen))
                             inlined = True
                             break
             if not inlined:
@@ -159,7 +169,7 @@ def _expand(
             cmd, fname = m.group(3), m.group(4).strip()
 
         try:
-            child_path = _resolve_path(fname, resolved.parent, folder)
+            child_path = _resolve_path(fname, file_path.parent, tree)
         except FileNotFoundError:
             if ignore_errors:
                 out.append(line)            # leave directive in place
@@ -171,7 +181,7 @@ def _expand(
             out.append("\n\\clearpage\n")
 
         out.append(
-            _expand(child_path, folder, encoding, ignore_errors, seen)
+            _expand(child_path, tree, encoding, ignore_errors, seen)
         )
 
         if cmd == "include":
@@ -185,8 +195,8 @@ def _expand(
 # ---------------------------------------------------------------------------
 
 def flatten_tex(
-    folder: Path,
-    main_file: Path,
+    folder: Path | SourceTree,
+    main_file: Path | PurePosixPath,
     *,
     encoding: str = "utf-8",
     ignore_errors: bool = False,
@@ -197,12 +207,19 @@ def flatten_tex(
 
     Parameters
     ----------
-    folder        : project root directory
-    main_file     : path to the top-level .tex file
+    folder        : project root directory, or a SourceTree of its files
+    main_file     : path to the top-level .tex file; relative to the tree if
+                    `folder` is a SourceTree
     encoding      : character encoding for all files (default "utf-8")
     ignore_errors : if True, leave unresolvable directives in the output
                     rather than raising FileNotFoundError
     """
-    folder    = Path(folder).resolve()
-    main_file = Path(main_file).resolve()
-    return _expand(main_file, folder, encoding, ignore_errors, seen=set())
\ No newline at end of file
+    tree = as_source_tree(folder)
+    if not isinstance(folder, SourceTree):
+        main_file = Path(main_file).resolve().relative_to(Path(folder).resolve())
+
+    main_file = normalize_source_path(PurePosixPath(*Path(main_file).parts))
+    if main_file is None or not tree.is_file(main_file):
+        raise FileNotFoundError(f"Main file {main_file} is not in the project")
+
+    return _expand(main_file, tree, encoding, ignore_errors, seen=set())
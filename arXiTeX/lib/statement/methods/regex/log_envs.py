@@ -7,10 +7,13 @@ found in the source itself.
 
 Public API
 ----------
-    from tex_env_logger import log_envs, Environment
+    from tex_env_logger import log_envs, iter_envs, Environment
 
     envs = log_envs(tex_source)
 
+    for env in iter_envs(tex_source):   # streamed, as each environment ends
+        ...
+
 Each Environment has:
     env        - raw environment name (e.g. "thm")
     ref        - counter string (e.g. "2.3") or None for unnumbered envs
@@ -22,8 +25,12 @@ Each Environment has:
 """
 
 import re
-from typing import Optional
+from typing import TYPE_CHECKING, Iterator, Optional
 from pydantic import BaseModel, field_validator
+from arXiTeX.lib.statement.deadline import PartialTimeoutError, check_deadline
+
+if TYPE_CHECKING:
+    from arXiTeX.lib.statement.paper_source import PaperSource
 
 
 ###############################################################################
@@ -135,21 +142,37 @@ def _collect_macros(tex: str) -> dict[str, tuple[int, str]]:
     return macros
 
 
-def _expand_macros(text: str, macros: dict[str, tuple[int, str]]) -> str:
+def _macro_pattern(macros: dict[str, tuple[int, str]]) -> Optional[re.Pattern]:
+    """
+    One alternation pattern of all macro names, sorted longest-first to avoid prefix clashes.
+    """
+    if not macros:
+        return None
+
+    sorted_names = sorted(macros.keys(), key=len, reverse=True)
+    return re.compile(
+        "(" + "|".join(re.escape(n) for n in sorted_names) + r")(?![a-zA-Z@])"
+    )
+
+
+def _expand_macros(
+    text: str,
+    macros: dict[str, tuple[int, str]],
+    pattern: Optional[re.Pattern] = None,
+) -> str:
     """
     Single-pass expansion of known macros in *text*.
 
     Zero-arg macros: \\foo  → body
     n-arg macros:    \\foo{a1}{a2} → body with #1→a1, #2→a2
+
+    *pattern* is ``_macro_pattern(macros)``, if already built.
     """
     if not macros or not text:
         return text
 
-    # Build one alternation pattern sorted longest-first to avoid prefix clashes
-    sorted_names = sorted(macros.keys(), key=len, reverse=True)
-    pattern = re.compile(
-        "(" + "|".join(re.escape(n) for n in sorted_names) + r")(?![a-zA-Z@])"
-    )
+    if pattern is None:
+        pattern = _macro_pattern(macros)
 
     def _read_arg(s: str, pos: int) -> tuple[str, int]:
         """Read one braced argument starting at pos (skipping whitespace)."""
@@ -173,6 +196,7 @@ def _expand_macros(text: str, macros: dict[str, tuple[int, str]]) -> str:
     result = []
     pos = 0
     for m in pattern.finditer(text):
+        check_deadline()
         result.append(text[pos : m.start()])
         name = m.group(1)
         nargs, tmpl = macros[name]
@@ -504,54 +528,43 @@ _BEGIN_RE = re.compile(r"\\begin\s*\{\s*(\w+\*?)\s*\}")
 _END_RE   = re.compile(r"\\end\s*\{\s*(\w+\*?)\s*\}")
 
 # Optional note after \begin{env}: \begin{thm}[some note]
-_NOTE_RE  = re.compile(r"^\s*\[([^\]]*)\]")
+_NOTE_RE  = re.compile(r"\s*\[([^\]]*)\]")
 
 # \label{key}
 _LABEL_RE = re.compile(r"\\label\s*\{([^}]+)\}")
 
 
-def log_envs(tex: str) -> list[Environment]:
+def iter_envs(tex: "str | PaperSource") -> Iterator[Environment]:
     """
-    Logs all theorem-like environments from a flattened TeX source.
-    Numbers each env according to \\newtheorem / \\declaretheorem definitions.
-    Expands simple macros throughout.
+    Yields the theorem-like environments of a flattened TeX source as the
+    scan reaches each \\end, so the first are available before the whole
+    source is scanned. See `log_envs`.
 
     Parameters
     ----------
-    tex : str
-        Flattened TeX source.
+    tex : str | PaperSource
+        Flattened TeX source, or a PaperSource whose comment-stripped text,
+        line index, macros and theorem definitions are reused.
 
     Returns
     -------
-    List[Environment]
-        One entry per theorem-like environment, in source order.
+    Iterator[Environment]
+        One entry per theorem-like environment, in the order they end.
     """
 
-    # ── 1. strip comments, build line-start index ─────────────────────────────
-    clean  = _strip_comments(tex)
-    line_starts: list[int] = [0]
-    for i, ch in enumerate(clean):
-        if ch == "\n":
-            line_starts.append(i + 1)
-
-    def _lineno(pos: int) -> int:
-        lo, hi = 0, len(line_starts) - 1
-        while lo < hi:
-            mid = (lo + hi + 1) // 2
-            if line_starts[mid] <= pos:
-                lo = mid
-            else:
-                hi = mid - 1
-        return lo + 1
+    if isinstance(tex, str):
+        from arXiTeX.lib.statement.paper_source import PaperSource
+        source = PaperSource.from_text(tex)
+    else:
+        source = tex
 
-    # ── 2. collect macro definitions (pre-pass) ───────────────────────────────
-    macros = _collect_macros(clean)
-
-    # ── 3. collect theorem definitions (pre-pass) ─────────────────────────────
-    thm_defs = _parse_theorem_defs(clean)
-
-    # ── 3b. collect counter format overrides (pre-pass) ───────────────────────
-    counter_formats = _parse_counter_formats(clean)
+    # ── 1–3b. comment-stripped text, line index and pre-passes ────────────────
+    clean           = source.clean
+    _lineno         = source.lineno
+    macros          = source.macros
+    macro_pattern   = source.macro_pattern
+    thm_defs        = source.theorem_defs
+    counter_formats = source.counter_formats
 
     # ── 4. build unified counter bank ─────────────────────────────────────────
     bank = _CounterBank()
@@ -669,7 +682,6 @@ def log_envs(tex: str) -> list[Environment]:
                 bank.step(name)
             pre_idx += 1
 
-    results: list[Environment] = []
     stack:   list[tuple[str, int, int, Optional[str], Optional[str]]] = []
 
     tokens = sorted(
@@ -679,14 +691,15 @@ def log_envs(tex: str) -> list[Environment]:
     )
 
     for kind, env, tok_start, tok_end in tokens:
+        check_deadline()
         _flush_pre_events(tok_start)
 
         if kind == "begin":
-            after_begin = clean[tok_end:]
-            note_match  = _NOTE_RE.match(after_begin)
+            # Match in place; slicing clean here would copy the rest of the document per env
+            note_match  = _NOTE_RE.match(clean, tok_end)
             note_raw    = note_match.group(1).strip() if note_match else None
-            note        = re.sub(r'\s+', ' ', _expand_macros(note_raw, macros)).strip() if note_raw else None
-            body_start  = tok_end + note_match.end() if note_match else tok_end
+            note        = re.sub(r'\s+', ' ', _expand_macros(note_raw, macros, macro_pattern)).strip() if note_raw else None
+            body_start  = note_match.end() if note_match else tok_end
             # Step the counter now (at \begin time), mirroring LaTeX's behaviour.
             # This ensures any \setcounter / section commands inside the body
             # don't corrupt the ref that was assigned to this environment.
@@ -708,11 +721,11 @@ def log_envs(tex: str) -> list[Environment]:
             raw_body = clean[body_start:tok_start]
             label_m  = _LABEL_RE.search(raw_body)
             label    = label_m.group(1).strip() if label_m else None
-            body     = re.sub(r'\s+', ' ', _expand_macros(_LABEL_RE.sub("", raw_body), macros)).strip()
+            body     = re.sub(r'\s+', ' ', _expand_macros(_LABEL_RE.sub("", raw_body), macros, macro_pattern)).strip()
 
             env_name = thm_defs[open_env]["display"].lower() if open_env in thm_defs else open_env
 
-            results.append(Environment(
+            yield Environment(
                 env        = env_name,
                 raw_env    = open_env,
                 ref        = ref,
@@ -723,6 +736,35 @@ def log_envs(tex: str) -> list[Environment]:
                 end_line   = end_line,
                 begin_pos  = begin_pos,
                 end_pos    = tok_end,
-            ))
+            )
+
+
+def log_envs(tex: "str | PaperSource") -> list[Environment]:
+    """
+    Logs all theorem-like environments from a flattened TeX source.
+    Numbers each env according to \\newtheorem / \\declaretheorem definitions.
+    Expands simple macros throughout.
 
-    return results
\ No newline at end of file
+    Parameters
+    ----------
+    tex : str | PaperSource
+        Flattened TeX source, or a PaperSource whose comment-stripped text,
+        line index, macros and theorem definitions are reused.
+
+    Returns
+    -------
+    List[Environment]
+        One entry per theorem-like environment, in source order. If the deadline (see
+        `arXiTeX.lib.statement.deadline`) passes, PartialTimeoutError is raised with the
+        environments logged until then.
+    """
+
+    results: list[Environment] = []
+    try:
+        for env in iter_envs(tex):
+            results.append(env)
+    except TimeoutError as e:
+        # Environments closed so far are complete; callers may keep them
+        raise PartialTimeoutError(str(e), results) from e
+
+    return results
@@ -0,0 +1,156 @@
+"""
+A paper's source together with the text derived from it, each computed once on first use, so the
+steps of parsing a paper (preamble, regex parsing, context, confidence) share one flattening, one
+comment-stripping pass and one scan for macro and theorem definitions.
+"""
+
+import re
+import hashlib
+from bisect import bisect_right
+from functools import cached_property
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Set, Tuple
+from arXiTeX.lib.utils.source_tree import SourceTree, as_source_tree
+from .guess_main_file import guess_main_file
+from .extract_context import strip_comments
+from .methods.regex.flatten import flatten_tex
+from .methods.regex.log_envs import (
+    _collect_macros, _macro_pattern, _parse_counter_formats, _parse_theorem_defs
+)
+
+_LABEL_RE = re.compile(r'\\label\s*\{([^}]+)\}')
+
+"""
+Extensions of files that can't change what is parsed from a source, left out of its digest
+"""
+_DIGEST_IGNORED_SUFFIXES = {
+    ".pdf", ".png", ".jpg", ".jpeg", ".gif", ".eps", ".ps", ".svg", ".tif", ".tiff", ".bmp",
+}
+
+
+class PaperSource:
+    """
+    A paper's source files and main file, with lazily computed and memoized derived text. A
+    derivation that fails raises on every access.
+
+    Parameters
+    ----------
+    tree : Path | SourceTree, optional
+        The paper's source files. Only optional with `flat_tex`.
+    main_file : PurePosixPath, optional
+        The main file, relative to `tree`. By default, guessed with `guess_main_file`.
+    flat_tex : str, optional
+        The flattened source, if already known. By default, flattened from `main_file`.
+    """
+
+    def __init__(
+        self,
+        tree: Optional[Path | SourceTree] = None,
+        main_file: Optional[PurePosixPath] = None,
+        flat_tex: Optional[str] = None
+    ):
+        if tree is None and flat_tex is None:
+            raise ValueError("PaperSource needs a source tree or flat_tex")
+
+        self.tree = as_source_tree(tree) if tree is not None else None
+        if main_file is not None:
+            if tree is not None and not isinstance(tree, SourceTree):
+                # As in flatten_tex, a main file in a folder is a path to it
+                main_file = Path(main_file).resolve().relative_to(Path(tree).resolve())
+            self.__dict__["main_file"] = PurePosixPath(*Path(main_file).parts)
+        if flat_tex is not None:
+            self.__dict__["flat_tex"] = flat_tex
+
+    @classmethod
+    def from_text(cls, flat_tex: str) -> "PaperSource":
+        return cls(flat_tex=flat_tex)
+
+    @cached_property
+    def digest(self) -> str:
+        """
+        SHA-256 of the paths and contents of the source files, except figures.
+        """
+
+        sha256 = hashlib.sha256()
+        for path in self.tree.files():
+            if path.suffix.lower() in _DIGEST_IGNORED_SUFFIXES:
+                continue
+            content = self.tree.read_bytes(path)
+            sha256.update(f"{path.as_posix()}\0{len(content)}\0".encode())
+            sha256.update(content)
+        return sha256.hexdigest()
+
+    @cached_property
+    def main_file(self) -> PurePosixPath:
+        return guess_main_file(self.tree)
+
+    @cached_property
+    def flat_tex(self) -> str:
+        """
+        The main file with its \\input's and \\include's inlined.
+        """
+
+        return flatten_tex(self.tree, self.main_file, ignore_errors=True)
+
+    @cached_property
+    def clean(self) -> str:
+        """
+        `flat_tex` without comments.
+        """
+
+        return strip_comments(self.flat_tex)
+
+    @cached_property
+    def line_starts(self) -> List[int]:
+        """
+        Offsets in `clean` at which lines start.
+        """
+
+        return [0] + [m.end() for m in re.finditer("\n", self.clean)]
+
+    def lineno(self, pos: int) -> int:
+        """
+        1-based line number of offset `pos` in `clean`.
+        """
+
+        return bisect_right(self.line_starts, pos)
+
+    @cached_property
+    def macros(self) -> Dict[str, Tuple[int, str]]:
+        """
+        Simple macros defined in the source: name -> (number of arguments, body).
+        """
+
+        return _collect_macros(self.clean)
+
+    @cached_property
+    def macro_pattern(self) -> Optional[re.Pattern]:
+        """
+        Pattern matching uses of `macros`, or None if there are none.
+        """
+
+        return _macro_pattern(self.macros)
+
+    @cached_property
+    def theorem_defs(self) -> Dict[str, dict]:
+        """
+        Theorem environments defined in the source (see `_parse_theorem_defs`).
+        """
+
+        return _parse_theorem_defs(self.clean)
+
+    @cached_property
+    def counter_formats(self) -> Dict[str, str]:
+        """
+        \\the<counter> formats redefined in the source.
+        """
+
+        return _parse_counter_formats(self.clean)
+
+    @cached_property
+    def labels(self) -> Set[str]:
+        """
+        Keys of the \\label's in the source.
+        """
+
+        return {m.group(1).strip() for m in _LABEL_RE.finditer(self.clean)}
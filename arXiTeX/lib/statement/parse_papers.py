@@ -0,0 +1,225 @@
+"""
+Parses many papers at once, in a pool of worker processes, yielding results as they complete.
+"""
+
+import threading
+import concurrent.futures
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+from arXiTeX.types import ArXivPaper, ParseResult
+from arXiTeX.lib.paper.catalog.columnar import CatalogRecord, ColumnarBatch
+from . import parse_paper
+from .supervised_worker import SupervisedWorker
+
+"""
+Seconds a supervised parse may run past `timeout` before its worker is killed, which leaves the
+parse time to time out by itself (keeping the worker) when it can.
+"""
+_KILL_GRACE_S = 5
+
+"""
+Anything `parse_papers` accepts as a paper: an arXiv ID, a path to a paper's source, or a catalog
+paper. Lists of these and ColumnarBatches (batches of `paper_catalog`) are flattened.
+"""
+PaperInput = str | Path | ArXivPaper | CatalogRecord
+
+
+def _iter_inputs(papers: Iterable) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Flattens the input of `parse_papers` into (key, `parse_paper` source kwargs) pairs.
+    """
+
+    for item in papers:
+        if isinstance(item, ColumnarBatch):
+            for arxiv_id in item.arxiv_id:
+                yield arxiv_id, {"arxiv_id": arxiv_id}
+        elif isinstance(item, (list, tuple)):
+            yield from _iter_inputs(item)
+        elif isinstance(item, (ArXivPaper, CatalogRecord)):
+            yield item.arxiv_id, {"arxiv_id": item.arxiv_id}
+        elif isinstance(item, Path):
+            yield str(item), {"paper_path": item}
+        elif isinstance(item, str):
+            yield item, {"arxiv_id": item}
+        else:
+            raise TypeError(f"Can't parse a {type(item).__name__}")
+
+
+def _parse_one(source: Dict[str, Any], parse_kwargs: Dict[str, Any]) -> ParseResult | Exception:
+    # Errors are returned rather than raised so one bad paper doesn't look like a broken pool
+    try:
+        return parse_paper(**source, **parse_kwargs)
+    except Exception as e:
+        return e
+
+
+class _Supervisors:
+    """
+    Runs `_parse_one` in a SupervisedWorker owned by the calling thread, one per thread of a
+    ThreadPoolExecutor.
+    """
+
+    def __init__(
+        self,
+        max_rss_bytes: Optional[int],
+        max_tasks: Optional[int],
+        timeout: Optional[int]
+    ):
+        self.max_rss_bytes = max_rss_bytes
+        self.max_tasks = max_tasks
+        self.timeout = timeout + _KILL_GRACE_S if timeout is not None else None
+        self._local = threading.local()
+        self._workers: List[SupervisedWorker] = []
+        self._lock = threading.Lock()
+
+    def __call__(
+        self,
+        source: Dict[str, Any],
+        parse_kwargs: Dict[str, Any]
+    ) -> ParseResult | Exception:
+        worker = getattr(self._local, "worker", None)
+        if worker is None:
+            worker = SupervisedWorker(max_rss_bytes=self.max_rss_bytes, max_tasks=self.max_tasks)
+            self._local.worker = worker
+            with self._lock:
+                self._workers.append(worker)
+
+        try:
+            return worker.call(_parse_one, source, parse_kwargs, timeout=self.timeout)
+        except Exception as e:
+            # The worker was killed (deadline, memory) or died; it is respawned for the next paper
+            return e
+
+    def close(self):
+        with self._lock:
+            for worker in self._workers:
+                worker.close()
+
+
+def parse_papers(
+    papers: Iterable[PaperInput | Iterable[PaperInput] | ColumnarBatch],
+    workers: int = 1,
+    preserve_order: bool = False,
+    timeout: Optional[int] = None,
+    max_tasks_per_child: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    supervised: bool = False,
+    max_rss_bytes: Optional[int] = None,
+    **parse_kwargs
+) -> Iterator[Tuple[str, ParseResult | Exception]]:
+    """
+    Parses many papers with `parse_paper`, in `workers` processes. Papers are taken from `papers`
+    lazily, so it can be a generator such as `paper_catalog`.
+
+    Parameters
+    ----------
+    papers : Iterable[str | Path | ArXivPaper | CatalogRecord | List | ColumnarBatch]
+        Papers to parse. Strings are arXiv IDs, Paths are papers' LaTeX files or folders. Lists
+        and ColumnarBatches, such as the batches of `paper_catalog`, are flattened.
+    workers : int, optional
+        Number of worker processes. 1 parses in this process. Default, 1.
+    preserve_order : bool, optional
+        Whether to yield results in the order of `papers` rather than as they complete. A slow
+        paper then holds back the ones after it. Default, False.
+    timeout : int, optional
+        Maximum number of seconds to parse each paper, after which it fails with a TimeoutError.
+        Default, infinity.
+    max_tasks_per_child : int, optional
+        Number of papers each worker parses before it is replaced by a fresh process, which
+        bounds memory leaked by parsers. Default, never replaced.
+    max_pending : int, optional
+        Maximum number of papers submitted but not yet yielded. Default, twice `workers`.
+    supervised : bool, optional
+        Whether to parse each paper in a SupervisedWorker, which is killed and replaced when a
+        parse runs `timeout` plus a few seconds, even inside C code, or exceeds `max_rss_bytes`.
+        Also with `workers` = 1. Default, False.
+    max_rss_bytes : int, optional
+        Resident memory at which a worker is killed and its paper fails with a MemoryError.
+        Linux only. Implies `supervised`. Default, no limit.
+    **parse_kwargs
+        Other arguments of `parse_paper`, e.g. `parsing_method`, `focus` or `downloader`. Must be
+        picklable when `workers` > 1.
+
+    Returns
+    -------
+    results : Iterator[Tuple[str, ParseResult | Exception]]
+        Iterator of (arXiv ID or path, result), where the result is the exception raised by
+        `parse_paper` if it failed.
+    """
+
+    parse_kwargs["timeout"] = timeout
+    inputs = _iter_inputs(papers)
+
+    supervised = supervised or max_rss_bytes is not None
+
+    if workers <= 1 and not supervised:
+        for key, source in inputs:
+            yield key, _parse_one(source, parse_kwargs)
+        return
+
+    workers = max(workers, 1)
+    supervisors = _Supervisors(max_rss_bytes, max_tasks_per_child, timeout) \
+        if supervised else None
+
+    max_pending = max_pending or 2 * workers
+    pool: Optional[Executor] = None
+    pending: Deque[Tuple[str, Future, Executor]] = deque()
+    exhausted = False
+
+    def _result(future: Future) -> ParseResult | Exception:
+        try:
+            return future.result()
+        except Exception as e:
+            # A worker died (e.g. out of memory); the papers it took down with it fail too
+            return e
+
+    try:
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    key, source = next(inputs)
+                except StopIteration:
+                    exhausted = True
+                    break
+
+                if supervisors is not None:
+                    if pool is None:
+                        pool = ThreadPoolExecutor(max_workers=workers)
+                    future = pool.submit(supervisors, source, parse_kwargs)
+                else:
+                    if pool is None:
+                        pool = ProcessPoolExecutor(
+                            max_workers=workers, max_tasks_per_child=max_tasks_per_child
+                        )
+                    future = pool.submit(_parse_one, source, parse_kwargs)
+                pending.append((key, future, pool))
+
+            if not pending:
+                break
+
+            if preserve_order:
+                done = [pending.popleft()]
+            else:
+                finished, _ = concurrent.futures.wait(
+                    [f for _, f, _ in pending], return_when=FIRST_COMPLETED
+                )
+                done = [task for task in pending if task[1] in finished]
+                pending = deque(task for task in pending if task[1] not in finished)
+
+            for key, future, owner in done:
+                result = _result(future)
+                if isinstance(result, BrokenProcessPool) and owner is pool:
+                    # A broken pool takes no more work; the next submission starts a new one
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = None
+                yield key, result
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if supervisors is not None:
+            # Also interrupts parses still running if the caller stopped early
+            supervisors.close()
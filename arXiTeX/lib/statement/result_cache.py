@@ -0,0 +1,231 @@
+"""
+Persistent cache of parse results, keyed by the content of a paper's source, the parsing options
+and the version of the parser, so re-running a corpus only parses what changed.
+"""
+
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key       TEXT PRIMARY KEY,
+    version   TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    value     BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used);
+CREATE INDEX IF NOT EXISTS idx_results_version ON results (version);
+CREATE TABLE IF NOT EXISTS totals (
+    id   INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, size)
+    SELECT 0, COALESCE(SUM(size), 0) FROM results WHERE NOT EXISTS (SELECT 1 FROM totals);
+"""
+
+# Run in the transaction that changes `results`, before it, so the total always matches
+_ADD_SIZE = (
+    "UPDATE totals SET size = size + ? "
+    "- COALESCE((SELECT size FROM results WHERE key = ?), 0)"
+)
+_SUBTRACT_SIZE = (
+    "UPDATE totals SET size = size - COALESCE((SELECT size FROM results WHERE key = ?), 0)"
+)
+
+_PACKAGE_DIR = Path(__file__).resolve().parents[2]
+
+"""
+Modules whose code decides parse results, relative to the package, hashed into the parser version
+"""
+_PARSER_SOURCES = ("lib/statement", "lib/paper/bibliography", "types.py")
+
+"""
+Modules under `_PARSER_SOURCES` that only schedule or store parses
+"""
+_NON_PARSER_MODULES = {"parse_papers.py", "supervised_worker.py", "result_cache.py"}
+
+_parser_version: Optional[str] = None
+
+
+def parser_version() -> str:
+    """
+    Fingerprint of the code that parses papers: a hash of the parsing modules of this package and
+    the installed plasTeX version. Changes whenever the parser does, which invalidates results
+    cached by an older parser.
+    """
+
+    global _parser_version
+
+    if _parser_version is None:
+        sha256 = hashlib.sha256()
+        for name in _PARSER_SOURCES:
+            path = _PACKAGE_DIR / name
+            files = sorted(path.rglob("*.py")) if path.is_dir() else [path]
+            for file in files:
+                if file.name in _NON_PARSER_MODULES:
+                    continue
+                sha256.update(file.relative_to(_PACKAGE_DIR).as_posix().encode())
+                sha256.update(file.read_bytes())
+
+        try:
+            sha256.update(metadata.version("plasTeX").encode())
+        except metadata.PackageNotFoundError:
+            pass
+
+        _parser_version = sha256.hexdigest()[:16]
+
+    return _parser_version
+
+
+class ResultCache:
+    """
+    On-disk cache of the fields of parse results (statements, preamble, bibliography), each keyed
+    by a hash of the paper's source files, the options that affect it and `parser_version`. A
+    field is thus reused by any parse with the same options, whatever its `focus`. Results are
+    evicted least recently used first once they exceed `max_bytes`. Safe to share between
+    processes.
+
+    Parameters
+    ----------
+    cache_dir : Path | str
+        Directory of the cache. Created if it doesn't exist.
+    max_bytes : int, optional
+        Maximum total size of cached results (compressed). Default, 1 GiB.
+    version : str, optional
+        Parser version the results are stored under and looked up with. Default,
+        `parser_version()`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path | str,
+        max_bytes: int = 1024 ** 3,
+        version: Optional[str] = None
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.version = version or parser_version()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def __getstate__(self):
+        # Connections can't be pickled; worker processes open their own
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        return state
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.cache_dir / "results.sqlite", timeout=60)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def key(self, field: str, source_digest: str, **options) -> str:
+        """
+        Cache key of a result field of the source with hash `source_digest`, parsed with
+        `options`, under this cache's version.
+        """
+
+        payload = json.dumps(
+            [field, source_digest, self.version, options], sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the value stored under `key`, or None.
+        """
+
+        conn = self._connection()
+        found = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if found is None:
+            return None
+
+        with conn:
+            conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+
+        return json.loads(zlib.decompress(found[0]))
+
+    def put(self, key: str, value: Any):
+        """
+        Stores a JSON-serializable value under `key`.
+        """
+
+        blob = zlib.compress(json.dumps(value).encode())
+
+        conn = self._connection()
+        with conn:
+            conn.execute(_ADD_SIZE, (len(blob), key))
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, version, size, last_used, value) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, self.version, len(blob), time.time(), blob)
+            )
+
+        self._evict(keep=key)
+
+    def _evict(self, keep: str):
+        conn = self._connection()
+        total = conn.execute("SELECT size FROM totals").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM results WHERE key != ? ORDER BY last_used", (keep,)
+        ):
+            if total <= self.max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+
+        with conn:
+            for key in evicted:
+                conn.execute(_SUBTRACT_SIZE, (key,))
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def invalidate(self, version: Optional[str] = None) -> int:
+        """
+        Deletes the results of parser version `version`, or by default of every version other than
+        this cache's. Returns the number of results deleted.
+        """
+
+        if version is None:
+            where, args = "version != ?", (self.version,)
+        else:
+            where, args = "version = ?", (version,)
+
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE totals SET size = size - "
+                f"(SELECT COALESCE(SUM(size), 0) FROM results WHERE {where})",
+                args
+            )
+            deleted = conn.execute(f"DELETE FROM results WHERE {where}", args)
+
+        return deleted.rowcount
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Number and total size of cached results per parser version.
+        """
+
+        return {
+            version: {"results": count, "bytes": size}
+            for version, count, size in self._connection().execute(
+                "SELECT version, COUNT(*), SUM(size) FROM results GROUP BY version"
+            )
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
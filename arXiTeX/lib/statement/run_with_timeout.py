@@ -1,36 +1,58 @@
 import signal
+import threading
 from .errors import ParseError, format_error
+from .deadline import current_deadline, deadline
 
 
-def run_with_timeout(seconds: int):
+def run_with_timeout(seconds: int, reserve: float = 0):
     """
     Decorator that raises TimeoutError if the wrapped function takes longer
     than `seconds` to complete.
 
-    Uses SIGALRM (Unix only) rather than a forked subprocess. The fork-based
-    approach deadlocks when called from inside a ProcessPoolExecutor worker:
-    fork() copies the worker's locked logging handlers into the child, and any
+    Always sets a cooperative deadline (see `deadline`), which the regex
+    path checks as it goes, so timeouts work from any thread. In the main
+    thread it also uses SIGALRM (Unix only), which interrupts any Python
+    code, including plasTeX. Neither can interrupt C code or a process that
+    is swapping; for that, parse in a `SupervisedWorker`.
+
+    The cooperative deadline passes `reserve` seconds before the alarm,
+    leaving a step that stops at it time to wrap up what it finished. Once
+    it has stopped, the alarm no longer interrupts.
+
+    SIGALRM rather than a forked subprocess: the fork-based approach
+    deadlocks when called from inside a ProcessPoolExecutor worker: fork()
+    copies the worker's locked logging handlers into the child, and any
     subsequent log write in the child blocks forever waiting for a lock that
     will never be released.
-
-    SIGALRM fires in the same process, so there are no inherited locks and no
-    deadlock risk. Workers are single-threaded, so signal delivery is reliable.
     """
     def decorator(func):
         def wraps(*args, **kwargs):
-            def _handler(signum, frame):
-                raise TimeoutError(format_error(
-                    ParseError.TIMEOUT,
-                    f"Took longer than {seconds} seconds"
-                ))
-
-            old_handler = signal.signal(signal.SIGALRM, _handler)
-            signal.alarm(seconds)
-            try:
-                return func(*args, **kwargs)
-            finally:
-                signal.alarm(0)          # cancel any pending alarm
-                signal.signal(signal.SIGALRM, old_handler)  # restore previous handler
+            use_alarm = (
+                hasattr(signal, "SIGALRM")
+                and threading.current_thread() is threading.main_thread()
+            )
+
+            with deadline(seconds - reserve):
+                if not use_alarm:
+                    return func(*args, **kwargs)
+
+                def _handler(signum, frame):
+                    current = current_deadline()
+                    if current is not None and current.reached:
+                        # Already stopping; let it return what it finished
+                        return
+                    raise TimeoutError(format_error(
+                        ParseError.TIMEOUT,
+                        f"Took longer than {seconds} seconds"
+                    ))
+
+                old_handler = signal.signal(signal.SIGALRM, _handler)
+                signal.alarm(seconds)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    signal.alarm(0)          # cancel any pending alarm
+                    signal.signal(signal.SIGALRM, old_handler)  # restore previous handler
 
         return wraps
     return decorator
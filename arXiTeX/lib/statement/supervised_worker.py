@@ -0,0 +1,225 @@
+"""
+A persistent worker process that is killed and replaced when a task overruns its deadline or uses
+too much memory. Unlike a timeout inside the process, this also stops code that never returns to
+Python, such as a plasTeX parse stuck in C code or allocating without bound, and a bad paper only
+costs a respawn instead of hanging or crashing the caller.
+"""
+
+import os
+import time
+import signal
+import threading
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Optional
+from .errors import ParseError, format_error
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """
+    Resident memory of a process, or None where it can't be read (no '/proc').
+    """
+
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _serve(conn: Connection):
+    """
+    Main loop of the worker process: runs tasks from `conn` until it is closed.
+    """
+
+    # Ctrl-C goes to the whole process group; the supervisor decides what happens to the worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        fn, args, kwargs = task
+        try:
+            reply = ("ok", fn(*args, **kwargs))
+        except Exception as e:
+            reply = ("error", e)
+
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # The result or exception couldn't be pickled
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class SupervisedWorker:
+    """
+    Runs functions in a persistent child process, one at a time. The process is killed if a call
+    runs past its timeout or the process's resident memory exceeds `max_rss_bytes`, and a fresh
+    one is started for the next call. Safe to share between threads (calls are serialized).
+
+    Parameters
+    ----------
+    max_rss_bytes : int, optional
+        Resident memory above which the process is killed, checked every `poll_interval`. Only
+        enforced where '/proc' exists (Linux). Default, no limit.
+    max_tasks : int, optional
+        Number of calls after which the process is replaced, which bounds slow leaks. Default,
+        never replaced.
+    poll_interval : float, optional
+        Seconds between checks of the deadline and memory while a call runs. Default, 0.05.
+    start_method : str, optional
+        multiprocessing start method of the process. Default, 'spawn', which is safe to use from
+        threads.
+    """
+
+    def __init__(
+        self,
+        max_rss_bytes: Optional[int] = None,
+        max_tasks: Optional[int] = None,
+        poll_interval: float = 0.05,
+        start_method: str = "spawn"
+    ):
+        self.max_rss_bytes = max_rss_bytes
+        self.max_tasks = max_tasks
+        self.poll_interval = poll_interval
+        self.restarts = 0
+
+        self._context = multiprocessing.get_context(start_method)
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._conn: Optional[Connection] = None
+        self._tasks = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process is not None else None
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(target=_serve, args=(child_conn,), daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._tasks = 0
+
+    def _kill(self):
+        if self._process is None:
+            return
+
+        self._process.kill()
+        self._process.join()
+        self._conn.close()
+        self._process = None
+        self._conn = None
+        self.restarts += 1
+
+    def call(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Calls `fn(*args, **kwargs)` in the worker process and returns its result, or raises what
+        it raised.
+
+        Parameters
+        ----------
+        fn : Callable
+            Picklable function, e.g. a module-level function.
+        timeout : float, optional
+            Seconds after which the process is killed and TimeoutError is raised. Default, none.
+
+        Returns
+        -------
+        result : Any
+            Return value of `fn`.
+        """
+
+        with self._lock:
+            if self._process is None or not self._process.is_alive():
+                self._process = None
+                self._spawn()
+
+            expires_at = time.monotonic() + timeout if timeout is not None else None
+            self._conn.send((fn, args, kwargs))
+            self._tasks += 1
+
+            while not self._conn.poll(self.poll_interval):
+                if expires_at is not None and time.monotonic() >= expires_at:
+                    self._kill()
+                    raise TimeoutError(format_error(
+                        ParseError.TIMEOUT,
+                        f"Killed after {timeout:g} seconds"
+                    ))
+
+                rss = _rss_bytes(self._process.pid) if self.max_rss_bytes is not None else None
+                if rss is not None and rss > self.max_rss_bytes:
+                    self._kill()
+                    raise MemoryError(format_error(
+                        ParseError.MEMORY,
+                        f"Killed at {rss / 2 ** 20:.0f} MiB resident memory "
+                        f"(limit {self.max_rss_bytes / 2 ** 20:.0f} MiB)"
+                    ))
+
+                if not self._process.is_alive():
+                    break
+
+            try:
+                status, value = self._conn.recv()
+            except (EOFError, OSError):
+                self._process.join(timeout=1)
+                exitcode = self._process.exitcode
+                self._kill()
+                raise RuntimeError(format_error(
+                    ParseError.UNKNOWN,
+                    f"Worker process died (exit code {exitcode})"
+                ))
+
+            if self.max_tasks is not None and self._tasks >= self.max_tasks:
+                self._stop()
+
+            if status == "error":
+                raise value
+            return value
+
+    def close(self):
+        """
+        Stops the worker process. The next call starts a new one. A call running in another
+        thread is interrupted and raises RuntimeError.
+        """
+
+        if not self._lock.acquire(blocking=False):
+            process = self._process
+            if process is not None:
+                process.kill()
+            return
+
+        try:
+            self._stop()
+        finally:
+            self._lock.release()
+
+    def _stop(self):
+        if self._process is None:
+            return
+
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def __enter__(self) -> "SupervisedWorker":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,316 @@
+"""
+Reader for arXiv's bulk source archives ('arXiv_src_YYMM_NNN.tar'), mirrored on local disk. Each
+archive holds one gzipped source per paper (e.g. '2101/2101.00001.gz'), which is read straight out
+of the archive instead of from 'https://arxiv.org/src/'.
+"""
+
+import io
+import re
+import contextlib
+import shutil
+import sqlite3
+import tarfile
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple
+from tqdm import tqdm
+from .extract_source import (
+    DEFAULT_MAX_SOURCE_BYTES, DEFAULT_MAX_SOURCE_MEMBERS, extract_source, is_text_source,
+    read_source
+)
+from .source_tree import MemorySourceTree
+
+# Member names of new-style ('2101/2101.00001.gz') and old-style ('0001/hep-th0001001.gz') papers
+_MEMBER_RE = re.compile(r"(?:^|/)([a-z\-]+)?(\d{4}\.\d{4,5}|\d{7})(v\d+)?\.(gz|pdf)$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    arxiv_id TEXT PRIMARY KEY,
+    archive  TEXT NOT NULL,
+    offset   INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    is_pdf   INTEGER NOT NULL
+);
+"""
+
+
+def _member_arxiv_id(name: str) -> Optional[Tuple[str, bool]]:
+    """
+    Returns the arXiv ID of a bulk archive member, and whether it is a PDF (papers submitted
+    without source), or None for other members.
+    """
+
+    m = _MEMBER_RE.search(name)
+    if m is None:
+        return None
+
+    archive, number, version, extension = m.groups()
+    arxiv_id = f"{archive}/{number}" if archive else number
+
+    return arxiv_id + (version or ""), extension == "pdf"
+
+
+class _MemberReader(io.RawIOBase):
+    """
+    Raw stream over the bytes of one member of an uncompressed tar archive.
+    """
+
+    def __init__(self, f: BinaryIO, offset: int, size: int):
+        self._f = f
+        self._pos = offset
+        self._end = offset + size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self._end - self._pos)
+        if n <= 0:
+            return 0
+
+        self._f.seek(self._pos)
+        n = self._f.readinto(memoryview(buffer)[:n])
+        self._pos += n
+        return n
+
+
+def build_bulk_source_index(archives: Iterable[Path | str], index_path: Path | str) -> Path:
+    """
+    Indexes the members of bulk source archives by arXiv ID. Only reads tar headers, seeking past
+    the sources themselves. Archives indexed later take precedence for papers in several archives.
+
+    Parameters
+    ----------
+    archives : Iterable[Path | str]
+        Paths to 'arXiv_src_YYMM_NNN.tar' archives.
+    index_path : Path | str
+        Path to the SQLite index. Created if it doesn't exist, otherwise extended.
+
+    Returns
+    -------
+    index_path : Path
+        Path to the index.
+    """
+
+    index_path = Path(index_path)
+
+    with sqlite3.connect(index_path) as conn:
+        conn.executescript(_SCHEMA)
+
+        for archive in tqdm(list(archives), desc="Indexing source archives", dynamic_ncols=True):
+            archive = Path(archive).resolve()
+            rows: List[tuple] = []
+
+            with tarfile.open(archive, mode="r:") as tf:
+                for member in tf:
+                    if not member.isfile():
+                        continue
+                    found = _member_arxiv_id(member.name)
+                    if found is None:
+                        continue
+                    arxiv_id, is_pdf = found
+                    rows.append((arxiv_id, str(archive), member.offset_data, member.size, is_pdf))
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO members (arxiv_id, archive, offset, size, is_pdf) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+
+    return index_path
+
+
+class BulkSourceReader:
+    """
+    Random access to paper sources in bulk source archives, through an index built by
+    `build_bulk_source_index`. Callable like `download_arxiv_paper`, so it can replace it as the
+    `downloader` of `parse_paper`. Picklable, so it can be shipped to worker processes.
+
+    Parameters
+    ----------
+    index_path : Path | str
+        Path to the index.
+    max_bytes : int, optional
+        Cap on the uncompressed size of a source. Default, 512 MiB.
+    max_members : int, optional
+        Cap on the number of files in a source. Default, 10,000.
+    member_filter : Callable[[str], bool], optional
+        Only files whose name passes it are extracted; None extracts every file. Default,
+        `is_text_source`.
+    in_memory : bool, optional
+        Whether calling the reader returns the source as a MemorySourceTree, read into memory,
+        instead of extracting it into a directory. Default, False.
+    """
+
+    def __init__(
+        self,
+        index_path: Path | str,
+        max_bytes: int = DEFAULT_MAX_SOURCE_BYTES,
+        max_members: int = DEFAULT_MAX_SOURCE_MEMBERS,
+        member_filter: Optional[Callable[[str], bool]] = is_text_source,
+        in_memory: bool = False
+    ):
+        self.index_path = Path(index_path)
+        self.max_bytes = max_bytes
+        self.max_members = max_members
+        self.member_filter = member_filter
+        self.in_memory = in_memory
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def __getstate__(self):
+        # Connections can't be pickled; worker processes open their own
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        return state
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+        return self._conn
+
+    def __contains__(self, arxiv_id: str) -> bool:
+        return self._connection().execute(
+            "SELECT 1 FROM members WHERE arxiv_id = ?", (arxiv_id,)
+        ).fetchone() is not None
+
+    def arxiv_ids(self, archive: Optional[Path | str] = None) -> List[str]:
+        """
+        Returns the arXiv IDs with a source, in archive order, optionally of one archive only.
+        """
+
+        if archive is None:
+            rows = self._connection().execute(
+                "SELECT arxiv_id FROM members WHERE NOT is_pdf ORDER BY archive, offset"
+            )
+        else:
+            rows = self._connection().execute(
+                "SELECT arxiv_id FROM members WHERE NOT is_pdf AND archive = ? ORDER BY offset",
+                (str(Path(archive).resolve()),)
+            )
+
+        return [arxiv_id for (arxiv_id,) in rows]
+
+    @contextlib.contextmanager
+    def _open_member(self, arxiv_id: str) -> Iterator[BinaryIO]:
+        found = self._connection().execute(
+            "SELECT archive, offset, size, is_pdf FROM members WHERE arxiv_id = ?", (arxiv_id,)
+        ).fetchone()
+
+        if found is None:
+            raise KeyError(f"{arxiv_id} is not in the bulk source index")
+
+        archive, offset, size, is_pdf = found
+        if is_pdf:
+            raise ValueError(f"{arxiv_id} was submitted as a PDF, without source")
+
+        with open(archive, "rb") as f:
+            yield io.BufferedReader(_MemberReader(f, offset, size))
+
+    def read_tree(self, arxiv_id: str) -> MemorySourceTree:
+        """
+        Reads a paper's source into memory.
+        """
+
+        with self._open_member(arxiv_id) as stream:
+            tree, _ = read_source(
+                stream,
+                max_bytes=self.max_bytes,
+                max_members=self.max_members,
+                member_filter=self.member_filter
+            )
+            return tree
+
+    def __call__(self, cwd: Path, arxiv_id: str) -> Path | MemorySourceTree:
+        """
+        Extracts a paper's source into a new directory in `cwd`, like `download_arxiv_paper`, or
+        reads it into memory if the reader is `in_memory`.
+
+        Parameters
+        ----------
+        cwd : Path
+            Directory to extract the paper's source files into.
+        arxiv_id : str
+            arXiv ID of the paper, as named in the archive.
+
+        Returns
+        -------
+        source : Path | MemorySourceTree
+            The directory containing the source files, or the files themselves.
+        """
+
+        if self.in_memory:
+            return self.read_tree(arxiv_id)
+
+        with self._open_member(arxiv_id) as stream:
+            return extract_source(
+                stream,
+                cwd / arxiv_id.replace("/", "-"),
+                max_bytes=self.max_bytes,
+                max_members=self.max_members,
+                member_filter=self.member_filter
+            ).paper_dir
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def iter_bulk_archive(
+    archive: Path | str,
+    cwd: Path,
+    max_bytes: int = DEFAULT_MAX_SOURCE_BYTES,
+    max_members: int = DEFAULT_MAX_SOURCE_MEMBERS,
+    member_filter: Optional[Callable[[str], bool]] = is_text_source
+) -> Iterator[Tuple[str, Path]]:
+    """
+    Reads a bulk source archive front to back without an index, extracting one paper at a time
+    into `cwd`. Each paper's directory is deleted once the next one is requested. Papers submitted
+    as PDFs, and sources that fail to extract, are skipped.
+
+    Parameters
+    ----------
+    archive : Path | str
+        Path to an 'arXiv_src_YYMM_NNN.tar' archive.
+    cwd : Path
+        Directory to extract sources into.
+    max_bytes : int, optional
+        Cap on the uncompressed size of a source. Default, 512 MiB.
+    max_members : int, optional
+        Cap on the number of files in a source. Default, 10,000.
+    member_filter : Callable[[str], bool], optional
+        Only files whose name passes it are extracted; None extracts every file. Default,
+        `is_text_source`.
+
+    Returns
+    -------
+    papers : Iterator[Tuple[str, Path]]
+        Iterator of (arXiv ID, directory of its source files).
+    """
+
+    with tarfile.open(archive, mode="r|") as tf:
+        for member in tf:
+            found = _member_arxiv_id(member.name) if member.isfile() else None
+            if found is None or found[1]:
+                continue
+
+            arxiv_id = found[0]
+            paper_dir = cwd / arxiv_id.replace("/", "-")
+
+            try:
+                extract_source(
+                    tf.extractfile(member),
+                    paper_dir,
+                    max_bytes=max_bytes,
+                    max_members=max_members,
+                    member_filter=member_filter
+                )
+            except Exception as e:
+                print(f"Skipping {arxiv_id} in {archive}: {e}")
+                shutil.rmtree(paper_dir, ignore_errors=True)
+                continue
+
+            try:
+                yield arxiv_id, paper_dir
+            finally:
+                shutil.rmtree(paper_dir, ignore_errors=True)
@@ -1,13 +1,99 @@
 import requests
-import gzip
-import tarfile
-import io
+import contextlib
 from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional
+from .source_cache import ARXIV_SRC_URL, SourceCache, default_source_cache
+from .extract_source import (
+    DEFAULT_MAX_SOURCE_BYTES, DEFAULT_MAX_SOURCE_MEMBERS, ExtractionReport, extract_source,
+    is_text_source, read_source
+)
+from .source_tree import MemorySourceTree
 
 
-def download_arxiv_paper(cwd: Path, arxiv_id: str) -> Path:
+@contextlib.contextmanager
+def _open_arxiv_source(
+    arxiv_id: str,
+    source_cache: Optional[SourceCache] = None
+) -> Iterator[BinaryIO]:
     """
-    Downloads an arXiv paper's source files from the arXiv API.
+    A context giving a stream of a paper's gzipped source, from the cache or straight from arXiv.
+    """
+
+    if source_cache is None:
+        source_cache = default_source_cache()
+
+    if source_cache is not None:
+        with open(source_cache.fetch(arxiv_id), "rb") as f:
+            yield f
+        return
+
+    with requests.get(ARXIV_SRC_URL + arxiv_id, stream=True, timeout=60) as paper_res:
+        paper_res.raise_for_status()
+        # Undo any Content-Encoding, as `content` would
+        paper_res.raw.decode_content = True
+        yield paper_res.raw
+
+
+def fetch_arxiv_source(
+    cwd: Path,
+    arxiv_id: str,
+    source_cache: Optional[SourceCache] = None,
+    max_bytes: int = DEFAULT_MAX_SOURCE_BYTES,
+    max_members: int = DEFAULT_MAX_SOURCE_MEMBERS,
+    member_filter: Optional[Callable[[str], bool]] = is_text_source
+) -> ExtractionReport:
+    """
+    Same as `download_arxiv_paper`, but returns what was extracted and skipped.
+    """
+
+    with _open_arxiv_source(arxiv_id, source_cache) as stream:
+        return extract_source(
+            stream,
+            cwd / arxiv_id.replace("/", "-"),
+            max_bytes=max_bytes,
+            max_members=max_members,
+            member_filter=member_filter
+        )
+
+
+def read_arxiv_source(
+    arxiv_id: str,
+    source_cache: Optional[SourceCache] = None,
+    max_bytes: int = DEFAULT_MAX_SOURCE_BYTES,
+    max_members: int = DEFAULT_MAX_SOURCE_MEMBERS,
+    member_filter: Optional[Callable[[str], bool]] = is_text_source
+) -> MemorySourceTree:
+    """
+    Same as `download_arxiv_paper`, but reads the source files into memory instead of a
+    directory, so parsing them needs no disk access.
+
+    Returns
+    -------
+    tree : MemorySourceTree
+        The paper's source files.
+    """
+
+    with _open_arxiv_source(arxiv_id, source_cache) as stream:
+        tree, _ = read_source(
+            stream,
+            max_bytes=max_bytes,
+            max_members=max_members,
+            member_filter=member_filter
+        )
+        return tree
+
+
+def download_arxiv_paper(
+    cwd: Path,
+    arxiv_id: str,
+    source_cache: Optional[SourceCache] = None,
+    max_bytes: int = DEFAULT_MAX_SOURCE_BYTES,
+    max_members: int = DEFAULT_MAX_SOURCE_MEMBERS,
+    member_filter: Optional[Callable[[str], bool]] = is_text_source
+) -> Path:
+    """
+    Downloads an arXiv paper's source files from the arXiv API. The source is decompressed and
+    extracted as it streams in.
 
     Parameters
     ----------
@@ -15,26 +101,30 @@ def download_arxiv_paper(cwd: Path, arxiv_id: str) -> Path:
         Directory to extract the paper's source files into.
     arxiv_id : str
         arXiv id of the paper.
+    source_cache : SourceCache, optional
+        Cache to take the source from, which only downloads it when needed. Default, the cache
+        named by ARXITEX_SOURCE_CACHE if set, otherwise always download.
+    max_bytes : int, optional
+        Cap on the uncompressed size of the source; larger sources raise SourceLimitError.
+        Default, 512 MiB.
+    max_members : int, optional
+        Cap on the number of files in the source; sources with more raise SourceLimitError.
+        Default, 10,000.
+    member_filter : Callable[[str], bool], optional
+        Only files whose name passes it are extracted; None extracts every file. Default,
+        `is_text_source`, which skips figures, PDFs, archives and other binary assets.
 
     Returns
     -------
     paper_dir : Path
         The directory containing the downloaded source files.
     """
-    safe_id = arxiv_id.replace("/", "-")
-    paper_dir = cwd / safe_id
-
-    paper_res = requests.get(f"https://arxiv.org/src/{arxiv_id}")
-    paper_res.raise_for_status()
-
-    paper_dir.mkdir(exist_ok=False)
-    unzipped = gzip.decompress(paper_res.content)
-
-    try:
-        with tarfile.open(fileobj=io.BytesIO(unzipped), mode="r:*") as tf:
-            tf.extractall(path=paper_dir)
-    except Exception:
-        with open(paper_dir / "main.tex", "wb") as main_file:
-            main_file.write(unzipped)
 
-    return paper_dir
+    return fetch_arxiv_source(
+        cwd,
+        arxiv_id,
+        source_cache=source_cache,
+        max_bytes=max_bytes,
+        max_members=max_members,
+        member_filter=member_filter
+    ).paper_dir
@@ -0,0 +1,239 @@
+"""
+Streaming extraction of arXiv source files. Sources are gzipped tarballs, or a single gzipped
+file for single-file submissions. They are decompressed and extracted as a stream, so memory use
+doesn't depend on their size, and extraction stops as soon as a size or member cap is exceeded.
+"""
+
+import io
+import gzip
+import shutil
+import tarfile
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath, Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+from .source_tree import MemorySourceTree, normalize_source_path
+
+"""
+Default cap on the uncompressed size of a paper's source
+"""
+DEFAULT_MAX_SOURCE_BYTES = 512 * 1024 ** 2
+
+"""
+Default cap on the number of members of a paper's source tarball
+"""
+DEFAULT_MAX_SOURCE_MEMBERS = 10_000
+
+"""
+Suffixes of binary assets (figures, PDF and PostScript files, archives), which parsing never
+reads. Any other file may be, since \\input follows files of any extension
+"""
+BINARY_SOURCE_SUFFIXES = frozenset({
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp", ".svg", ".ico",
+    ".pdf", ".eps", ".ps",
+    ".zip", ".tar", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar",
+})
+
+_BUFFER_SIZE = 64 * 1024
+_TAR_BLOCK = 512
+
+
+class SourceLimitError(ValueError):
+    """
+    Raised when a source exceeds the uncompressed size or member cap.
+    """
+
+
+@dataclass
+class ExtractionReport:
+    """
+    What was extracted from a paper's source.
+
+    Attributes
+    ----------
+    paper_dir : Path
+        Directory the source was extracted into, or None if it was read into memory.
+    is_tar : bool
+        Whether the source was a tarball (otherwise a single file, saved as 'main.tex').
+    members : int
+        Number of files extracted.
+    uncompressed_bytes : int
+        Uncompressed size of the source.
+    skipped : List[str]
+        Names of the files left out by the member filter.
+    skipped_bytes : int
+        Total size of the skipped files.
+    """
+
+    paper_dir: Optional[Path]
+    is_tar: bool
+    members: int
+    uncompressed_bytes: int
+    skipped: List[str] = field(default_factory=list)
+    skipped_bytes: int = 0
+
+
+def is_text_source(name: str) -> bool:
+    """
+    Checks whether a member of a source tarball is a file parsing may read, i.e. not a binary
+    asset (see `BINARY_SOURCE_SUFFIXES`).
+    """
+
+    return PurePosixPath(name).suffix.lower() not in BINARY_SOURCE_SUFFIXES
+
+
+class _BoundedReader(io.RawIOBase):
+    """
+    Raw stream over a decompressed source that fails once more than `max_bytes` were read.
+    """
+
+    def __init__(self, stream: BinaryIO, max_bytes: int):
+        self._stream = stream
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self._stream.readinto(buffer)
+        self.bytes_read += n
+        if self.bytes_read > self.max_bytes:
+            raise SourceLimitError(f"Source exceeds {self.max_bytes} uncompressed bytes")
+        return n
+
+
+def _is_tar_header(block: bytes) -> bool:
+    try:
+        tarfile.TarInfo.frombuf(block[:_TAR_BLOCK], tarfile.ENCODING, "surrogateescape")
+        return True
+    except tarfile.HeaderError:
+        return False
+
+
+def extract_source(
+    stream: BinaryIO,
+    paper_dir: Path,
+    max_bytes: int = DEFAULT_MAX_SOURCE_BYTES,
+    max_members: int = DEFAULT_MAX_SOURCE_MEMBERS,
+    member_filter: Optional[Callable[[str], bool]] = None
+) -> ExtractionReport:
+    """
+    Extracts a gzipped arXiv source from a stream into `paper_dir`, which is created. Reads the
+    stream once, front to back.
+
+    Parameters
+    ----------
+    stream : BinaryIO
+        Gzipped source, e.g. a file or the raw body of a response.
+    paper_dir : Path
+        Directory to extract into. Must not exist.
+    max_bytes : int, optional
+        Cap on the uncompressed size of the source. Default, 512 MiB.
+    max_members : int, optional
+        Cap on the number of members of a tarball. Default, 10,000.
+    member_filter : Callable[[str], bool], optional
+        Only files of a tarball whose name passes it are written, e.g. `is_text_source`. Skipped
+        files are still read through, but never touch the disk. Default, write every file.
+
+    Returns
+    -------
+    report : ExtractionReport
+        What was extracted.
+    """
+
+    paper_dir.mkdir(exist_ok=False)
+
+    with gzip.GzipFile(fileobj=stream, mode="rb") as gz:
+        bounded = _BoundedReader(gz, max_bytes)
+        reader = io.BufferedReader(bounded, buffer_size=_BUFFER_SIZE)
+
+        if not _is_tar_header(reader.peek(_TAR_BLOCK)):
+            with open(paper_dir / "main.tex", "wb") as main_file:
+                shutil.copyfileobj(reader, main_file, _BUFFER_SIZE)
+            return ExtractionReport(paper_dir, False, 1, bounded.bytes_read)
+
+        report = ExtractionReport(paper_dir, True, 0, 0)
+        members = 0
+        # The "data" filter rejects absolute paths, links out of the directory and special files
+        filter_kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+
+        with tarfile.open(fileobj=reader, mode="r|") as tf:
+            for member in tf:
+                members += 1
+                if members > max_members:
+                    raise SourceLimitError(f"Source has more than {max_members} members")
+
+                # Links can't be resolved in a stream, and sources never need them
+                if not (member.isfile() or member.isdir()):
+                    continue
+
+                if member.isfile() and member_filter is not None and not member_filter(member.name):
+                    report.skipped.append(member.name)
+                    report.skipped_bytes += member.size
+                    continue
+
+                tf.extract(member, path=paper_dir, **filter_kwargs)
+                if member.isfile():
+                    report.members += 1
+
+        # Drain trailing padding so the gzip trailer is checked
+        while reader.read(_BUFFER_SIZE):
+            pass
+
+    report.uncompressed_bytes = bounded.bytes_read
+    return report
+
+
+def read_source(
+    stream: BinaryIO,
+    max_bytes: int = DEFAULT_MAX_SOURCE_BYTES,
+    max_members: int = DEFAULT_MAX_SOURCE_MEMBERS,
+    member_filter: Optional[Callable[[str], bool]] = None
+) -> Tuple[MemorySourceTree, ExtractionReport]:
+    """
+    Same as `extract_source`, but reads the source into memory instead of a directory. Members
+    whose path points outside the source are dropped.
+
+    Returns
+    -------
+    tree : MemorySourceTree
+        The source files.
+    report : ExtractionReport
+        What was read, with no `paper_dir`.
+    """
+
+    files: Dict[str, bytes] = {}
+
+    with gzip.GzipFile(fileobj=stream, mode="rb") as gz:
+        bounded = _BoundedReader(gz, max_bytes)
+        reader = io.BufferedReader(bounded, buffer_size=_BUFFER_SIZE)
+
+        if not _is_tar_header(reader.peek(_TAR_BLOCK)):
+            files["main.tex"] = reader.read()
+            return MemorySourceTree(files), ExtractionReport(None, False, 1, bounded.bytes_read)
+
+        report = ExtractionReport(None, True, 0, 0)
+        members = 0
+
+        with tarfile.open(fileobj=reader, mode="r|") as tf:
+            for member in tf:
+                members += 1
+                if members > max_members:
+                    raise SourceLimitError(f"Source has more than {max_members} members")
+
+                if not member.isfile() or normalize_source_path(member.name) is None:
+                    continue
+
+                if member_filter is not None and not member_filter(member.name):
+                    report.skipped.append(member.name)
+                    report.skipped_bytes += member.size
+                    continue
+
+                files[member.name] = tf.extractfile(member).read()
+                report.members += 1
+
+        while reader.read(_BUFFER_SIZE):
+            pass
+
+    report.uncompressed_bytes = bounded.bytes_read
+    return MemorySourceTree(files), report
@@ -0,0 +1,136 @@
+"""
+Helper to run an iterator ahead of its consumer in a background thread.
+"""
+
+import queue
+import threading
+from typing import Generic, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class ReadAhead(Generic[T]):
+    """
+    Consumes an iterator in a background thread, keeping up to `size` items ready before the
+    consumer asks for them. Items keep their order, and exceptions raised by the iterator are
+    re-raised in the consumer.
+
+    Parameters
+    ----------
+    iterator : Iterator[T]
+        Iterator to run ahead.
+    size : int
+        Maximum number of items waiting in the queue.
+    """
+
+    def __init__(self, iterator: Iterator[T], size: int):
+        self._iterator = iterator
+        self._items: queue.Queue = queue.Queue(maxsize=max(1, size))
+        self._stop = threading.Event()
+        self._finished = False
+        self._deferred = None
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for item in self._iterator:
+                if not self._put((item, None)):
+                    return
+            self._put((_DONE, None))
+        except BaseException as e:
+            self._put((_DONE, e))
+        finally:
+            # Closing in this thread releases any resources a generator holds (e.g. open files)
+            if hasattr(self._iterator, "close"):
+                self._iterator.close()
+
+    def _unwrap(self, entry) -> T:
+        item, error = entry
+        if item is _DONE:
+            self._finished = True
+            if error is not None:
+                raise error
+            raise StopIteration
+        return item
+
+    def __iter__(self) -> "ReadAhead[T]":
+        return self
+
+    def __next__(self) -> T:
+        if self._finished:
+            raise StopIteration
+        if self._deferred is not None:
+            entry, self._deferred = self._deferred, None
+            return self._unwrap(entry)
+        return self._unwrap(self._items.get())
+
+    def drain(self, max_items: int) -> List[T]:
+        """
+        Returns up to `max_items` items that are already available, without waiting. Returns an
+        empty list when none are ready or the iterator is exhausted; the end of the iterator is
+        then reported by the next `next` call.
+        """
+
+        drained: List[T] = []
+
+        while len(drained) < max_items and not self._finished and self._deferred is None:
+            try:
+                entry = self._items.get_nowait()
+            except queue.Empty:
+                break
+
+            if entry[0] is _DONE:
+                # Report the end (or error) on the next call, after the drained items are used
+                self._deferred = entry
+                break
+
+            drained.append(entry[0])
+
+        return drained
+
+    def close(self):
+        """
+        Stops the background thread.
+        """
+
+        self._stop.set()
+        self._thread.join()
+
+
+def read_ahead(iterator: Iterator[T], size: int) -> Iterator[T]:
+    """
+    Consumes `iterator` in a background thread, keeping up to `size` items ready before the
+    consumer asks for them. Items keep their order, and exceptions raised by `iterator` are
+    re-raised in the consumer. Closing the returned generator stops the background thread.
+
+    Parameters
+    ----------
+    iterator : Iterator[T]
+        Iterator to run ahead.
+    size : int
+        Maximum number of items waiting in the queue.
+
+    Returns
+    -------
+    items : Iterator[T]
+        The items of `iterator`, in order.
+    """
+
+    items = ReadAhead(iterator, size)
+
+    try:
+        yield from items
+    finally:
+        items.close()
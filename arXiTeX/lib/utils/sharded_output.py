@@ -0,0 +1,149 @@
+"""
+JSONL output split across numbered files, with a checkpoint of what was written so an interrupted
+run can resume where it left off.
+"""
+
+import os
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, TextIO
+
+
+def _read_keys(path: Path) -> List[str]:
+    keys = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                keys.append(json.loads(line)["key"])
+            except (json.JSONDecodeError, KeyError):
+                continue
+    return keys
+
+
+class ShardedOutput:
+    """
+    Writes records to '{prefix}-NNNNN.jsonl' files of at most `shard_size` records each. A file is
+    written as '.part' and only renamed once it is full or the output is closed, after which the
+    keys of its records are added to '{prefix}.checkpoint'. An interrupted run thus leaves at worst
+    a '.part' file, which is discarded when the output is reopened, and `done` holds the keys of
+    every record that made it into a finished file.
+
+    Parameters
+    ----------
+    out_dir : Path | str
+        Directory of the output. Created if it doesn't exist.
+    prefix : str, optional
+        Prefix of the output files. Default, 'results'.
+    shard_size : int, optional
+        Maximum number of records per file. Default, 1,000.
+    """
+
+    def __init__(self, out_dir: Path | str, prefix: str = "results", shard_size: int = 1000):
+        if shard_size < 1:
+            raise ValueError(f"shard_size must be positive, got {shard_size}")
+
+        self.out_dir = Path(out_dir)
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+
+        self._checkpoint_path = self.out_dir / f"{prefix}.checkpoint"
+        self._file_re = re.compile(rf"^{re.escape(prefix)}-(\d+)\.jsonl$")
+        self._file: Optional[TextIO] = None
+        self._keys: List[str] = []
+
+        self.done: Set[str] = set()
+        self._next_index = self._recover()
+
+    def _recover(self) -> int:
+        """
+        Loads the checkpoint, discards unfinished files and checkpoints finished files that were
+        renamed but not checkpointed before an interruption. Returns the next file index.
+        """
+
+        checkpointed: Set[str] = set()
+        if self._checkpoint_path.exists():
+            lines = self._checkpoint_path.read_text(encoding="utf-8").splitlines(keepends=True)
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn last line; its file is recovered below
+                    continue
+                checkpointed.add(entry["file"])
+                self.done.update(entry["keys"])
+
+            if lines and not lines[-1].endswith("\n"):
+                with open(self._checkpoint_path, "a", encoding="utf-8") as f:
+                    f.write("\n")
+
+        for part in self.out_dir.glob(f"{self.prefix}-*.jsonl.part"):
+            part.unlink()
+
+        indices = [-1]
+        for path in sorted(self.out_dir.glob(f"{self.prefix}-*.jsonl")):
+            m = self._file_re.match(path.name)
+            if m is None:
+                continue
+            indices.append(int(m.group(1)))
+
+            if path.name not in checkpointed:
+                self._checkpoint(path.name, _read_keys(path))
+
+        return max(indices) + 1
+
+    def _checkpoint(self, file_name: str, keys: List[str]):
+        with open(self._checkpoint_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"file": file_name, "keys": keys}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(keys)
+
+    def _part_path(self) -> Path:
+        return self.out_dir / f"{self.prefix}-{self._next_index:05d}.jsonl.part"
+
+    def write(self, key: str, record: Dict[str, Any]):
+        """
+        Writes a record, stored with its key under 'key'.
+        """
+
+        if self._file is None:
+            self._file = open(self._part_path(), "w", encoding="utf-8")
+
+        self._file.write(json.dumps({"key": key, **record}, default=str) + "\n")
+        self._keys.append(key)
+
+        if len(self._keys) >= self.shard_size:
+            self.commit()
+
+    def commit(self):
+        """
+        Finishes the current file, if any records were written to it.
+        """
+
+        if self._file is None:
+            return
+
+        part_path = self._part_path()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+        final_path = part_path.with_suffix("")
+        os.replace(part_path, final_path)
+        self._checkpoint(final_path.name, self._keys)
+
+        self._keys = []
+        self._next_index += 1
+
+    def close(self):
+        self.commit()
+
+    def __enter__(self) -> "ShardedOutput":
+        return self
+
+    def __exit__(self, *exc):
+        # Also on errors and interrupts, so finished work is kept
+        self.close()
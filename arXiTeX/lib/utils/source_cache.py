@@ -0,0 +1,260 @@
+"""
+Persistent, content-addressed cache of arXiv source downloads, so that re-parsing a paper doesn't
+download it again.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import tempfile
+import requests
+from pathlib import Path
+from typing import Optional
+
+ARXIV_SRC_URL = "https://arxiv.org/src/"
+
+"""
+Environment variable naming the directory of the default source cache
+"""
+SOURCE_CACHE_ENV = "ARXITEX_SOURCE_CACHE"
+
+_CHUNK_SIZE = 1024 * 1024
+_DAY_S = 24 * 60 * 60
+_VERSIONED_RE = re.compile(r"v\d+$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest    TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    arxiv_id      TEXT PRIMARY KEY,
+    digest        TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    checked_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_last_used ON blobs (last_used);
+"""
+
+
+class SourceCache:
+    """
+    On-disk cache of the raw source files served by 'https://arxiv.org/src/', keyed by arXiv ID
+    (with or without version). Files are stored once per content hash and evicted least recently
+    used first once they exceed `max_bytes`.
+
+    Sources of versioned IDs (e.g. '2101.00001v2') never change, so they are never fetched again.
+    Unversioned IDs point to the latest version; once `revalidate_after_days` have passed, they are
+    revalidated with a conditional request (ETag / If-Modified-Since), which only downloads the
+    source if it changed. Safe to share between processes.
+
+    Parameters
+    ----------
+    cache_dir : Path | str
+        Directory of the cache. Created if it doesn't exist.
+    max_bytes : int, optional
+        Maximum total size of cached sources. Default, 10 GiB.
+    revalidate_after_days : float, optional
+        Days before unversioned IDs are revalidated. None never revalidates. Default, 7.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path | str,
+        max_bytes: int = 10 * 1024 ** 3,
+        revalidate_after_days: Optional[float] = 7
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.revalidate_after_days = revalidate_after_days
+        (self.cache_dir / "blobs").mkdir(parents=True, exist_ok=True)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def __getstate__(self):
+        # Connections can't be pickled; worker processes open their own
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        return state
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.cache_dir / "index.sqlite", timeout=60)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.cache_dir / "blobs" / digest[:2] / digest
+
+    def get(self, arxiv_id: str) -> Optional[Path]:
+        """
+        Returns the cached source file of a paper without any network request, or None if it isn't
+        cached.
+        """
+
+        conn = self._connection()
+        found = conn.execute(
+            "SELECT digest FROM entries WHERE arxiv_id = ?", (arxiv_id,)
+        ).fetchone()
+
+        if found is None or not self._blob_path(found[0]).exists():
+            return None
+
+        with conn:
+            conn.execute(
+                "UPDATE blobs SET last_used = ? WHERE digest = ?", (time.time(), found[0])
+            )
+
+        return self._blob_path(found[0])
+
+    def fetch(self, arxiv_id: str) -> Path:
+        """
+        Returns the source file of a paper, downloading or revalidating it only when needed.
+
+        Parameters
+        ----------
+        arxiv_id : str
+            arXiv ID of the paper, with or without version.
+
+        Returns
+        -------
+        source_path : Path
+            Path to the raw source file, as served by arXiv (usually a gzipped tarball). Only valid
+            until it is evicted.
+        """
+
+        conn = self._connection()
+        found = conn.execute(
+            "SELECT digest, etag, last_modified, checked_at FROM entries WHERE arxiv_id = ?",
+            (arxiv_id,)
+        ).fetchone()
+
+        headers = {}
+        if found is not None and self._blob_path(found[0]).exists():
+            digest, etag, last_modified, checked_at = found
+
+            if (
+                _VERSIONED_RE.search(arxiv_id)
+                or self.revalidate_after_days is None
+                or time.time() - checked_at < self.revalidate_after_days * _DAY_S
+            ):
+                return self.get(arxiv_id)
+
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        try:
+            res = requests.get(ARXIV_SRC_URL + arxiv_id, headers=headers, stream=True, timeout=60)
+        except requests.RequestException:
+            # A stale source is better than none
+            if headers:
+                return self.get(arxiv_id)
+            raise
+
+        with res:
+            if res.status_code == 304 and headers:
+                with conn:
+                    conn.execute(
+                        "UPDATE entries SET checked_at = ? WHERE arxiv_id = ?",
+                        (time.time(), arxiv_id)
+                    )
+                return self.get(arxiv_id)
+
+            res.raise_for_status()
+            digest, size = self._store(res)
+
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT INTO blobs (digest, size, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT (digest) DO UPDATE SET last_used = excluded.last_used",
+                (digest, size, now)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(arxiv_id, digest, etag, last_modified, checked_at) VALUES (?, ?, ?, ?, ?)",
+                (arxiv_id, digest, res.headers.get("ETag"), res.headers.get("Last-Modified"), now)
+            )
+
+        self._evict(keep=digest)
+
+        return self._blob_path(digest)
+
+    def _store(self, res: requests.Response) -> tuple[str, int]:
+        """
+        Streams a response body into the cache. Returns its SHA-256 and size.
+        """
+
+        sha256 = hashlib.sha256()
+        size = 0
+
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir / "blobs", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in res.iter_content(chunk_size=_CHUNK_SIZE):
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+
+            digest = sha256.hexdigest()
+            blob_path = self._blob_path(digest)
+            blob_path.parent.mkdir(exist_ok=True)
+            os.replace(tmp_name, blob_path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        return digest, size
+
+    def _evict(self, keep: str):
+        conn = self._connection()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for digest, size in conn.execute(
+            "SELECT digest, size FROM blobs WHERE digest != ? ORDER BY last_used", (keep,)
+        ):
+            if total <= self.max_bytes:
+                break
+            evicted.append(digest)
+            total -= size
+
+        with conn:
+            conn.executemany("DELETE FROM entries WHERE digest = ?", [(d,) for d in evicted])
+            conn.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in evicted])
+
+        for digest in evicted:
+            self._blob_path(digest).unlink(missing_ok=True)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+_default_cache: Optional[SourceCache] = None
+
+
+def default_source_cache() -> Optional[SourceCache]:
+    """
+    Returns the source cache in the directory named by ARXITEX_SOURCE_CACHE, or None if it isn't
+    set. Used whenever no cache is passed explicitly.
+    """
+
+    global _default_cache
+
+    cache_dir = os.getenv(SOURCE_CACHE_ENV)
+    if not cache_dir:
+        return None
+
+    if _default_cache is None or _default_cache.cache_dir != Path(cache_dir):
+        _default_cache = SourceCache(cache_dir)
+
+    return _default_cache
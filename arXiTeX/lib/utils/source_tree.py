@@ -0,0 +1,183 @@
+"""
+Read-only views of a paper's source files. Parsing reads sources through a SourceTree rather than
+walking a directory, so a source held in memory (e.g. read straight out of a tarball) never has to
+touch the disk, and each file is read at most once.
+"""
+
+import os
+import posixpath
+import contextlib
+from abc import ABC, abstractmethod
+from pathlib import Path, PurePosixPath
+from tempfile import TemporaryDirectory
+from typing import Dict, Iterator, List, Mapping, Optional
+
+
+def normalize_source_path(name: str | PurePosixPath) -> Optional[PurePosixPath]:
+    """
+    Normalizes the name of a file in a source to a relative POSIX path, or None if it points
+    outside the source (absolute, or escaping through '..').
+    """
+
+    name = posixpath.normpath(str(name).replace("\\", "/"))
+    if name in (".", "") or name.startswith("/") or name == ".." or name.startswith("../"):
+        return None
+    return PurePosixPath(name)
+
+
+class SourceTree(ABC):
+    """
+    A paper's source files, addressed by relative POSIX path. Listings are answered from an index
+    built once, and file contents are cached after the first read. Subclasses implement `_index`
+    and `_read`.
+    """
+
+    def __init__(self):
+        self._contents: Dict[PurePosixPath, bytes] = {}
+        self._files: Optional[frozenset] = None
+
+    @abstractmethod
+    def _index(self) -> List[PurePosixPath]:
+        """
+        Returns the paths of all files, sorted. Called for every listing, so built once.
+        """
+
+    @abstractmethod
+    def _read(self, path: PurePosixPath) -> bytes:
+        """
+        Returns the content of the file at normalized `path`.
+        """
+
+    def files(self) -> List[PurePosixPath]:
+        """
+        Returns the paths of all files, sorted.
+        """
+
+        return self._index()
+
+    def listdir(self, directory: str | PurePosixPath = ".") -> List[PurePosixPath]:
+        """
+        Returns the paths of the files directly in `directory`.
+        """
+
+        directory = PurePosixPath(directory)
+        return [path for path in self._index() if path.parent == directory]
+
+    def is_file(self, path: str | PurePosixPath) -> bool:
+        path = normalize_source_path(path)
+        return path is not None and path in self._index_set()
+
+    def _index_set(self) -> frozenset:
+        if self._files is None:
+            self._files = frozenset(self._index())
+        return self._files
+
+    def read_bytes(self, path: str | PurePosixPath) -> bytes:
+        normalized = normalize_source_path(path)
+        if normalized is None or normalized not in self._index_set():
+            raise FileNotFoundError(f"{path} is not in the source")
+
+        if normalized not in self._contents:
+            self._contents[normalized] = self._read(normalized)
+        return self._contents[normalized]
+
+    def read_text(
+        self,
+        path: str | PurePosixPath,
+        encoding: str = "utf-8",
+        errors: str = "strict"
+    ) -> str:
+        return self.read_bytes(path).decode(encoding, errors)
+
+    @contextlib.contextmanager
+    def materialize(self) -> Iterator[Path]:
+        """
+        A context giving a real directory holding the source, for tools that need one (plasTeX).
+        Written to a temporary directory, removed on exit, unless the source is already on disk.
+        """
+
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            for path in self._index():
+                target = root / path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(self.read_bytes(path))
+            yield root
+
+
+class MemorySourceTree(SourceTree):
+    """
+    Source files held in memory.
+
+    Parameters
+    ----------
+    files : Mapping[str, bytes]
+        Contents of each file, by path. Paths pointing outside the source are dropped.
+    """
+
+    def __init__(self, files: Mapping[str, bytes]):
+        super().__init__()
+        for name, content in files.items():
+            path = normalize_source_path(name)
+            if path is not None:
+                self._contents[path] = content
+        self._sorted = sorted(self._contents)
+
+    def _index(self) -> List[PurePosixPath]:
+        return self._sorted
+
+    def _read(self, path: PurePosixPath) -> bytes:
+        return self._contents[path]
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of the files, in bytes.
+        """
+
+        return sum(len(content) for content in self._contents.values())
+
+
+class DirSourceTree(SourceTree):
+    """
+    Source files in a directory on disk, walked once on first use.
+
+    Parameters
+    ----------
+    root : Path | str
+        Directory of the source files.
+    """
+
+    def __init__(self, root: Path | str):
+        super().__init__()
+        self.root = Path(root)
+        self._sorted: Optional[List[PurePosixPath]] = None
+
+    def _index(self) -> List[PurePosixPath]:
+        if self._sorted is None:
+            found = []
+            for dirpath, _, filenames in os.walk(self.root):
+                relative = PurePosixPath(Path(dirpath).relative_to(self.root).as_posix())
+                found.extend(relative / filename for filename in filenames)
+            self._sorted = sorted(found)
+        return self._sorted
+
+    def _read(self, path: PurePosixPath) -> bytes:
+        return (self.root / path).read_bytes()
+
+    @contextlib.contextmanager
+    def materialize(self) -> Iterator[Path]:
+        yield self.root
+
+
+def as_source_tree(source: Path | str | SourceTree) -> SourceTree:
+    """
+    Returns `source` if it is already a SourceTree, otherwise a DirSourceTree over it.
+    """
+
+    if isinstance(source, SourceTree):
+        return source
+    return DirSourceTree(source)
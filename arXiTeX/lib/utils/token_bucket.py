@@ -0,0 +1,61 @@
+"""
+Thread-safe token bucket for rate limiting requests.
+"""
+
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter. Tokens refill continuously at `rate` per second up to `capacity`,
+    and each request takes one.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    capacity : float, optional
+        Maximum number of stored tokens, i.e. the largest burst. Default, 1.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait(self):
+        """
+        Blocks until a token is available, without taking it.
+        """
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    return
+                wait_s = (1 - self._tokens) / self.rate
+
+            time.sleep(wait_s)
+
+    def acquire(self):
+        """
+        Blocks until a token is available, then takes it.
+        """
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_s = (1 - self._tokens) / self.rate
+
+            time.sleep(wait_s)
@@ -21,6 +21,7 @@ class ArXivPaper(BaseModel):
 class ParsingMethod(str, Enum):
     PLASTEX = "plasTeX"
     REGEX = "regex"
+    AUTO = "auto"
 
 class Statement(BaseModel):
     """
@@ -74,10 +75,15 @@ class ParseFocus(str, Enum):
 @dataclass
 class ParseResult:
     """
-    Result of parsing a paper. Fields are None when not requested by the focus.
+    Result of parsing a paper. Fields are None when not requested by the focus. `parsing_method`
+    is the method that parsed `statements` (PLASTEX or REGEX, also with AUTO). When parsed with
+    `partial_results`, `complete` maps each requested field to whether it was finished before the
+    timeout; unfinished fields hold what was done (statements found so far) or are None.
     """
 
     statements: Optional[List[Statement]] = None
     preamble: Optional[str] = None
     bibliography: Optional[Dict[str, Dict[str, str]]] = None
     bibliography_bibtex: Optional[bool] = None
+    parsing_method: Optional[ParsingMethod] = None
+    complete: Optional[Dict[str, bool]] = None
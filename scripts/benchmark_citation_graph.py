@@ -0,0 +1,122 @@
+"""
+Script for benchmarking the citation graph on a synthetic catalog. Papers cite earlier papers,
+preferring recent ones, plus a few references outside arXiv.
+"""
+
+import time
+import random
+import shutil
+import resource
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Iterator, List
+from arXiTeX.lib.paper.catalog.columnar import CatalogRecord, ColumnarBatch
+from arXiTeX.lib.paper.citation_graph import CitationGraph, build_citation_graph
+
+
+def _arxiv_id(i: int) -> str:
+    return f"{2000 + i // 100_000}.{i % 100_000:05d}"
+
+
+def synthetic_batches(
+    num_papers: int,
+    mean_references: int,
+    batch_size: int,
+    seed: int,
+    first: int = 0
+) -> Iterator[ColumnarBatch]:
+    rng = random.Random(seed)
+
+    for start in range(first, first + num_papers, batch_size):
+        records: List[CatalogRecord] = []
+        for i in range(start, min(start + batch_size, first + num_papers)):
+            reference_ids = [
+                "ARXIV:" + _arxiv_id(i - 1 - int(rng.expovariate(1 / 50_000)) % i)
+                for _ in range(rng.randrange(2 * mean_references) if i > 0 else 0)
+            ]
+            if rng.random() < 0.2:
+                reference_ids.append(f"DOI:10.{rng.randrange(1000)}/{rng.randrange(10 ** 6)}")
+            records.append(CatalogRecord(arxiv_id=_arxiv_id(i), reference_ids=reference_ids))
+
+        yield ColumnarBatch.from_records(records, ["arxiv_id", "reference_ids"])
+
+
+def _timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {elapsed * 1000:.2f} ms" if elapsed < 1 else f"{label}: {elapsed:.1f} s")
+    return result
+
+
+def _disk_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 2 ** 20
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser()
+
+    arg_parser.add_argument(
+        "-n",
+        "--num-papers",
+        type=int,
+        default=1_000_000,
+        help="Number of synthetic papers (default 1,000,000)"
+    )
+
+    arg_parser.add_argument(
+        "-r",
+        "--mean-references",
+        type=int,
+        default=10,
+        help="Mean number of references per paper (default 10)"
+    )
+
+    arg_parser.add_argument(
+        "-d",
+        "--graph-dir",
+        type=str,
+        default="citation_graph_benchmark",
+        help="Directory to build the graph in. Deleted first"
+    )
+
+    args = arg_parser.parse_args()
+
+    graph_dir = Path(args.graph_dir)
+    shutil.rmtree(graph_dir, ignore_errors=True)
+
+    graph: CitationGraph = _timed(
+        "Build",
+        lambda: build_citation_graph(
+            synthetic_batches(args.num_papers, args.mean_references, 10_000, seed=0),
+            graph_dir
+        )
+    )
+    print(f"Nodes: {len(graph):,}, on disk: {_disk_mb(graph_dir):.0f} MB")
+
+    rng = random.Random(1)
+    ids = [_arxiv_id(rng.randrange(args.num_papers)) for _ in range(1000)]
+
+    _timed("1000 out-degrees", lambda: [graph.out_degree(i) for i in ids])
+    _timed("1000 in-degrees", lambda: [graph.in_degree(i) for i in ids])
+    two_hop = _timed("2-hop references", lambda: graph.neighborhood(ids[0], 2))
+    print(f"2-hop references of {ids[0]}: {len(two_hop):,} nodes")
+    _timed("2-hop citations", lambda: graph.neighborhood(ids[0], 2, direction="in"))
+
+    delta = args.num_papers // 100
+    _timed(
+        f"Append {delta:,} papers",
+        lambda: [
+            graph.add_papers(batch)
+            for batch in synthetic_batches(
+                delta, args.mean_references, 10_000, seed=2, first=args.num_papers - delta // 2
+            )
+        ]
+    )
+    _timed("In-degree with pending appends", lambda: graph.in_degree(ids[0]))
+    _timed("Compact", graph.compact)
+
+    graph.close()
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Peak RSS: {peak_mb:.0f} MB")
@@ -1,5 +1,5 @@
 """
-Script for parsing a single paper. Not useful for parsing many papers quickly.
+Script for parsing a single paper. To parse many papers quickly, use `parse_papers`.
 """
 
 from argparse import ArgumentParser